@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""Compare the load time and peak memory of the corpus store formats.
+Run from the spam_filter directory with 
+
+    python3 -m benchmarks.bench_corpus_store [--corpus_dir DIR]
+
+Every corpus csv file in CORPUS_FILENAMES is converted to each of the 
+columnar formats (if it doesn't exist yet), then loaded in full, and with
+only the `spam` column."""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from importlib.util import find_spec
+
+from data_processing.preprocessing.corpus_store import write_corpus_store, \
+    store_path
+from data_processing.preprocessing.data_loading import load_corpora_csvs
+from data_processing import CORPORA_CSV_PATH, CORPUS_FILENAMES
+
+
+def measure(func):
+    """Return the time taken (s) and peak memory allocated (MB) by 
+    calling `func`. (The two are measured in separate calls, since tracing
+    memory allocations slows everything down.)"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_dir', type=Path, default=CORPORA_CSV_PATH,
+                        help="directory containing the corpus csv files")
+    args = parser.parse_args()
+    formats = ['csv', 'npz']
+    if find_spec("pyarrow") is not None:
+        formats += ['parquet', 'feather']
+    for store_format in formats:
+        for filename in CORPUS_FILENAMES.values():
+            csv_path = args.corpus_dir / filename
+            if not store_path(csv_path, store_format).exists():
+                write_corpus_store(csv_path, store_format)
+        for columns in (None, ['spam']):
+            elapsed, peak = measure(lambda: load_corpora_csvs(
+                args.corpus_dir, columns=columns, store_format=store_format))
+            print(f"{store_format:>8} columns={columns or 'all'}: "
+                f"{elapsed:8.3f} s, peak memory {peak:10.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""Measure the latency of running the spacy pipeline on batches of email
+bodies of several sizes, in three ways:
+- 'spawn': nlp.pipe(..., n_process=workers), as DocCreator used to, which
+  starts (and loads the pipeline in) new worker processes on every call
+- 'in-process': in the calling process (DocCreator below its
+  parallel_threshold)
+- 'pool': in the persistent worker pool of pipe_texts (DocCreator at or
+  above its parallel_threshold). The first call, which starts the pool, is
+  reported separately.
+Run from the spam_filter directory with
+
+    python3 -m benchmarks.bench_doc_creation [--corpus_dir DIR]
+        [--sizes 1 10 100 1000] [--workers N] [--repeat N]
+
+The times are the median of `repeat` calls (the 'spawn' way is only
+timed once for each size)."""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from data_processing.preprocessing.data_loading import load_corpora_csvs
+from data_processing.spacy import load_model
+from data_processing.spacy.parallel import pipe_texts, get_pool, \
+    shutdown_pool, DISABLED_COMPONENTS
+from data_processing import CORPORA_CSV_PATH
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_dir', type=Path, default=CORPORA_CSV_PATH,
+                        help="directory containing the corpus csv files")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1, 10, 100, 1000],
+                        help="numbers of emails per batch")
+    parser.add_argument('--workers', type=int,
+                        default=max(os.cpu_count(), 2),
+                        help="number of worker processes")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="number of calls timed for each size")
+    args = parser.parse_args()
+    emails = load_corpora_csvs(args.corpus_dir, columns=['body']).dropna()
+    texts = emails['body'].sample(max(args.sizes), random_state=0).tolist()
+    nlp = load_model()
+    start = time.perf_counter()
+    get_pool(args.workers)
+    list(pipe_texts(texts[:1], workers=args.workers, parallel_threshold=1))
+    print(f"Starting the pool of {args.workers} workers (first call): "
+        f"{time.perf_counter() - start:.3f} s")
+    print(f"{'emails':>8} {'spawn':>10} {'in-process':>12} {'pool':>10}")
+    for size in args.sizes:
+        batch = texts[:size]
+        spawn = timed(lambda: list(nlp.pipe(batch,
+            disable=list(DISABLED_COMPONENTS), n_process=args.workers,
+            batch_size=250)), 1)
+        in_process = timed(lambda: list(pipe_texts(batch,
+            workers=args.workers, parallel_threshold=size + 1)), args.repeat)
+        pool = timed(lambda: list(pipe_texts(batch, workers=args.workers,
+            parallel_threshold=1)), args.repeat)
+        print(f"{size:8d} {spawn * 1000:8.1f}ms {in_process * 1000:10.1f}ms "
+            f"{pool * 1000:8.1f}ms")
+    shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Compare the throughput of the HTML text engines used by get_email_text.
+Run from the spam_filter directory with
+
+    python3 -m benchmarks.bench_html_text CORPUS_DIR [--limit N]
+
+The text/html parts of (up to N of) the email files under CORPUS_DIR (e.g.
+the root directory of one of the raw corpora) are loaded, and each engine
+in HTML_TEXT_ENGINES extracts the text of all of them. The number of parts
+for which the engines disagree is reported as well."""
+
+import argparse
+import time
+from email import message_from_binary_file, policy
+from pathlib import Path
+
+from data_processing.emailextract import HTML_TEXT_ENGINES
+
+
+def load_html_parts(corpus_dir, limit):
+    """Return a list of the contents of up to `limit` text/html email parts
+    found in the files under `corpus_dir`."""
+    contents = []
+    for path in sorted(corpus_dir.rglob('*')):
+        if not path.is_file():
+            continue
+        with path.open('rb') as f:
+            email_obj = message_from_binary_file(f, policy=policy.default)
+        for part in email_obj.walk():
+            if part.get_content_type() != 'text/html':
+                continue
+            try:
+                contents.append(part.get_content())
+            except (LookupError, AttributeError):
+                continue
+            if len(contents) >= limit:
+                return contents
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus_dir', type=Path,
+                        help="directory containing raw email files")
+    parser.add_argument('--limit', type=int, default=5000,
+                        help="maximum number of HTML parts to use")
+    args = parser.parse_args()
+    contents = load_html_parts(args.corpus_dir, args.limit)
+    size = sum(len(content) for content in contents) / 1_000_000
+    print(f"Loaded {len(contents)} HTML parts ({size:.1f} M characters)")
+    texts = {}
+    for engine, to_text in HTML_TEXT_ENGINES.items():
+        start = time.perf_counter()
+        texts[engine] = [to_text(content) for content in contents]
+        elapsed = time.perf_counter() - start
+        print(f"{engine:>8}: {elapsed:8.3f} s, "
+            f"{len(contents) / elapsed:10.1f} parts/s, "
+            f"{size / elapsed:6.2f} M characters/s")
+    mismatches = sum(len(set(results)) > 1
+        for results in zip(*texts.values()))
+    print(f"The engines disagree on {mismatches} parts")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""Measure the time it takes to import the data_processing modules (each in
+a fresh interpreter, so nothing is already imported), which of the heavy
+dependencies each import pulls in, and the time of the first and second
+load_model call (the second only looks up the pipeline already loaded).
+Run from the spam_filter directory with
+
+    python3 -m benchmarks.bench_import [--repeat N]
+
+The times are the best of `repeat` runs."""
+
+import argparse
+import subprocess
+import sys
+
+
+MODULES = [
+    'data_processing',
+    'data_processing.emailextract',
+    'data_processing.spacy',
+    'data_processing.preprocessing',
+]
+HEAVY_MODULES = ['spacy', 'bs4', 'sklearn', 'pandas', 'scipy', 'langdetect']
+
+IMPORT_CODE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+LOAD_CODE = """
+import time
+from data_processing.spacy import load_model
+start = time.perf_counter()
+load_model()
+first = time.perf_counter() - start
+start = time.perf_counter()
+load_model()
+print(first, time.perf_counter() - start)
+"""
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], check=True,
+        capture_output=True, text=True).stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="number of runs of each import")
+    args = parser.parse_args()
+    for module in MODULES:
+        code = IMPORT_CODE.format(module=module, heavy=HEAVY_MODULES)
+        runs = [run(code) for _ in range(args.repeat)]
+        elapsed = min(float(result[0]) for result in runs)
+        imported = runs[0][1] if len(runs[0]) > 1 else '-'
+        print(f"{module:>30}: {elapsed:6.3f} s, imports {imported}")
+    first, second = map(float, run(LOAD_CODE))
+    print(f"load_model: first call {first:.3f} s, second call "
+        f"{second * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
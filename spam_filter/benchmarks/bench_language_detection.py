@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""Compare the speed and agreement of the language detectors used by 
+drop_non_english. Run from the spam_filter directory with
+
+    python3 -m benchmarks.bench_language_detection [--corpus_dir DIR] 
+        [--sample N] [--max_chars M]
+
+A random sample of N email bodies from the corpora (after the space 
+normalization of the email_cleaning pipeline) is run through each detector.
+The time taken, the share of bodies on which the detectors agree (on the 
+language, and on whether it is English), and the most common disagreements
+are reported."""
+
+import argparse
+import time
+from collections import Counter
+from pathlib import Path
+
+from data_processing.preprocessing.data_loading import load_corpora_csvs
+from data_processing.preprocessing.email_cleaning import normalize_spaces, \
+    detect_languages
+from data_processing import CORPORA_CSV_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_dir', type=Path, default=CORPORA_CSV_PATH,
+                        help="directory containing the corpus csv files")
+    parser.add_argument('--sample', type=int, default=5000,
+                        help="number of email bodies to use")
+    parser.add_argument('--max_chars', type=int, default=None,
+                        help=("only use this many characters at the start of "
+                            "each body with the 'ngram' detector"))
+    args = parser.parse_args()
+    emails = load_corpora_csvs(args.corpus_dir, columns=['subject', 'body'])
+    emails = emails.sample(min(args.sample, len(emails)), random_state=0)
+    bodies = normalize_spaces(emails)['body'].tolist()
+    print(f"Detecting the languages of {len(bodies)} email bodies")
+    languages = {}
+    for detector, max_chars in (('langdetect', None), 
+                                ('ngram', args.max_chars)):
+        start = time.perf_counter()
+        languages[detector] = detect_languages(bodies, workers=1, 
+            detector=detector, max_chars=max_chars)
+        elapsed = time.perf_counter() - start
+        print(f"{detector:>10}: {elapsed:8.3f} s, "
+            f"{len(bodies) / elapsed:10.1f} bodies/s")
+    pairs = list(zip(languages['langdetect'], languages['ngram']))
+    same_language = sum(a == b for a, b in pairs)
+    same_english = sum((a == 'en') == (b == 'en') for a, b in pairs)
+    print(f"Same language: {same_language / len(pairs):.2%}, same "
+        f"English/non-English decision: {same_english / len(pairs):.2%}")
+    print("Most common disagreements (langdetect, ngram):")
+    for (a, b), count in Counter(pair for pair in pairs 
+                                 if pair[0] != pair[1]).most_common(10):
+        print(f"\t{a}, {b}: {count}")
+
+
+if __name__ == '__main__':
+    main()
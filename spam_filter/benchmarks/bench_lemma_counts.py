@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""Compare the time and peak memory of counting the lemmas of email bodies
+with DocCreator, Lemmatizer and DictVectorizer (which keeps all the Docs in
+memory), and with LemmaCounter (which counts each Doc as soon as it is
+created). The counting step alone (Lemmatizer and DictVectorizer, which
+look at each token in Python, against LemmaCounter, which counts the
+tokens of a batch of Docs with NumPy) is also timed on Docs made
+beforehand. Run from the spam_filter directory with
+
+    python3 -m benchmarks.bench_lemma_counts [--corpus_dir DIR] [--sample N]
+
+Peak memory is measured with tracemalloc in a separate run. Both ways are
+checked to give the same matrix."""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from sklearn.feature_extraction import DictVectorizer
+
+from data_processing.preprocessing.data_loading import load_corpora_csvs
+from data_processing.spacy import DocCreator, Lemmatizer, LemmaCounter, \
+    load_model
+from data_processing import CORPORA_CSV_PATH
+
+
+def separate(texts):
+    docs = DocCreator().transform(texts)
+    return DictVectorizer().fit_transform(Lemmatizer().transform(docs))
+
+
+def fused(texts):
+    return LemmaCounter().fit_transform(texts)
+
+
+def count_docs_separate(docs):
+    return DictVectorizer().fit_transform(Lemmatizer().transform(docs))
+
+
+def count_docs_fused(docs):
+    return LemmaCounter().fit_transform(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_dir', type=Path, default=CORPORA_CSV_PATH,
+                        help="directory containing the corpus csv files")
+    parser.add_argument('--sample', type=int, default=2000,
+                        help="number of emails to use")
+    args = parser.parse_args()
+    emails = load_corpora_csvs(args.corpus_dir, columns=['body']).dropna()
+    texts = emails['body'].sample(min(args.sample, len(emails)),
+        random_state=0)
+    print(f"Counting the lemmas of {len(texts)} email bodies")
+    # Load the spacy pipeline before timing
+    load_model()
+    results = {}
+    for name, count in (('separate', separate), ('fused', fused)):
+        start = time.perf_counter()
+        results[name] = count(texts)
+        elapsed = time.perf_counter() - start
+        # tracemalloc slows everything down, so the memory is measured in a
+        # second run
+        tracemalloc.start()
+        count(texts)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>10}: {elapsed:8.3f} s ({len(texts) / elapsed:8.1f} "
+            f"emails/s), peak {peak / 2**20:10.1f} MiB")
+    print("Same result:", results['separate'].shape == results['fused'].shape
+        and (results['separate'] != results['fused']).nnz == 0)
+    docs = DocCreator().transform(texts)
+    print(f"Counting the lemmas of {len(texts)} Docs")
+    for name, count in (('separate', count_docs_separate),
+            ('fused', count_docs_fused)):
+        start = time.perf_counter()
+        results[name] = count(docs)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed:8.3f} s ({len(texts) / elapsed:8.1f} "
+            f"Docs/s)")
+    print("Same result:", results['separate'].shape == results['fused'].shape
+        and (results['separate'] != results['fused']).nnz == 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""Compare the time and peak memory of normalizing the corpora with the 
+separate normalize_spaces, all_whitespace_to_na and drop_multipart_messages
+steps, and with the single pass of normalize_fields. Run from the 
+spam_filter directory with
+
+    python3 -m benchmarks.bench_normalization [--corpus_dir DIR] [--sample N]
+
+Peak memory is measured with tracemalloc in a separate run (only memory
+allocated after the corpora are loaded counts), so it is the extra memory
+each way needs on top of the loaded dataframe. Both ways are checked to give the same result."""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from data_processing.preprocessing.data_loading import load_corpora_csvs
+from data_processing.preprocessing.email_cleaning import normalize_spaces, \
+    all_whitespace_to_na, normalize_fields, drop_multipart_messages
+from data_processing import CORPORA_CSV_PATH
+
+
+def separate(emails):
+    return drop_multipart_messages(all_whitespace_to_na(
+        normalize_spaces(emails)).dropna(subset=['body']))
+
+
+def fused(emails):
+    return drop_multipart_messages(normalize_fields(emails, 
+        flag_multipart=True))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus_dir', type=Path, default=CORPORA_CSV_PATH,
+                        help="directory containing the corpus csv files")
+    parser.add_argument('--sample', type=int, default=None,
+                        help="number of emails to use (default: all)")
+    args = parser.parse_args()
+    emails = load_corpora_csvs(args.corpus_dir, columns=['subject', 'body'])
+    if args.sample is not None:
+        emails = emails.sample(min(args.sample, len(emails)), random_state=0)
+    size = emails.memory_usage(deep=True).sum()
+    print(f"Normalizing {len(emails)} emails ({size / 2**20:.1f} MiB)")
+    results = {}
+    for name, normalize in (('separate', separate), ('fused', fused)):
+        start = time.perf_counter()
+        results[name] = normalize(emails)
+        elapsed = time.perf_counter() - start
+        # tracemalloc slows everything down, so the memory is measured in a
+        # second run
+        tracemalloc.start()
+        normalize(emails)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>10}: {elapsed:8.3f} s, peak {peak / 2**20:10.1f} MiB")
+    print("Same result:", results['separate'].equals(results['fused']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+import logging
+
+from data_processing.spacy import build_lemma_features
+from data_processing import LEMMA_FEATURE_PATH, DOCBIN_PATH, \
+    DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES
+
+
+handler = logging.StreamHandler()
+formatter = logging.Formatter(fmt="%(name)s [%(levelname)s] - %(message)s")
+handler.setFormatter(formatter)
+handler.setLevel(logging.INFO)
+logging.getLogger().addHandler(handler)
+
+
+if __name__ == '__main__':
+    build_lemma_features(LEMMA_FEATURE_PATH, DOCBIN_PATH, DOCBIN_FILENAMES,
+        SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES)
@@ -4,9 +4,10 @@ import logging
 import argparse
 from pathlib import Path
 
-from data_processing.preprocessing import load_train_test_csvs, create_docbins
+from data_processing.preprocessing import load_train_test_csvs
+from data_processing.spacy import create_many_docbins
 from data_processing import CORPORA_CSV_PATH, CORPUS_FILENAMES, DOCBIN_PATH, \
-    DOCBIN_FILENAMES
+    DOCBIN_FILENAMES, DOCBIN_WORKERS
 
 
 # Set up logging 
@@ -37,11 +38,17 @@ def get_arguments():
                         default="all",
                         help="the field to run the spacy pipeline on")
     parser.add_argument('--batchsize', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=DOCBIN_WORKERS,
+                        help=("number of worker processes running the "
+                            "spacy pipeline (default: all CPUs)"))
     parser.add_argument('-d', '--output_dir', type=existing_directory, 
                         default=DOCBIN_PATH,
                         help="the directory to output the docbin file(s)")
     parser.add_argument('-F', '--force', action='store_true',
                         help="force output file(s) to be overwritten")
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help=("resume an interrupted run, only creating the "
+                            "docbin shards not already completed"))
     verbosegroup = parser.add_mutually_exclusive_group()
     verbosegroup.add_argument('-v', '--verbose', action='store_true',
                               help=("verbose mode - show extra log info "
@@ -61,7 +68,9 @@ def parse_arguments(args):
     - a list of tuples of the form (data_set [train/test], 
       field [body/subject], path) where the spacy docbin created for each 
       given data_set and field will be saved in path.
-    - the batch size for the docbins"""
+    - the batch size for the docbins
+    - the number of worker processes
+    - whether to resume an interrupted run"""
     # Check if output directory exists
     if not args.output_dir.exists():
         raise FileNotFoundError(f"{args.output_dir} does not exist")
@@ -79,12 +88,14 @@ def parse_arguments(args):
         for data_set in data_sets 
         for field in fields
     ]
-    # Only overwrite an existing file if the force filename flag (-F) is used.
-    if not args.force:
+    # Only overwrite an existing file if the force filename flag (-F) or the
+    # resume flag (-r) is used.
+    if not (args.force or args.resume):
         for _, _, path in set_field_path_list:
             if path.exists() or path.with_suffix('.spacy').exists():
                 raise FileExistsError(f"{path} already exists. Use "
-                    "option '-F' if you would like to overwrite this file.")
+                    "option '-F' if you would like to overwrite this file, "
+                    "or '-r' to resume creating it.")
     # Set which handler to use for logging
     if args.log:
         handler = logging.FileHandler(args.log)
@@ -105,20 +116,24 @@ def parse_arguments(args):
     handler.setLevel(loglevel)
     # Add the handler to the root logger
     logging.getLogger().addHandler(handler)
-    return args.corpus_dir, set_field_path_list, args.batchsize
+    return (args.corpus_dir, set_field_path_list, args.batchsize, 
+        args.workers, args.resume)
 
 
 def main():
     args = get_arguments()
-    corpus_dir, set_field_path_list, batch_size = parse_arguments(args)
+    corpus_dir, set_field_path_list, batch_size, workers, resume = \
+        parse_arguments(args)
     train_set, test_set = load_train_test_csvs(corpus_dir, 
         corpus_names=CORPUS_FILENAMES)
     data_sets = {'train': train_set, 'test': test_set}
     for data_set_name, field, path in set_field_path_list:
         logger.info(f"Creating docbin for {data_set_name}[{field}] and "
             f"storing in {path}")
-        create_docbins(data_sets[data_set_name][field], path, 
-            batch_size=batch_size)
+    # All the docbins are created at the same time by one pool of workers
+    create_many_docbins([(data_sets[data_set_name][field], path) 
+            for data_set_name, field, path in set_field_path_list], 
+        batch_size=batch_size, workers=workers, resume=resume)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,26 @@
 from .settings import CORPORA_CSV_PATH, CORPUS_FILENAMES, DOCBIN_PATH, \
-    DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES, TEST_RATIO
-from .spacy import create_docbins, Lemmatizer, DocCreator
-from .emailextract import email_to_df
\ No newline at end of file
+    DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES, TEST_RATIO, \
+    CORPUS_STORE_FORMAT, HTML_TEXT_ENGINE, LANGUAGE_DETECTION_WORKERS, \
+    LANGUAGE_CACHE_PATH, LANGUAGE_DETECTOR, LANGUAGE_DETECTION_MAX_CHARS, \
+    NEAR_DUPLICATE_THRESHOLD, CLEANED_CORPUS_CACHE_PATH, \
+    CORPUS_PREP_CHUNKSIZE, SPACY_MODEL, DOCBIN_WORKERS, LEMMA_FEATURE_PATH, \
+    LEMMA_FEATURE_OPTIONS, SPACY_WORKERS, SPACY_PARALLEL_THRESHOLD
+
+
+# The rest is imported when first used, so that importing data_processing
+# (e.g. just for the settings) doesn't import spacy, BeautifulSoup etc.
+_LAZY_ATTRIBUTES = {
+    'create_docbins': '.spacy',
+    'create_many_docbins': '.spacy',
+    'Lemmatizer': '.spacy',
+    'LemmaCounter': '.spacy',
+    'DocCreator': '.spacy',
+    'email_to_df': '.emailextract',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        from importlib import import_module
+        return getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
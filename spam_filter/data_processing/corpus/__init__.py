@@ -1,3 +1,5 @@
 from .enron import EnronCorpusExtractor
 from .ling import LingCorpusExtractor
 from .trec import TrecCorpusExtractor
+from .mbox import MboxCorpusExtractor
+from .maildir import MaildirCorpusExtractor
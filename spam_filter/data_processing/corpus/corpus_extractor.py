@@ -1,28 +1,193 @@
+import codecs
 import email
+import io
 from email.policy import default
 import csv
 import logging
-from collections import Counter
+import shutil
+import tarfile
+import tempfile
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
 
 
+from .manifest import (ManifestEntry, content_hash, get_manifest_path, 
+    read_manifest, manifest_writer)
+from .timing import ExtractionTimer
 from ..emailextract import (ACCEPTED_CHARSETS, extract_email_data, 
     EmailEncodingError)
+from ..settings import HTML_TEXT_ENGINE
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+SPAM_ENCODE = {1: "spam", 0: "ham"}
+
+# The source (see _load_source) of an email whose size and modification 
+# time are the same as in the manifest of a previous extraction: it is not
+# read at all, and its row is copied from the previous CSV.
+KEPT = "kept"
+
+
 class CorpusDirectoryStructureError(Exception):
     pass
 
 
+def _load_source(root_path, relpath, source):
+    """Return a tuple (data, mtime) of the raw bytes of an email and its
+    modification time in nanoseconds. `source` describes where the email
+    is stored: None for the file root_path / relpath, a tuple 
+    (data, mtime) for an email that was already read (e.g. from an 
+    archive), or an object with a load() method returning (data, mtime) 
+    (e.g. an mbox.MboxSlice), where data is bytes or a buffer. (KEPT is
+    handled by _extract_email without loading anything.) If `source` 
+    is an OSError (e.g. the email is listed in the index but was not found 
+    in the archive), it is raised."""
+    if source is None:
+        filepath = root_path / relpath
+        mtime = filepath.stat().st_mtime_ns
+        return filepath.read_bytes(), mtime
+    if isinstance(source, OSError):
+        raise source
+    if hasattr(source, "load"):
+        return source.load()
+    return source
+
+
+def _parse_email(data):
+    """Parse the raw email `data` (bytes or a buffer, such as a memoryview
+    of a memory-mapped file) into an EmailMessage, exactly as 
+    email.message_from_bytes does with bytes."""
+    return email.message_from_string(
+        codecs.decode(data, 'ascii', 'surrogateescape'), policy=default)
+
+
+def _extract_email(root_path, email_type, relpath, accepted_charsets,
+        known_entry=None, source=None, timed=False):
+    """Read, parse, and extract the data of a single email (see 
+    _load_source for `source`). 
+    Returns a tuple (relpath, status, value, entry, timing) where status is 
+    one of 
+    - "extracted": value is the row [relpath, email_type, subject, body]
+    - "missing": value is the exception raised when reading the email
+    - "encoding": value is the EmailEncodingError raised on extraction
+    - "unchanged": the content hash of the email equals the hash of the 
+      ManifestEntry `known_entry` from a previous extraction (or `source`
+      is KEPT), so the email was not parsed again, and value is None
+    entry is the email's ManifestEntry (None if the email is missing), and
+    timing is None unless `timed` is True. In that case it is a dict of the
+    time (s) spent in each stage of TIMED_STAGES that was reached, and the
+    'path', 'size', 'status' and 'content_types' (of the non-multipart 
+    parts) of the email (see timing.ExtractionTimer).
+    This is a module level function so that it can be sent to worker
+    processes."""
+    logger.debug(f"Trying to extract {SPAM_ENCODE[email_type]} email at "
+        f"{root_path / relpath}")
+    timings = {} if timed else None
+    email_obj = None
+    def result(status, value, entry):
+        if not timed:
+            return (relpath, status, value, entry, None)
+        content_types = [] if email_obj is None else [
+            part.get_content_type() for part in email_obj.walk() 
+            if not part.is_multipart()]
+        return (relpath, status, value, entry, {'path': relpath, 
+            'size': None if entry is None else entry.size, 'status': status,
+            'content_types': content_types, **timings})
+    if isinstance(source, str) and source == KEPT:
+        return result("unchanged", None, known_entry)
+    start = time.perf_counter()
+    try:
+        data, mtime = _load_source(root_path, relpath, source)
+    except (FileNotFoundError, OSError) as e:
+        return result("missing", e, None)
+    digest = content_hash(data)
+    def entry(status):
+        return ManifestEntry(relpath, email_type, len(data), mtime, digest,
+            status)
+    if timed:
+        timings['read'] = time.perf_counter() - start
+    if known_entry is not None and digest == known_entry.hash:
+        return result("unchanged", None, entry(known_entry.status))
+    start = time.perf_counter()
+    email_obj = _parse_email(data)
+    if timed:
+        timings['parse'] = time.perf_counter() - start
+    try:
+        email_data = extract_email_data(email_obj, 
+            accepted_charsets=accepted_charsets, timings=timings)
+    except EmailEncodingError as e:
+        return result("encoding", e, entry("encoding"))
+    return result("extracted", [relpath, email_type, *email_data], 
+        entry("extracted"))
+
+
+def _extract_chunk(root_path, chunk, accepted_charsets, timed=False):
+    """Run _extract_email on each (email_type, relpath, known_entry, source) 
+    tuple in `chunk`, returning the list of results in the same order."""
+    return [_extract_email(root_path, email_type, relpath, accepted_charsets,
+                known_entry, source, timed)
+        for email_type, relpath, known_entry, source in chunk]
+
+
+def _chunked(iterable, chunksize):
+    """Yield successive lists of (at most) `chunksize` items of 
+    `iterable`."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunksize)):
+        yield chunk
+
+
+def _csv_row_offsets(path):
+    """Return a dict mapping the path (first column) of each complete row of
+    the CSV file `path` written by create_csv to the offset in bytes where 
+    the row starts, so that rows can be read with _read_csv_row without 
+    keeping them in memory."""
+    offsets = {}
+    with path.open("rb") as csv_file:
+        position = 0
+        def lines():
+            nonlocal position
+            for line in csv_file:
+                position += len(line)
+                yield line.decode('utf-8')
+        # The reader reads a line at a time, only as far as the end of 
+        # each row, so `position` is where the next row starts
+        reader = csv.reader(lines(), dialect='unix', escapechar="\\")
+        n_columns = len(next(reader, ()))
+        start = position
+        try:
+            for row in reader:
+                if len(row) == n_columns:
+                    offsets[row[0]] = start
+                start = position
+        except csv.Error as e:
+            # A run that was interrupted can leave a truncated last row.
+            logger.warning(f"Stopped reading {path} early: {e}")
+    return offsets
+
+
+def _read_csv_row(csv_file, offset):
+    """Return the row starting at `offset` (see _csv_row_offsets) of the CSV
+    file `csv_file` (opened in binary mode)."""
+    csv_file.seek(offset)
+    lines = (line.decode('utf-8') for line in csv_file)
+    return next(csv.reader(lines, dialect='unix', escapechar="\\"))
+
+
 class BaseCorpusExtractor:
     """An object for extracting email data from a corpus. 
     This class serves as a base class to be inherited from
     for any particular corpus, and should not be instatiated
     itself. Subclasses should implement get_index() and 
-    redefine expected_directory_structure as a nested dict."""
+    redefine expected_directory_structure as a nested dict.
+    Emails can either be read from the unpacked corpus directory, or 
+    straight from the corpus tarball(s) (see __init__)."""
 
 
     # Set a baseline list of accepted charsets. Subclasses can either expand 
@@ -36,19 +201,40 @@ class BaseCorpusExtractor:
     # value of children is another list with the same structure
     expected_directory_structure = []
 
+    # In archive mode, the path (relative to the root of the unpacked 
+    # corpus) of the index file of the corpus if it is stored in the 
+    # tarball, so that it can be read in the same pass over the tarball as
+    # the emails (see email_items). Subclasses that set this should 
+    # implement read_index().
+    archive_index_relpath = None
+
 
-    def __init__(self, root_path, email_list=None):
+    def __init__(self, root_path, email_list=None, archive=False):
         """The argument `email_list` should be a list of
         two-tuples of the form (int, str), where the first value is 
         0 for ham and 1 for spam, and the second is the path of an 
         email relative to root_path (a Path object). If email_list 
         is not passed, one will be created using 
-        self.create_email_list()."""
+        self.create_email_list().
+        If `archive` is True, root_path should be a corpus tarball, or a 
+        directory of corpus tarballs (as for the Enron corpus), and the 
+        emails are read from the tarballs in a single sequential pass 
+        without unpacking them. Paths relative to root_path are then the 
+        paths of the archive members as given by self.archive_relpath()."""
         self.root_path = root_path
-        self.verify_directory_structure()
+        self.archive = archive
+        if archive:
+            self.archive_paths = self.find_archives()
+        else:
+            self.verify_directory_structure()
         self.email_list = email_list 
         if email_list is None:
-            self.create_email_list()
+            if archive and self.archive_index_relpath is not None:
+                # Read along with the emails (see email_items)
+                logger.debug(f"The index {self.archive_index_relpath} will "
+                    f"be read while reading the emails in {self.root_path}")
+            else:
+                self.create_email_list()
         else:
             self.email_list = email_list
     
@@ -82,6 +268,56 @@ class BaseCorpusExtractor:
         check_contents(self.root_path, self.expected_directory_structure)
         return True
 
+    def find_archives(self):
+        """Return a sorted list of the tarballs at self.root_path (which
+        is either a tarball itself or a directory of tarballs)."""
+        if self.root_path.is_file():
+            archive_paths = [self.root_path]
+        elif self.root_path.is_dir():
+            archive_paths = sorted(path for path in self.root_path.iterdir()
+                if path.is_file() and tarfile.is_tarfile(path))
+        else:
+            archive_paths = []
+        if not archive_paths or not all(tarfile.is_tarfile(path) 
+                                        for path in archive_paths):
+            raise CorpusDirectoryStructureError(f"{self.root_path} is not a "
+                "tarball or a directory containing tarballs")
+        return archive_paths
+
+    def archive_relpath(self, member_name):
+        """Return the path (relative to the root of the unpacked corpus) 
+        of the tarball member `member_name`. By default, this strips the 
+        top level directory that the tarball unpacks into. Subclasses can
+        redefine this if their tarballs are structured differently."""
+        return member_name.partition('/')[2]
+
+    def read_archive_file(self, relpath):
+        """Return the contents of the file `relpath` (relative to the root
+        of the unpacked corpus) from the tarball(s) at self.root_path. 
+        The tarballs are only read up to the member containing the file."""
+        for archive_path in self.archive_paths:
+            with tarfile.open(archive_path, mode="r|*") as archive:
+                for member in archive:
+                    if (member.isfile() 
+                            and self.archive_relpath(member.name) == relpath):
+                        return archive.extractfile(member).read()
+        raise FileNotFoundError(f"{relpath} not found in {self.root_path}")
+
+    def email_source(self, relpath):
+        """Return the source (see _load_source) of the email `relpath` when
+        not in archive mode. By default this is None, i.e. the email is read 
+        from the file self.root_path / relpath. Subclasses whose emails are
+        not stored in their own files should redefine this (and 
+        email_stat)."""
+        return None
+
+    def email_stat(self, relpath):
+        """Return a tuple (size, mtime) of the size in bytes and the
+        modification time in nanoseconds of the email `relpath` when not in 
+        archive mode. Raises an OSError if the email can't be found."""
+        stat = (self.root_path / relpath).stat()
+        return stat.st_size, stat.st_mtime_ns
+
     def get_index(self):
         """The logic for this method will change based on the subclass.
         It should be implemented to return a pandas dataframe with an 
@@ -90,74 +326,295 @@ class BaseCorpusExtractor:
         to self.root_path.""" 
         pass
 
+    def read_index(self, index_file):
+        """Return the index (as returned by get_index) in the binary file
+        object `index_file` of the index file of the corpus. Subclasses 
+        that set archive_index_relpath should implement this."""
+        raise NotImplementedError
+
     def create_email_list(self):
         """Sets self.email_list to a list of tuples of the form (int, str)
         where the first value is 0 for ham and 1 for spam, and the second 
         is the path of an email relative to self.root_path."""
         logger.debug(
             f"Gathering the list of emails and types in {self.root_path}")
-        index = self.get_index()
+        self.set_email_list(self.get_index())
+
+    def set_email_list(self, index):
+        """Sets self.email_list from the dataframe `index` (as returned by
+        get_index)."""
         self.email_list = list(
             index.itertuples(index=False, name=None)
         )
 
-    def create_csv(self, output_path):
+    def email_items(self, manifest=None):
+        """Generate a tuple (email_type, relpath, known_entry, source) for 
+        each email in self.email_list, where known_entry is the email's 
+        ManifestEntry in `manifest` (as returned by read_manifest) from a 
+        previous extraction, or None, and source is as in _load_source. 
+        If `manifest` is passed, the source of each email whose size and 
+        mtime are the same as before (so it does not need to be read at 
+        all) is KEPT. An email whose size or mtime changed is only parsed 
+        again if its content hash changed. 
+        In archive mode, the emails are generated in the order they are 
+        stored in the tarball(s), followed by any that were not found, and
+        the tarballs are read in a single sequential pass. If the index is
+        in the tarball (see archive_index_relpath), self.email_list is set
+        when the pass reaches it; any members before it are copied to a 
+        temporary file until then (so they are not decompressed twice, and
+        not all kept in memory). Otherwise, the emails are in the order of
+        self.email_list."""
+        if manifest is None:
+            manifest = {}
+        def known_entry(email_type, relpath):
+            entry = manifest.get(relpath)
+            if entry is None or entry.spam != email_type:
+                return None
+            return entry
+        if not self.archive:
+            for email_type, relpath in self.email_list:
+                entry = known_entry(email_type, relpath)
+                if entry is not None:
+                    try:
+                        stat = self.email_stat(relpath)
+                    except OSError:
+                        # Let the extraction itself report the missing file
+                        entry = None
+                    else:
+                        if stat == (entry.size, entry.mtime):
+                            yield (email_type, relpath, entry, KEPT)
+                            continue
+                yield (email_type, relpath, entry, self.email_source(relpath))
+            return
+        def archive_item(relpath, size, mtime, read):
+            email_type = remaining.pop(relpath, None)
+            if email_type is None:
+                return
+            entry = known_entry(email_type, relpath)
+            if entry is not None and (size, mtime) == (entry.size, 
+                                                       entry.mtime):
+                yield (email_type, relpath, entry, KEPT)
+                return
+            yield (email_type, relpath, entry, (read(), mtime))
+        remaining = None
+        if self.email_list is not None:
+            remaining = {relpath: email_type 
+                for email_type, relpath in self.email_list}
+        # The (relpath, size, mtime, offset) of each member read before the
+        # index, whose data is at offset in the temporary file `buffer`
+        buffered = []
+        with tempfile.TemporaryFile() as buffer:
+            for archive_path in self.archive_paths:
+                logger.info(f"Reading emails from archive {archive_path}")
+                with tarfile.open(archive_path, mode="r|*") as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        relpath = self.archive_relpath(member.name)
+                        mtime = member.mtime * 10**9
+                        if remaining is not None:
+                            yield from archive_item(relpath, member.size, 
+                                mtime, archive.extractfile(member).read)
+                        elif relpath == self.archive_index_relpath:
+                            logger.info(f"Reading index file {relpath} from "
+                                f"archive {archive_path}")
+                            index_data = archive.extractfile(member).read()
+                            self.set_email_list(
+                                self.read_index(io.BytesIO(index_data)))
+                            remaining = {relpath: email_type 
+                                for email_type, relpath in self.email_list}
+                            if buffered:
+                                logger.debug(f"Reading the {len(buffered)} "
+                                    "members before the index")
+                            for relpath, size, mtime, offset in buffered:
+                                buffer.seek(offset)
+                                yield from archive_item(relpath, size, mtime,
+                                    lambda: buffer.read(size))
+                            buffered.clear()
+                        else:
+                            buffered.append((relpath, member.size, mtime,
+                                buffer.tell()))
+                            shutil.copyfileobj(archive.extractfile(member),
+                                buffer)
+        if remaining is None:
+            raise FileNotFoundError(f"{self.archive_index_relpath} not found "
+                f"in {self.root_path}")
+        for relpath, email_type in remaining.items():
+            yield (email_type, relpath, None, FileNotFoundError(
+                f"{relpath} not found in {self.root_path}"))
+
+    def extraction_results(self, items, workers=1, chunksize=500, 
+            timed=False):
+        """Return an iterator of the results of _extract_email for each 
+        (email_type, relpath, known_entry, source) tuple in `items`, in the
+        same order as `items` (with stage timings if `timed` is True). If 
+        `workers` is greater than 1, the emails are sent in chunks of 
+        `chunksize` to a pool of `workers` worker processes. At most 
+        2 * `workers` chunks are in flight at a time, so the memory used 
+        does not depend on the size of the corpus."""
+        if workers <= 1:
+            return (_extract_email(self.root_path, email_type, relpath, 
+                        self.accepted_charsets, known_entry, source, timed)
+                    for email_type, relpath, known_entry, source in items)
+        logger.info(f"Extracting with {workers} worker processes in chunks "
+            f"of {chunksize} emails")
+        def results_gen():
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Chunk results are consumed in the order they were 
+                # submitted, so the output rows are in a deterministic order.
+                pending = deque()
+                for chunk in _chunked(items, chunksize):
+                    pending.append(executor.submit(_extract_chunk, 
+                        self.root_path, chunk, self.accepted_charsets, timed))
+                    if len(pending) >= 2 * workers:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+        return results_gen()
+
+    def extracted_rows(self, items, error_counter, rejected_charset_counter, 
+            workers=1, chunksize=500, timer=None):
+        """Generate a tuple (status, row, entry) for each 
+        (email_type, relpath, known_entry, source) tuple in `items` whose 
+        email could be read, where row is the CSV row 
+        [relpath, spam, subject, body] (None unless status is 
+        "extracted") and entry is the file's ManifestEntry. Emails that 
+        could not be read or extracted are counted in the Counters 
+        `error_counter` (keys "missing" and "encoding") and 
+        `rejected_charset_counter` (keys are charsets) as the rows are 
+        generated. If an ExtractionTimer `timer` is passed, the stage 
+        timings of each email are added to it."""
+        results = self.extraction_results(items, workers=workers, 
+            chunksize=chunksize, timed=timer is not None)
+        for relpath, status, value, entry, timing in results:
+            if timing is not None:
+                timer.add(timing)
+            filepath = self.root_path / relpath
+            if status == "missing":
+                error_counter["missing"] += 1
+                logger.error(f"Email at {filepath} could not be read: "
+                    f"{value!r}")
+                continue
+            if status == "encoding":
+                error_counter["encoding"] += 1
+                if "Unacceptable charset" in str(value):
+                    charset = str(value).split()[-1]
+                    rejected_charset_counter[charset] += 1
+                logger.debug(f"Email at {filepath} could not be extracted: "
+                    f"{value}")
+            yield status, value if status == "extracted" else None, entry
+
+    def create_csv(self, output_path, workers=1, chunksize=500, 
+            flush_every=1000, incremental=False, timing_report=None, 
+            slowest=20):
         """Process the emails in `self.root_path` into a CSV file 
-        `output_path`."""
+        `output_path`, and record each processed file in a manifest 
+        next to it. If `workers` is greater than 1, the emails are
+        extracted in parallel by that many worker processes, each 
+        handling chunks of `chunksize` emails at a time. Rows are 
+        written as soon as they are extracted, and the files are flushed
+        every `flush_every` rows. 
+        If `incremental` is True and both `output_path` and its manifest 
+        exist, only new or changed files are extracted, and the rows of 
+        the unchanged files are copied over from the existing CSV, in 
+        their place, so that the CSV is the same as after extracting all
+        the emails again.
+        If `timing_report` is passed, the time spent in each stage of 
+        extracting each email is recorded, and a JSON report with 
+        histograms of the stage timings and the `slowest` slowest emails 
+        is written to the path `timing_report` (see timing.py)."""
         if not output_path.parent.exists():
             raise FileNotFoundError(f"{output_path.parent} does not exist."
                 "Be sure 'output_path' is an existing directory.")
+        manifest_path = get_manifest_path(output_path)
+        merging = (incremental and output_path.exists() 
+            and manifest_path.exists())
+        if merging:
+            logger.info(f"Only extracting emails in {self.root_path} that "
+                f"changed according to the manifest {manifest_path}")
+            items = self.email_items(read_manifest(manifest_path))
+            previous_rows = _csv_row_offsets(output_path)
+        else:
+            if incremental:
+                logger.warning(f"{output_path} or its manifest does not "
+                    "exist. Extracting all emails.")
+            items = self.email_items()
         logger.info(f"Extracting emails from {self.root_path} into "
             f"{output_path}")
         logger.info(f"Opening/reading all email files in {self.root_path} "
             "This may take awhile...")
-        contents = []
         # Add counters for error types and rejected charsets
         error_counter = Counter({"missing": 0, "encoding": 0})
         rejected_charset_counter = Counter()
-        spam_encode = {1: "spam", 0: "ham"}
-
-        for email_type, relpath in self.email_list:
-            # Try to open the email, extract info from it, and add the info as
-            # row data for the CSV
-            filepath = self.root_path / relpath
-            logger.debug(f"Trying to extract {spam_encode[email_type]} email "
-                        f"at {filepath}")
-            try:
-                email_obj = email.message_from_bytes(filepath.read_bytes(),
-                                                    policy=default)
-            except (FileNotFoundError, OSError) as e:
-                error_counter["missing"] += 1
-                logger.exception(e)
-                continue
-            try:
-                email_data = extract_email_data(email_obj, 
-                    accepted_charsets=self.accepted_charsets)
-            except EmailEncodingError as e:
-                error_counter["encoding"] += 1
-                if "Unacceptable charset" in str(e):
-                    charset = str(e).split()[-1]
-                    rejected_charset_counter[charset] += 1
-                logger.debug(f"Email at {filepath} could not be extracted: "
-                    f"{e}")
-                continue
-            row = [relpath, email_type, *email_data]
-            contents.append(row)
+        timer = ExtractionTimer(slowest) if timing_report else None
+        rows = self.extracted_rows(items, error_counter, 
+            rejected_charset_counter, workers=workers, chunksize=chunksize,
+            timer=timer)
+        # When rows are kept from a previous extraction, write to temporary
+        # files that replace the originals only once they are complete.
+        if merging:
+            csv_out = output_path.with_name(output_path.name + ".tmp")
+            manifest_out = manifest_path.with_name(manifest_path.name + ".tmp")
+        else:
+            csv_out, manifest_out = output_path, manifest_path
+        column_names = ('path', 'spam', 'subject', 'body')
+        n_extracted = n_unchanged = n_lost = 0
+        with csv_out.open("wt", encoding="utf-8") as output_file, \
+                manifest_out.open("wt", encoding="utf-8") as manifest_file, \
+                ExitStack() as stack:
+            outputwriter = csv.writer(output_file, dialect='unix', 
+                escapechar="\\")
+            outputwriter.writerow(column_names)
+            entrywriter = manifest_writer(manifest_file)
+            if merging:
+                previous_file = stack.enter_context(output_path.open("rb"))
+            for status, row, entry in rows:
+                if status == "unchanged":
+                    n_unchanged += 1
+                    if entry.status == "extracted":
+                        offset = previous_rows.get(entry.path)
+                        if offset is None:
+                            # Extracted emails missing from the CSV (e.g. 
+                            # after an interrupted run) are left out of the 
+                            # manifest, so that the next incremental run 
+                            # extracts them again.
+                            n_lost += 1
+                            continue
+                        outputwriter.writerow(
+                            _read_csv_row(previous_file, offset))
+                    # Emails rejected the last time are still recorded in 
+                    # the manifest so that they are not processed again.
+                elif status == "extracted":
+                    outputwriter.writerow(row)
+                    n_extracted += 1
+                    if n_extracted % flush_every == 0:
+                        output_file.flush()
+                        manifest_file.flush()
+                        logger.debug(f"{n_extracted} emails written to "
+                            f"{output_path}")
+                entrywriter.writerow(entry)
+        if merging:
+            if n_lost:
+                logger.warning(f"{n_lost} emails recorded in the manifest "
+                    f"were not found in {output_path}. They will be "
+                    "extracted on the next incremental run.")
+            csv_out.replace(output_path)
+            manifest_out.replace(manifest_path)
+        if timer is not None:
+            timer.write_report(timing_report, corpus=str(self.root_path),
+                html_engine=HTML_TEXT_ENGINE, workers=workers)
         sorted_rejected_charset_counts = sorted(
             rejected_charset_counter.items(),
             key=lambda x: x[1], reverse=True
         )
-        logger.info(f"{len(contents)} out of {len(self.email_list)} emails "
-            f"extracted. ({error_counter['encoding']} were rejected for "
-            f"encoding reasons, {error_counter['missing']} referenced files "
-            f"not found in the root path)\nMost common rejected charsets:\n"
+        unchanged = f" and {n_unchanged} unchanged" if merging else ""
+        logger.info(f"{n_extracted} out of {len(self.email_list)} emails "
+            f"extracted{unchanged}. ({error_counter['encoding']} were "
+            f"rejected for encoding reasons, {error_counter['missing']} "
+            f"referenced files not found in the root path)\nMost common "
+            f"rejected charsets:\n"
             + "\n".join(
                 f"\t{charset}: {count}" 
                 for charset, count in sorted_rejected_charset_counts[:10]
             )
         )
-        column_names = ('path', 'spam', 'subject', 'body')
-        with output_path.open("wt", encoding="utf-8") as output_file:
-            outputwriter = csv.writer(output_file, dialect='unix', escapechar="\\")
-            outputwriter.writerow(column_names)
-            outputwriter.writerows(contents)
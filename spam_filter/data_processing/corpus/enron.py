@@ -21,7 +21,8 @@ from ..emailextract import ACCEPTED_CHARSETS
 #  ├─ williams-w3/
 #
 # If you extract each of the "raw" tarballs into a common directory,
-# this should be the result.
+# this should be the result. (In archive mode, root_path should instead be
+# the directory containing the "raw" tarballs themselves.)
 
 
 logger = logging.getLogger(__name__)
@@ -47,6 +48,10 @@ class EnronCorpusExtractor(BaseCorpusExtractor):
         ]}
     ]
 
+    def archive_relpath(self, member_name):
+        # Each "raw" tarball unpacks into a single directory of raw/
+        return f"raw/{member_name}"
+
     def get_index(self):
         index_path = __location__ / "_enron_index.csv"
         logger.info(f"Fetching index file from {index_path}")
@@ -0,0 +1,99 @@
+import logging
+import re
+
+import pandas as pd
+
+from .corpus_extractor import BaseCorpusExtractor, SPAM_ENCODE, \
+    CorpusDirectoryStructureError
+
+
+# Mailbox corpora (mbox files and Maildirs) are our own mail rather than a
+# labelled public corpus, so each message is labelled using
+# - a labels file (if one is passed): a csv file with columns "spam" (1 or
+#   "spam" for spam, 0 or "ham" for ham) and "path", where each path is
+#   relative to the root path and is either that of a single message, or of
+#   a folder (an mbox file, or a Maildir folder) labelling all the messages
+#   in it. The most specific path matching a message is used.
+# - otherwise, the name of the folder the message is in: messages in any
+#   folder (or subfolder of a folder) named in SPAM_FOLDER_NAMES, e.g.
+#   "Junk", "Spam.mbox", or the Maildir++ folder ".INBOX.Spam", are spam,
+#   and all other messages are ham.
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+SPAM_FOLDER_NAMES = ('spam', 'junk', 'junk e-mail', 'junk email', 'bulk mail')
+
+
+def folder_is_spam(folder):
+    """Return True if any part of the folder path `folder` (a string) is
+    named in SPAM_FOLDER_NAMES (ignoring case). Parts are separated by
+    '/' or '.' (as in Maildir++ folder names)."""
+    return any(part in SPAM_FOLDER_NAMES
+        for part in re.split(r'[/.]', folder.lower()))
+
+
+def read_labels(labels_path):
+    """Return a dict mapping each path in the labels file `labels_path` to
+    its label (1 for spam, 0 for ham)."""
+    logger.info(f"Fetching labels from {labels_path}")
+    labels = pd.read_csv(labels_path, sep=',', dtype="string")
+    spam_decode = {value: key for key, value in SPAM_ENCODE.items()}
+    spam_decode.update({str(key): key for key in SPAM_ENCODE})
+    spam = labels["spam"].str.lower().map(spam_decode)
+    if spam.isna().any():
+        raise ValueError(f"Unknown labels in {labels_path}: "
+            f"{labels['spam'][spam.isna()].unique().tolist()}")
+    return dict(zip(labels["path"].str.strip('/'), spam.astype(int)))
+
+
+class BaseMailboxExtractor(BaseCorpusExtractor):
+    """A base class for extracting email data from mailboxes, where (unlike
+    the public corpora) there is no index of the emails. Subclasses should
+    implement list_messages(). Messages are labelled using a labels file or
+    the names of their folders (see the comment at the top of this
+    module)."""
+
+    def __init__(self, root_path, email_list=None, archive=False,
+            labels_path=None):
+        """The argument `labels_path` is the path of an (optional) labels
+        file. Mailboxes can't be read in archive mode."""
+        if archive:
+            raise CorpusDirectoryStructureError(f"{type(self).__name__} "
+                "can't read emails from tarballs. Unpack them first.")
+        self.labels = read_labels(labels_path) if labels_path else {}
+        super().__init__(root_path, email_list=email_list)
+
+    def list_messages(self):
+        """The logic for this method will change based on the subclass.
+        It should return a list of tuples (folder, relpath) for each message
+        in the mailbox, where folder is the path of the mbox file or Maildir
+        folder containing the message and relpath is the path identifying
+        the message, both relative to self.root_path (as strings)."""
+        pass
+
+    def get_label(self, folder, relpath):
+        """Return the label (1 for spam, 0 for ham) of the message at
+        `relpath` in `folder`."""
+        if relpath in self.labels:
+            return self.labels[relpath]
+        parts = folder.split('/')
+        for i in range(len(parts), 0, -1):
+            label = self.labels.get('/'.join(parts[:i]))
+            if label is not None:
+                return label
+        return int(folder_is_spam(folder))
+
+    def get_index(self):
+        messages = self.list_messages()
+        logger.info(f"Found {len(messages)} messages in {self.root_path}")
+        index = pd.DataFrame({
+            "spam": [self.get_label(folder, relpath)
+                for folder, relpath in messages],
+            "path": [relpath for _, relpath in messages],
+        }, columns=["spam", "path"])
+        logger.info(f"{index['spam'].sum()} of the messages are labelled as "
+            "spam")
+        return index
@@ -0,0 +1,48 @@
+import logging
+import os
+from pathlib import Path
+
+from .mailbox_extractor import BaseMailboxExtractor
+
+
+# Expected maildir root_path/ structure:
+# root_path/
+# ├─ cur/
+# ├─ new/
+# ├─ tmp/
+# ├─ .Junk/
+# │  ├─ cur/
+# │  ├─ new/
+# │  ├─ tmp/
+# | ...
+#
+# i.e. a Maildir, possibly with Maildir++ subfolders (".Junk" etc.), or a
+# directory of Maildirs (nested folders, as in Dovecot's "fs" layout, also
+# work). Each message is a file in the cur/ or new/ directory of its
+# folder, so messages are read from their files just like the emails of
+# the public corpora.
+
+
+logger = logging.getLogger(__name__)
+
+
+class MaildirCorpusExtractor(BaseMailboxExtractor):
+
+    def list_messages(self):
+        messages = []
+        for dirpath, dirnames, filenames in os.walk(self.root_path):
+            dirnames.sort()
+            if not {'cur', 'new'}.issubset(dirnames):
+                continue
+            folder = Path(dirpath).relative_to(self.root_path).as_posix()
+            # Messages are in cur/ and new/; tmp/ holds partial deliveries.
+            for subdir in ('cur', 'new'):
+                for entry in sorted(os.scandir(Path(dirpath) / subdir),
+                                    key=lambda entry: entry.name):
+                    if entry.is_file() and not entry.name.startswith('.'):
+                        relpath = (f"{folder}/{subdir}/{entry.name}"
+                            if folder != '.' else f"{subdir}/{entry.name}")
+                        messages.append((folder, relpath))
+            dirnames[:] = [name for name in dirnames
+                if name not in ('cur', 'new', 'tmp')]
+        return messages
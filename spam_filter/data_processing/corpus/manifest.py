@@ -0,0 +1,55 @@
+import csv
+import hashlib
+import logging
+from collections import namedtuple
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# A manifest is a CSV file stored next to the output CSV of a corpus
+# extractor with one row for each email file that was processed (whether
+# or not the email could be extracted). Files that could not be read at
+# all are not recorded.
+MANIFEST_COLUMNS = ('path', 'spam', 'size', 'mtime', 'hash', 'status')
+ManifestEntry = namedtuple('ManifestEntry', MANIFEST_COLUMNS)
+
+
+def content_hash(data):
+    """Return a hex digest of the bytes `data` for the manifest."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def get_manifest_path(output_path):
+    """Return the path of the manifest for the CSV file `output_path`,
+    e.g. enron.manifest.csv for enron.csv"""
+    return output_path.with_name(f"{output_path.stem}.manifest.csv")
+
+
+def read_manifest(path):
+    """Return a dict mapping the relative path of each email file
+    recorded in the manifest at `path` to its ManifestEntry."""
+    manifest = {}
+    with path.open("rt", encoding="utf-8", newline='') as manifest_file:
+        reader = csv.reader(manifest_file, dialect='unix', escapechar="\\")
+        header = next(reader, None)
+        if tuple(header or ()) != MANIFEST_COLUMNS:
+            raise ValueError(f"{path} is not a valid manifest file")
+        try:
+            for relpath, spam, size, mtime, digest, status in reader:
+                manifest[relpath] = ManifestEntry(relpath, int(spam),
+                    int(size), int(mtime), digest, status)
+        except (csv.Error, ValueError) as e:
+            # A run that was interrupted can leave a truncated last row.
+            logger.warning(f"Stopped reading manifest {path} early: {e}")
+    logger.debug(f"Read {len(manifest)} entries from manifest {path}")
+    return manifest
+
+
+def manifest_writer(manifest_file):
+    """Return a csv writer for `manifest_file`, with the header already
+    written."""
+    writer = csv.writer(manifest_file, dialect='unix', escapechar="\\")
+    writer.writerow(MANIFEST_COLUMNS)
+    return writer
@@ -0,0 +1,127 @@
+import logging
+import mmap
+from collections import namedtuple
+from functools import lru_cache
+
+from .corpus_extractor import CorpusDirectoryStructureError
+from .mailbox_extractor import BaseMailboxExtractor
+
+
+# Expected mbox root_path/ structure:
+# root_path/
+# ├─ Inbox
+# ├─ Junk.mbox
+# ├─ Archive/
+# │  ├─ 2022
+# | ...
+#
+# i.e. a directory of mbox files (possibly in subdirectories), or a single
+# mbox file. Any file starting with a "From " line is taken to be an mbox
+# file. Each message is identified by the path of its mbox file and its
+# number in that file, e.g. "Archive/2022#17".
+# Every mbox file is memory-mapped and scanned for "From " lines once to
+# build an index of the offsets of its messages. Each message is then
+# sliced out of the memory-mapped file (in the worker processes, if there
+# are any) without reading or copying the rest of the file.
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=32)
+def _open_mmap(path):
+    """Return a read-only memory map of the file at `path`, kept open for
+    the lifetime of the process."""
+    with path.open("rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MboxSlice(namedtuple('MboxSlice', ['path', 'start', 'end', 'mtime'])):
+    """The location of a message in an mbox file, used as the source of an
+    email (see corpus_extractor._load_source)."""
+
+    def load(self):
+        """Return a tuple (data, mtime) where data is a memoryview of the
+        message in the memory-mapped mbox file."""
+        data = memoryview(_open_mmap(self.path))[self.start:self.end]
+        return data, self.mtime
+
+
+def message_spans(mbox_map):
+    """Return a list of tuples (start, end) of the offsets of each message
+    in the memory-mapped mbox file `mbox_map`. As in the mailbox module, a
+    message excludes its "From " line and the blank line separating it from
+    the next message (or ending the file)."""
+    from_lines = [0]
+    while (pos := mbox_map.find(b"\nFrom ", from_lines[-1])) != -1:
+        from_lines.append(pos + 1)
+    ends = from_lines[1:] + [len(mbox_map)]
+    spans = []
+    for from_line, end in zip(from_lines, ends):
+        start = mbox_map.find(b"\n", from_line, end) + 1 or end
+        if mbox_map[end - 2:end] == b"\n\n":
+            end -= 1
+        spans.append((start, end))
+    return spans
+
+
+def is_mbox_file(path):
+    """Return True if `path` is a file starting with a "From " line."""
+    if not path.is_file():
+        return False
+    with path.open("rb") as f:
+        return f.read(5) == b"From "
+
+
+class MboxCorpusExtractor(BaseMailboxExtractor):
+
+    def __init__(self, root_path, email_list=None, archive=False,
+            labels_path=None):
+        # The offset index of the messages, built once by index_messages()
+        self.message_slices = None
+        super().__init__(root_path, email_list=email_list, archive=archive,
+            labels_path=labels_path)
+
+    def mbox_paths(self):
+        """Return a sorted list of the mbox files at self.root_path."""
+        if self.root_path.is_file():
+            if not is_mbox_file(self.root_path):
+                raise CorpusDirectoryStructureError(f"{self.root_path} is "
+                    "not an mbox file")
+            return [self.root_path]
+        return sorted(path for path in self.root_path.rglob('*')
+            if is_mbox_file(path))
+
+    def index_messages(self):
+        """Build the offset index self.message_slices, mapping the relative
+        path of each message to its MboxSlice, if not built yet."""
+        if self.message_slices is not None:
+            return self.message_slices
+        self.message_slices = {}
+        for path in self.mbox_paths():
+            folder = (path.name if path == self.root_path
+                else path.relative_to(self.root_path).as_posix())
+            logger.debug(f"Indexing messages in {path}")
+            mtime = path.stat().st_mtime_ns
+            spans = message_spans(_open_mmap(path))
+            for i, (start, end) in enumerate(spans):
+                self.message_slices[f"{folder}#{i}"] = MboxSlice(path, start,
+                    end, mtime)
+        return self.message_slices
+
+    def list_messages(self):
+        return [(relpath.rpartition('#')[0], relpath)
+            for relpath in self.index_messages()]
+
+    def email_source(self, relpath):
+        try:
+            return self.index_messages()[relpath]
+        except KeyError:
+            return FileNotFoundError(f"{relpath} not found in "
+                f"{self.root_path}")
+
+    def email_stat(self, relpath):
+        source = self.index_messages().get(relpath)
+        if source is None:
+            raise FileNotFoundError(f"{relpath} not found in {self.root_path}")
+        return source.end - source.start, source.mtime
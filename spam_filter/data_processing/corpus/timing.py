@@ -0,0 +1,94 @@
+import heapq
+import json
+import logging
+from bisect import bisect_right
+from itertools import count
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# The stages of extracting an email that are timed (see _extract_email):
+# - read: reading the raw bytes of the email (and hashing them)
+# - parse: parsing the bytes into an EmailMessage
+# - check: checking the content type and charset of each part
+# - decode: decoding the text parts
+# - html: extracting the text of the text/html parts
+TIMED_STAGES = ('read', 'parse', 'check', 'decode', 'html')
+
+# Upper edges (s) of the histogram bins of each stage: 10 µs to 10 s in
+# steps of a factor of about 3, plus a last bin for anything slower.
+HISTOGRAM_EDGES = tuple(round(10 ** (exponent / 2), 10)
+    for exponent in range(-10, 3))
+
+
+class ExtractionTimer:
+    """Collects the stage timings of each extracted email (as returned by
+    _extract_email when timing is enabled), keeping only per-stage totals,
+    histograms, and the `slowest` slowest emails, so that the memory used
+    does not depend on the size of the corpus."""
+
+    def __init__(self, slowest=20):
+        self.slowest = slowest
+        self.n_emails = 0
+        self.totals = {stage: 0.0 for stage in TIMED_STAGES}
+        self.maxima = {stage: 0.0 for stage in TIMED_STAGES}
+        self.histograms = {stage: [0] * (len(HISTOGRAM_EDGES) + 1)
+            for stage in TIMED_STAGES}
+        self.status_counts = {}
+        # Min-heap of (total, tiebreaker, record) of the slowest emails
+        self._slowest_heap = []
+        self._tiebreaker = count()
+
+    def add(self, record):
+        """Add the timing record (a dict with the time (s) of each stage in
+        TIMED_STAGES that was reached, and 'path', 'size', 'status' and
+        'content_types') of a single email."""
+        self.n_emails += 1
+        self.status_counts[record['status']] = \
+            self.status_counts.get(record['status'], 0) + 1
+        total = 0.0
+        for stage in TIMED_STAGES:
+            seconds = record.get(stage, 0.0)
+            total += seconds
+            self.totals[stage] += seconds
+            self.maxima[stage] = max(self.maxima[stage], seconds)
+            if stage in record:
+                self.histograms[stage][
+                    bisect_right(HISTOGRAM_EDGES, seconds)] += 1
+        item = (total, next(self._tiebreaker), {**record, 'total': total})
+        if len(self._slowest_heap) < self.slowest:
+            heapq.heappush(self._slowest_heap, item)
+        elif total > self._slowest_heap[0][0]:
+            heapq.heapreplace(self._slowest_heap, item)
+
+    def report(self, **info):
+        """Return the timing report as a dict (which can be serialized as
+        JSON). Any keyword arguments are included in it as they are, e.g.
+        to record the settings used for the extraction."""
+        return {
+            **info,
+            'n_emails': self.n_emails,
+            'statuses': self.status_counts,
+            'stages': {stage: {
+                'total_s': self.totals[stage],
+                'mean_ms': 1000 * self.totals[stage] / max(self.n_emails, 1),
+                'max_ms': 1000 * self.maxima[stage],
+                'histogram': {
+                    'upper_edges_s': [*HISTOGRAM_EDGES, None],
+                    'counts': self.histograms[stage],
+                },
+            } for stage in TIMED_STAGES},
+            'slowest': [record for _, _, record
+                in sorted(self._slowest_heap, reverse=True)],
+        }
+
+    def write_report(self, path, **info):
+        """Write the timing report (see report) to the JSON file `path`."""
+        report = self.report(**info)
+        with path.open("wt", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+        logger.info(f"Timing report written to {path}. Total time per stage: "
+            + ", ".join(f"{stage} {stats['total_s']:.1f} s"
+                for stage, stats in report['stages'].items()))
@@ -1,4 +1,5 @@
 import logging
+import io
 
 import pandas as pd
 
@@ -29,10 +30,23 @@ class TrecCorpusExtractor(BaseCorpusExtractor):
         ]}
     ]
 
+    archive_index_relpath = "full/index"
+
     def get_index(self):
+        if self.archive:
+            # Only used if get_index is called directly: extracting from the
+            # archive reads the index in the same pass as the emails
+            logger.info(f"Fetching index file full/index from archive "
+                f"{self.root_path}")
+            return self.read_index(
+                io.BytesIO(self.read_archive_file("full/index")))
         index_path = self.root_path / "full" / "index"
         logger.info(f"Fetching index file from {index_path}")
-        index = pd.read_csv(index_path, sep=' ', dtype="string", header=None, 
+        with index_path.open("rb") as index_file:
+            return self.read_index(index_file)
+
+    def read_index(self, index_file):
+        index = pd.read_csv(index_file, sep=' ', dtype="string", header=None, 
                             names=["spam", "path"])
         index["spam"] = index["spam"].map({"spam": 1, "ham": 0})
         index["path"] = index["path"].str.removeprefix("../")
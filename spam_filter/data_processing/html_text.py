@@ -0,0 +1,151 @@
+from html.parser import HTMLParser
+from html.entities import html5
+
+
+# Extracting the text of an HTML document in a single streaming pass,
+# without building a tree. The text is the same as that returned by
+# BeautifulSoup(content, features="html.parser").get_text() (for
+# beautifulsoup4 4.11), so the two can be used interchangeably:
+# - Character and entity references are converted as BeautifulSoup does.
+# - A run of text containing only ASCII whitespace is replaced by a single
+#   newline (if it contains one) or space, except inside <pre>/<textarea>.
+# - Comments, declarations, processing instructions, and the contents of
+#   <script>, <style>, <template>, <rt> and <rp> tags are left out, but
+#   CDATA sections are kept.
+
+
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img',
+    'input', 'keygen', 'link', 'menuitem', 'meta', 'param', 'source',
+    'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image',
+    'isindex', 'nextid', 'spacer'])
+PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+EXCLUDED_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def _entity_characters():
+    """Return a dict mapping HTML5 entity names (without the trailing ';')
+    to the characters they represent."""
+    characters = {}
+    for name, character in sorted(html5.items()):
+        characters.setdefault(name.removesuffix(';'), character)
+    return characters
+
+
+ENTITY_CHARACTERS = _entity_characters()
+
+
+class HTMLTextParser(HTMLParser):
+    """An HTMLParser that collects the text of the document it is fed
+    (see html_to_text)."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.text = []
+        self._run = []
+        self._open_tags = []
+        # Void tags opened with <tag>, whose next </tag> or <tag/> is ignored
+        self._closed_void_tags = []
+        self._n_excluding = 0
+        self._n_preserving = 0
+
+    def _end_run(self):
+        """Add the text collected since the last tag (or comment, etc.)
+        to self.text, unless inside a tag whose text is excluded."""
+        if not self._run:
+            return
+        run = ''.join(self._run)
+        self._run = []
+        if not self._n_preserving and not run.strip(ASCII_SPACES):
+            run = '\n' if '\n' in run else ' '
+        if not self._n_excluding:
+            self.text.append(run)
+
+    def _close_tag(self, tag):
+        if tag not in self._open_tags:
+            return
+        while True:
+            name = self._open_tags.pop()
+            self._n_excluding -= name in EXCLUDED_TEXT_TAGS
+            self._n_preserving -= name in PRESERVE_WHITESPACE_TAGS
+            if name == tag:
+                break
+
+    def handle_starttag(self, tag, attrs, startend=False):
+        self._end_run()
+        self._open_tags.append(tag)
+        self._n_excluding += tag in EXCLUDED_TEXT_TAGS
+        self._n_preserving += tag in PRESERVE_WHITESPACE_TAGS
+        if tag in VOID_TAGS and not startend:
+            self._close_tag(tag)
+            self._closed_void_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # As in BeautifulSoup, <tag/> is left open if it is the end of a
+        # void tag opened with <tag>.
+        self.handle_starttag(tag, attrs, startend=True)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void_tags:
+            # Ignored altogether, so the text around it is a single run
+            self._closed_void_tags.remove(tag)
+        else:
+            self._end_run()
+            self._close_tag(tag)
+
+    def handle_data(self, data):
+        self._run.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in 'xX':
+            codepoint = int(name[1:], 16)
+        else:
+            codepoint = int(name)
+        data = None
+        if codepoint < 256:
+            try:
+                data = bytes([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self._run.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self._run.append(ENTITY_CHARACTERS.get(name, f"&{name}"))
+
+    def handle_comment(self, data):
+        self._end_run()
+
+    def handle_decl(self, decl):
+        self._end_run()
+
+    def handle_pi(self, data):
+        self._end_run()
+
+    def unknown_decl(self, data):
+        self._end_run()
+        if data.upper().startswith('CDATA['):
+            # CDATA sections are kept, even inside excluded tags
+            n_excluding, self._n_excluding = self._n_excluding, 0
+            self._run.append(data[len('CDATA['):])
+            self._end_run()
+            self._n_excluding = n_excluding
+
+    def close(self):
+        super().close()
+        self._end_run()
+
+
+def html_to_text(content):
+    """Return the text contents of the HTML string `content`, the same as
+    BeautifulSoup(content, features="html.parser").get_text(), but in a
+    single pass without building a tree."""
+    parser = HTMLTextParser()
+    parser.feed(content)
+    parser.close()
+    return ''.join(parser.text)
@@ -1,4 +1,7 @@
 from .data_loading import load_train_test_csvs, load_train_test_classes, \
     load_train_test_docs
 from .email_cleaning_pipelines import email_cleaning, corpus_prep
-from .test_set_creation import split_train_test_by_id
+from .test_set_creation import split_train_test_by_id, add_hash_buckets, \
+    split_train_test_by_bucket, cv_folds
+from .corpus_store import write_corpus_store, read_corpus_store
+from .streaming import stream_train_test_csvs, read_streamed_train_test
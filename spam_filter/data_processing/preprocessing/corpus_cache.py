@@ -0,0 +1,149 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from .corpus_store import store_path, _write_npz, _read_npz
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# Increase this to invalidate every cached corpus (e.g. after changing the
+# preprocessing in a way the key below doesn't capture).
+CACHE_VERSION = 2
+# The index of the cached dataframes
+INDEX_NAMES = ['corpus', 'path']
+# The directory of the preprocessing package, whose source is part of the
+# cache key: the steps of the pipeline call helpers in other modules of it
+# (e.g. near_duplicates.py, ngram_detector.py, language_cache.py and
+# corpus_store.py), which must also invalidate the cache when they change.
+PREPROCESSING_PATH = Path(__file__).parent
+# The arguments of the steps' functions that only change how the result is
+# computed (e.g. with how many processes, or with which language cache),
+# not the result itself, so they aren't part of the cache key.
+EXECUTION_PARAMS = frozenset({'workers', 'cache_path'})
+
+
+def source_hash(path):
+    """Return a hash (a hex string) of the names and contents of the Python
+    source files in the directory `path`."""
+    sha256 = hashlib.sha256()
+    for source_path in sorted(path.glob('*.py')):
+        sha256.update(source_path.name.encode('utf-8') + b'\0')
+        sha256.update(source_path.read_bytes() + b'\0')
+    return sha256.hexdigest()
+
+
+def describe_pipeline(estimator):
+    """Return a description (that can be serialized as JSON) of the
+    configuration of the preprocessing pipeline `estimator`: its steps, and
+    for each function they apply, its name, keyword arguments and default
+    arguments (which include the settings it uses; except those in
+    EXECUTION_PARAMS), and a hash of the source of its module (so that
+    changing the code also changes the description)."""
+    if isinstance(estimator, Pipeline):
+        return [[name, describe_pipeline(step)]
+            for name, step in estimator.steps]
+    if isinstance(estimator, FunctionTransformer):
+        func = estimator.func
+        source = inspect.getsource(sys.modules[func.__module__])
+        return {
+            'func': f"{func.__module__}.{func.__qualname__}",
+            'kw_args': {name: value for name, value
+                in (estimator.kw_args or {}).items()
+                if name not in EXECUTION_PARAMS},
+            'defaults': {name: parameter.default for name, parameter
+                in inspect.signature(func).parameters.items()
+                if parameter.default is not parameter.empty
+                and name not in EXECUTION_PARAMS},
+            'source': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+        }
+    return repr(estimator)
+
+
+def cache_key(path, corpus_names, store_format, pipeline, **params):
+    """Return the key (a hex string) of the result of running `pipeline` on
+    the corpora `corpus_names` in `path` loaded from the corpus store in
+    `store_format`, with any other `params` that affect the result (e.g. the
+    test ratio). The corpus store files are identified by their name, size
+    and modification time, so that they don't have to be read. The key also
+    depends on CACHE_VERSION and on the source of every module of the
+    preprocessing package (see source_hash)."""
+    files = []
+    for corpus_name, filename in corpus_names.items():
+        stat = store_path(path / filename, store_format).stat()
+        files.append([corpus_name, filename, stat.st_size, stat.st_mtime_ns])
+    description = {
+        'version': CACHE_VERSION,
+        'source': source_hash(PREPROCESSING_PATH),
+        'files': files,
+        'store_format': store_format,
+        'pipeline': describe_pipeline(pipeline),
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True,
+        default=repr).encode('utf-8')).hexdigest()[:32]
+
+
+class CorpusCache:
+    """A cache (a directory at `path`) of preprocessed corpora, i.e. of
+    named dataframes indexed by (corpus, path). Each entry has a `kind`
+    (e.g. 'cleaned') and a key (see cache_key), and is stored as one npz
+    file per dataframe plus a json file listing them, which is written last,
+    so that an entry is only used if it was completely written. Only the
+    latest entry of each kind is kept."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _manifest_path(self, kind, key):
+        return self.path / f"{kind}_{key}.json"
+
+    def _frame_path(self, kind, key, name):
+        return self.path / f"{kind}_{key}_{name}.npz"
+
+    def load(self, kind, key):
+        """Return a dict of the dataframes of the entry (`kind`, `key`), or
+        None if it isn't in the cache."""
+        manifest_path = self._manifest_path(kind, key)
+        if not manifest_path.exists():
+            return None
+        with manifest_path.open("rt", encoding="utf-8") as manifest_file:
+            names = json.load(manifest_file)['frames']
+        logger.info(f"Loading the cached {kind} corpus {key} from {self.path}")
+        frames = {}
+        for name in names:
+            df = _read_npz(self._frame_path(kind, key, name))
+            for column in INDEX_NAMES:
+                df[column] = df[column].astype('string')
+            frames[name] = df.set_index(INDEX_NAMES)
+        return frames
+
+    def save(self, kind, key, frames):
+        """Store the dict of dataframes `frames` as the entry (`kind`,
+        `key`), and remove any other entries of the same kind."""
+        logger.info(f"Caching the {kind} corpus {key} in {self.path}")
+        for old_manifest in self.path.glob(f"{kind}_*.json"):
+            old_manifest.unlink()
+        for old_frame in self.path.glob(f"{kind}_*.npz"):
+            old_frame.unlink()
+        for name, df in frames.items():
+            frame_path = self._frame_path(kind, key, name)
+            temp_path = frame_path.with_name(frame_path.name + '.tmp')
+            with temp_path.open("wb") as frame_file:
+                _write_npz(df.reset_index(), frame_file)
+            os.replace(temp_path, frame_path)
+        manifest_path = self._manifest_path(kind, key)
+        temp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        with temp_path.open("wt", encoding="utf-8") as manifest_file:
+            json.dump({'frames': list(frames)}, manifest_file)
+        os.replace(temp_path, manifest_path)
@@ -0,0 +1,202 @@
+import logging
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from ..settings import CORPUS_STORE_FORMAT
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# The corpus store holds the same columns as the csv files created by
+# `extract_from_corpus.py`. Each columnar file is stored next to its csv
+# file, with the same name and the extension of its format.
+STORE_COLUMNS = ('path', 'spam', 'subject', 'body')
+STORE_DTYPES = {"path": "string", "spam": "bool", "subject": "string",
+    "body": "string"}
+STORE_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet',
+    'feather': '.feather', 'npz': '.npz'}
+
+
+class CorpusStoreError(Exception):
+    pass
+
+
+def store_path(csv_path, store_format=CORPUS_STORE_FORMAT):
+    """Return the path of the corpus store file in `store_format` for the
+    corpus csv file `csv_path`."""
+    if store_format not in STORE_EXTENSIONS:
+        raise CorpusStoreError(f"Unknown corpus store format {store_format}. "
+            f"Choose from {tuple(STORE_EXTENSIONS)}.")
+    return csv_path.with_suffix(STORE_EXTENSIONS[store_format])
+
+
+def _check_pyarrow(store_format):
+    """Raise a CorpusStoreError if pyarrow (needed by pandas for the 
+    parquet and feather formats) is not installed."""
+    if find_spec("pyarrow") is None:
+        raise CorpusStoreError(f"The '{store_format}' corpus store format "
+            "requires pyarrow. Install it, or use the 'npz' format instead.")
+
+
+def _write_npz(df, path):
+    """Save the DataFrame `df` to `path` (or a file object) with each string
+    column stored as a single utf-8 buffer, an array of character offsets 
+    and a null mask, so that it can be loaded without parsing. Other 
+    (numeric) columns are stored as they are."""
+    arrays = {}
+    for column in df.columns:
+        if column == 'spam':
+            arrays['spam'] = df['spam'].to_numpy(dtype=bool)
+            continue
+        if pd.api.types.is_numeric_dtype(df[column]):
+            arrays[column] = df[column].to_numpy()
+            continue
+        series = df[column]
+        mask = series.isna().to_numpy()
+        values = series.fillna('').astype(str).tolist()
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in values], out=offsets[1:])
+        arrays[f'{column}.data'] = np.frombuffer(
+            ''.join(values).encode('utf-8'), dtype=np.uint8)
+        arrays[f'{column}.offsets'] = offsets
+        arrays[f'{column}.mask'] = mask
+    np.savez(path, **arrays)
+
+
+def _read_npz(path, columns=None):
+    """Load the `columns` (all if None) of a corpus store saved by 
+    _write_npz. Only the arrays of the requested columns are read from the
+    file."""
+    data = {}
+    with np.load(path) as npz:
+        if columns is None:
+            columns = list(dict.fromkeys(name.split('.')[0] 
+                for name in npz.files))
+        for column in columns:
+            if column in npz.files:
+                data[column] = npz[column]
+                continue
+            text = str(npz[f'{column}.data'], 'utf-8')
+            offsets = npz[f'{column}.offsets'].tolist()
+            values = [text[start:end]
+                for start, end in zip(offsets[:-1], offsets[1:])]
+            values = pd.array(values, dtype="string")
+            values[npz[f'{column}.mask']] = pd.NA
+            data[column] = values
+    return pd.DataFrame(data)
+
+
+def _iter_npz(path, columns, chunksize):
+    """Yield the `columns` of a corpus store saved by _write_npz as 
+    DataFrames of `chunksize` rows. Each text column is held in memory as
+    a single string (much smaller than a string object per row), and only 
+    split into rows one chunk at a time."""
+    with np.load(path) as npz:
+        arrays = {}
+        for column in columns:
+            if column in npz.files:
+                arrays[column] = npz[column]
+            else:
+                arrays[column] = (str(npz[f'{column}.data'], 'utf-8'),
+                    npz[f'{column}.offsets'], npz[f'{column}.mask'])
+    n_rows = len(next(iter(arrays.values()))[-1])
+    for start in range(0, n_rows, chunksize):
+        end = min(start + chunksize, n_rows)
+        data = {}
+        for column, array in arrays.items():
+            if not isinstance(array, tuple):
+                data[column] = array[start:end]
+                continue
+            text, offsets, mask = array
+            offsets = offsets[start:end + 1].tolist()
+            values = pd.array([text[first:last] 
+                for first, last in zip(offsets[:-1], offsets[1:])], 
+                dtype="string")
+            values[mask[start:end]] = pd.NA
+            data[column] = values
+        yield pd.DataFrame(data, index=pd.RangeIndex(start, end))
+
+
+def write_corpus_store(csv_path, store_format=CORPUS_STORE_FORMAT):
+    """Convert the corpus csv file `csv_path` (as created by
+    `extract_from_corpus.py`) into a corpus store file in `store_format`
+    next to it. Returns the path of the store file."""
+    output_path = store_path(csv_path, store_format)
+    if store_format == 'csv':
+        return output_path
+    logger.info(f"Converting {csv_path} to {output_path}")
+    df = pd.read_csv(csv_path, dtype=STORE_DTYPES)
+    if store_format == 'parquet':
+        _check_pyarrow(store_format)
+        df.to_parquet(output_path, index=False)
+    elif store_format == 'feather':
+        _check_pyarrow(store_format)
+        df.to_feather(output_path)
+    else:
+        _write_npz(df, output_path)
+    return output_path
+
+
+def read_corpus_store(csv_path, columns=None,
+        store_format=CORPUS_STORE_FORMAT):
+    """Load the corpus store file in `store_format` for the corpus csv
+    file `csv_path` as a DataFrame. If `columns` is passed, only those
+    columns are read (in the order of STORE_COLUMNS)."""
+    columns = [column for column in STORE_COLUMNS
+        if columns is None or column in columns]
+    path = store_path(csv_path, store_format)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} does not exist. (Have you run "
+            f"extract_from_corpus.py with CORPUS_STORE_FORMAT "
+            f"'{store_format}' yet?)")
+    if store_format == 'csv':
+        return pd.read_csv(path, usecols=columns,
+            dtype={column: STORE_DTYPES[column] for column in columns})
+    if store_format == 'parquet':
+        _check_pyarrow(store_format)
+        df = pd.read_parquet(path, columns=columns)
+    elif store_format == 'feather':
+        _check_pyarrow(store_format)
+        df = pd.read_feather(path, columns=columns)
+    else:
+        df = _read_npz(path, columns)
+    return df.astype({column: STORE_DTYPES[column] for column in columns})
+
+
+def iter_corpus_store(csv_path, chunksize, columns=None,
+        store_format=CORPUS_STORE_FORMAT):
+    """Yield the corpus store file in `store_format` for the corpus csv file
+    `csv_path` (see read_corpus_store) as DataFrames of (at most) 
+    `chunksize` rows, without loading all its rows at once."""
+    columns = [column for column in STORE_COLUMNS
+        if columns is None or column in columns]
+    path = store_path(csv_path, store_format)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} does not exist. (Have you run "
+            f"extract_from_corpus.py with CORPUS_STORE_FORMAT "
+            f"'{store_format}' yet?)")
+    dtypes = {column: STORE_DTYPES[column] for column in columns}
+    if store_format == 'csv':
+        with pd.read_csv(path, usecols=columns, dtype=dtypes, 
+                chunksize=chunksize) as reader:
+            yield from reader
+        return
+    if store_format == 'parquet':
+        _check_pyarrow(store_format)
+        import pyarrow.parquet as pq
+        batches = (batch.to_pandas() for batch in pq.ParquetFile(path)
+            .iter_batches(batch_size=chunksize, columns=columns))
+    elif store_format == 'feather':
+        _check_pyarrow(store_format)
+        import pyarrow.feather as feather
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        batches = (table.slice(start, chunksize).to_pandas()
+            for start in range(0, table.num_rows, chunksize))
+    else:
+        batches = _iter_npz(path, columns, chunksize)
+    for batch in batches:
+        yield batch.astype(dtypes)
@@ -3,32 +3,37 @@ import logging
 import pandas as pd
 
 from .email_cleaning_pipelines import corpus_prep
-from .test_set_creation import split_train_test_by_id
-from ..spacy import load_docbins, DocBinError
+from .test_set_creation import add_hash_buckets, split_train_test_by_bucket
+from .corpus_store import read_corpus_store
+from .corpus_cache import CorpusCache, cache_key
 from ..settings import CORPORA_CSV_PATH, CORPUS_FILENAMES, TEST_RATIO, \
-    DOCBIN_PATH, DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES
+    DOCBIN_PATH, DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES, \
+    CORPUS_STORE_FORMAT, CLEANED_CORPUS_CACHE_PATH
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-def load_corpora_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES):
+def load_corpora_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES,
+        columns=None, store_format=CORPUS_STORE_FORMAT):
     """Load email corpora in path (from csv files with fields 
     `path` (str), `spam` (bool encoded as 0, 1), `subject` (str), 
-    `body` (str)) as a pandas dataframe. The argument `corpus_names`
-    is a dict-like object of corpus names and filenames in `path`.
-    The returned dataframe has indices (corpus, path)."""
-    logger.info(f"Loading all csvs at {path} with names and files "
-        f"{corpus_names} and concatenating them into a single pandas "
-        "DataFrame.\nDepening on the size of the csvs, this could take "
-        "a while...")
+    `body` (str), or the corpus store files in `store_format` created 
+    from them) as a pandas dataframe. The argument `corpus_names`
+    is a dict-like object of corpus names and (csv) filenames in `path`.
+    If `columns` is passed, only those of `spam`, `subject` and `body`
+    are loaded. The returned dataframe has indices (corpus, path)."""
+    logger.info(f"Loading all {store_format} corpus files at {path} with "
+        f"names and files {corpus_names} and concatenating them into a "
+        "single pandas DataFrame.\nDepening on the size of the files, this "
+        "could take a while...")
+    if columns is not None:
+        columns = ['path', *columns]
     def corpora_gen():
         for corpus_name, filename in corpus_names.items():
-            df = pd.read_csv(path / filename, 
-                dtype={"path": "string", "spam": "bool", 
-                       "subject": "string", "body": "string"}
-                )
+            df = read_corpus_store(path / filename, columns=columns, 
+                store_format=store_format)
             df.insert(0, 'corpus', corpus_name)
             df['corpus'] = df['corpus'].astype('string')
             df.set_index(['corpus', 'path'], inplace=True)
@@ -36,19 +41,46 @@ def load_corpora_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES):
     return pd.concat(corpora_gen())
 
 
-def cleaned_corpora_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES):
-    """Load email corpora, transformed with the corpus_prep pipeline"""
-    return corpus_prep.transform(load_corpora_csvs(path, corpus_names))
+def cleaned_corpora_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES,
+        cache_path=CLEANED_CORPUS_CACHE_PATH):
+    """Load email corpora, transformed with the corpus_prep pipeline.
+    If `cache_path` is not None, the result is kept in the corpus cache 
+    (a directory) at `cache_path`, and loaded from there as long as the 
+    corpus files and the configuration of corpus_prep haven't changed."""
+    if cache_path is None:
+        return corpus_prep.transform(load_corpora_csvs(path, corpus_names))
+    cache = CorpusCache(cache_path)
+    key = cache_key(path, corpus_names, CORPUS_STORE_FORMAT, corpus_prep)
+    cached = cache.load('cleaned', key)
+    if cached is not None:
+        return cached['emails']
+    emails = corpus_prep.transform(load_corpora_csvs(path, corpus_names))
+    cache.save('cleaned', key, {'emails': emails})
+    return emails
 
 
 def load_train_test_csvs(path=CORPORA_CSV_PATH, corpus_names=CORPUS_FILENAMES, 
-        test_ratio=TEST_RATIO):
+        test_ratio=TEST_RATIO, cache_path=CLEANED_CORPUS_CACHE_PATH):
     """Load email corpora, transformed with the corpus_prep pipeline,
-    in two sets: a training set and a test set."""
-    train_set, test_set = split_train_test_by_id(
-        cleaned_corpora_csvs(path, corpus_names), test_ratio, "path", 
-        string_id=True, id_from_index=True
+    in two sets: a training set and a test set (split by the hash bucket
+    of their paths, which is kept in their 'bucket' column, e.g. for making
+    cross-validation folds with cv_folds). If `cache_path` is not
+    None, the two sets are kept in the corpus cache at `cache_path` (see 
+    cleaned_corpora_csvs), also keyed by `test_ratio`."""
+    if cache_path is not None:
+        cache = CorpusCache(cache_path)
+        key = cache_key(path, corpus_names, CORPUS_STORE_FORMAT, corpus_prep,
+            test_ratio=test_ratio)
+        cached = cache.load('train_test', key)
+        if cached is not None:
+            return cached['train'], cached['test']
+    train_set, test_set = split_train_test_by_bucket(
+        add_hash_buckets(cleaned_corpora_csvs(path, corpus_names, 
+            cache_path=None), "path", string_id=True, id_from_index=True), 
+        test_ratio
     )
+    if cache_path is not None:
+        cache.save('train_test', key, {'train': train_set, 'test': test_set})
     return train_set, test_set
 
 
@@ -77,14 +109,20 @@ def load_train_test_classes(path=SPAM_CLASS_PATH,
 
 
 def load_train_test_docs(train_classes, test_classes, path=DOCBIN_PATH, 
-        docbin_names=DOCBIN_FILENAMES):
-    """Load email corpora data as two DataFrames of spacy Docs."""
+        docbin_names=DOCBIN_FILENAMES, lazy=False):
+    """Load email corpora data as two DataFrames of spacy Docs. If `lazy`,
+    return two dicts of DocBinViews ('subject_doc' and 'body_doc') instead,
+    which load the docs one shard at a time when iterated over. The docs
+    of a view are in the order of its index (the same for the subject and
+    the body), by which the classes can be reindexed."""
+    from ..spacy import load_docbins, DocBinError, DocBinView
     params = {'index_names': ('corpus', 'path'), 
         'index_dtypes': ('string', 'string')}
+    load = DocBinView if lazy else load_docbins
     # Load the training set docs
-    train_sub_docs = load_docbins(path / docbin_names['train']['subject'], 
+    train_sub_docs = load(path / docbin_names['train']['subject'], 
         **params)
-    train_body_docs = load_docbins(path / docbin_names['train']['body'], 
+    train_body_docs = load(path / docbin_names['train']['body'], 
         **params)
     # Check that the docs indeed match the index of the training classes series
     for docset in [train_sub_docs, train_body_docs]:
@@ -95,9 +133,9 @@ def load_train_test_docs(train_classes, test_classes, path=DOCBIN_PATH,
                 "Series.")
 
     # Load the test set docs
-    test_sub_docs = load_docbins(path / docbin_names['test']['subject'], 
+    test_sub_docs = load(path / docbin_names['test']['subject'], 
         **params)
-    test_body_docs = load_docbins(path / docbin_names['test']['body'], 
+    test_body_docs = load(path / docbin_names['test']['body'], 
         **params)
     # Check that the docs indeed match the index of the test classes series
     for docset in [test_sub_docs, test_body_docs]:
@@ -107,6 +145,14 @@ def load_train_test_docs(train_classes, test_classes, path=DOCBIN_PATH,
                 "have an index matching that of the passed test_classes "
                 "Series.")
 
+    if lazy:
+        for sub_docs, body_docs in [(train_sub_docs, train_body_docs),
+                (test_sub_docs, test_body_docs)]:
+            if not sub_docs.index.equals(body_docs.index):
+                raise DocBinError("The subject and body docbins do not have "
+                    "their docs in the same order.")
+        return ({'subject_doc': train_sub_docs, 'body_doc': train_body_docs},
+            {'subject_doc': test_sub_docs, 'body_doc': test_body_docs})
     train_set = pd.DataFrame({'subject_doc': train_sub_docs, 
         'body_doc': train_body_docs}).reindex(train_classes.index)
     test_set = pd.DataFrame({'subject_doc': test_sub_docs, 
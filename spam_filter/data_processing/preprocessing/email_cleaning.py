@@ -1,9 +1,20 @@
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 
 import numpy as np
+import pandas as pd
 from langdetect import detect, LangDetectException, DetectorFactory
 
+from .language_cache import LanguageCache
+from .ngram_detector import get_ngram_detector
+from .near_duplicates import MinHasher, near_duplicate_clusters, \
+    cluster_statistics, NUM_PERM, SHINGLE_SIZE
+from ..settings import LANGUAGE_DETECTION_WORKERS, LANGUAGE_CACHE_PATH, \
+    LANGUAGE_DETECTOR, LANGUAGE_DETECTION_MAX_CHARS, NEAR_DUPLICATE_THRESHOLD
+
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -41,6 +52,52 @@ def all_whitespace_to_na(email_df):
     )
 
 
+def _normalize_text(text, pat):
+    """Return `text` with all whitespace replaced with a single blank, or
+    None if it is then empty (or just a blank), or is not a string."""
+    if not isinstance(text, str):
+        return None
+    text = pat.sub(' ', text)
+    return None if text == '' or text == ' ' else text
+
+
+def _contains_multipart(text):
+    """Return True if `text` contains 'multipart' or 'Multipart', or is not
+    a string."""
+    return (not isinstance(text, str) or 'multipart' in text 
+        or 'Multipart' in text)
+
+
+def normalize_fields(email_df, flag_multipart=False):
+    """Return a dataframe with the 'subject' and 'body' fields of the 
+    original normalized as by normalize_spaces followed by 
+    all_whitespace_to_na, in a single pass over each field, and without 
+    copying the other columns. If `flag_multipart` is True, a boolean 
+    'multipart' column is also added, flagging the rows that 
+    drop_multipart_messages drops (those whose body contains 'multipart' or
+    'Multipart', or is null), so that the bodies don't have to be scanned 
+    again."""
+    logger.info("Normalizing spaces in email dataframe's subject and body "
+        "fields and setting all-whitespace fields to None")
+    # Only whitespace that isn't already a single blank is matched, so that
+    # fields which are already normalized are kept as they are (not copied)
+    pat = re.compile(r'[^\S ]\s*| \s+')
+    # A shallow copy: setting the fields below replaces them in the copy only
+    email_df = email_df.copy(deep=False)
+    for field in ('subject', 'body'):
+        column = email_df[field]
+        na_value = pd.NA if column.dtype == 'string' else np.nan
+        normalized = [_normalize_text(text, pat) for text in column]
+        email_df[field] = pd.Series(
+            [na_value if text is None else text for text in normalized],
+            index=column.index, dtype=column.dtype)
+    if flag_multipart:
+        email_df['multipart'] = np.fromiter(
+            (_contains_multipart(text) for text in email_df['body']), 
+            dtype=bool, count=len(email_df))
+    return email_df
+
+
 def drop_na_both(email_df):
     """Return a dataframe in which any rows where both 'subject'
     and 'body' are null have been dropped"""
@@ -49,33 +106,180 @@ def drop_na_both(email_df):
     return email_df.dropna(subset=['subject', 'body'])
 
 
-def drop_non_english(email_df):
+def detect_language(body_text):
+    """Return the language langdetect detects in `body_text` (e.g. 'en'),
+    or None if it can't detect any language, or `body_text` is not a 
+    string."""
+    try:
+        return detect(body_text)
+    except LangDetectException:
+        return None
+    except TypeError:
+        return None
+
+
+def _seed_detector():
+    """Make language detection deterministic (in a worker process)."""
+    DetectorFactory.seed = 0
+
+
+def _detect_chunk(bodies):
+    """Return a list of detect_language(body) for each body in the list 
+    `bodies`. This is a module level function so that it can be sent to 
+    worker processes."""
+    return [detect_language(body_text) for body_text in bodies]
+
+
+def detect_languages(bodies, workers=LANGUAGE_DETECTION_WORKERS, 
+        chunksize=1000, detector=LANGUAGE_DETECTOR, 
+        max_chars=LANGUAGE_DETECTION_MAX_CHARS):
+    """Return a list of the languages detected in each body in the list
+    `bodies` (None where no language can be detected) using `detector`:
+    - 'langdetect': langdetect (see detect_language). The bodies are 
+      processed in chunks of `chunksize` by a pool of `workers` worker 
+      processes (all CPUs if None), or in this process if `workers` is 1 or
+      there are too few bodies to be worth it. The result does not depend 
+      on `workers`.
+    - 'ngram': the vectorized NGramLanguageDetector, which processes the
+      bodies in batches of `chunksize` in this process.
+    If `max_chars` is not None, only the first `max_chars` characters of 
+    each body are used."""
+    if max_chars is not None:
+        bodies = [body_text[:max_chars] if isinstance(body_text, str) 
+            else body_text for body_text in bodies]
+    chunks = (bodies[i:i + chunksize] 
+        for i in range(0, len(bodies), chunksize))
+    if detector == 'ngram':
+        ngram_detector = get_ngram_detector()
+        return list(chain.from_iterable(ngram_detector.detect(chunk) 
+            for chunk in chunks))
+    if detector != 'langdetect':
+        raise ValueError(f"Unknown language detector {detector}. Choose "
+            "from ('langdetect', 'ngram').")
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(bodies) <= chunksize:
+        return _detect_chunk(bodies)
+    logger.info(f"Detecting languages with {workers} worker processes "
+        f"in chunks of {chunksize} emails")
+    with ProcessPoolExecutor(max_workers=workers, 
+                             initializer=_seed_detector) as executor:
+        return list(chain.from_iterable(executor.map(_detect_chunk, chunks)))
+
+
+def drop_non_english(email_df, workers=LANGUAGE_DETECTION_WORKERS, 
+        chunksize=1000, cache_path=LANGUAGE_CACHE_PATH, 
+        detector=LANGUAGE_DETECTOR, max_chars=LANGUAGE_DETECTION_MAX_CHARS):
     """Return a dataframe where all rows with non-English email bodies
-    have been dropped."""
-    logger.info("Dropping any emails in non-English languages. "
-        "This may take a while...")
-    def english(body_text):
-        try:
-            return detect(body_text) == 'en'
-        except LangDetectException:
-            return False
-        except TypeError:
-            return False
-    return email_df[email_df['body'].map(english)]
+    have been dropped. Languages are detected with detect_languages (see
+    there for `workers`, `chunksize`, `detector` and `max_chars`). If 
+    `cache_path` is not None, the languages are also stored in (and first 
+    looked up in) the language cache at `cache_path`, so each body is only 
+    processed once (by each detector)."""
+    logger.info(f"Dropping any emails in non-English languages (detected "
+        f"with {detector}). This may take a while...")
+    bodies = email_df['body'].tolist()
+    def detect_all(bodies):
+        return detect_languages(bodies, workers=workers, chunksize=chunksize,
+            detector=detector, max_chars=max_chars)
+    if cache_path is None:
+        languages = detect_all(bodies)
+    else:
+        cache_name = (detector if max_chars is None 
+            else f"{detector}_{max_chars}")
+        with LanguageCache(cache_path, cache_name) as cache:
+            languages = cache.languages(bodies, detect_all)
+    english = [language == 'en' for language in languages]
+    return email_df[np.array(english, dtype=bool)]
+
+
+def add_fingerprints(email_df):
+    """Return a dataframe with a 'fingerprint' column (uint64) added: a hash
+    of the 'subject' and 'body' of each email, so that equal emails have the
+    same fingerprint. If the dataframe already has one, it is returned as it
+    is."""
+    if 'fingerprint' in email_df.columns:
+        return email_df
+    logger.info("Computing the fingerprints of the emails in dataframe")
+    email_df = email_df.copy(deep=False)
+    email_df['fingerprint'] = pd.util.hash_pandas_object(
+        email_df[['subject', 'body']], index=False).to_numpy()
+    return email_df
+
+
+def _same_text(left, right):
+    """Return a boolean array of whether each element of the Series `left` 
+    equals the corresponding element of `right` (nulls being equal)."""
+    left = left.to_numpy(dtype=object, na_value=None)
+    right = right.to_numpy(dtype=object, na_value=None)
+    return np.array([a == b for a, b in zip(left, right)], dtype=bool)
 
 
 def drop_duplicates(email_df):
     """Return a dataframe with no duplicate rows (checking 
-    only the equality of 'subject' and 'body')"""
+    only the equality of 'subject' and 'body'), keeping the first of each.
+    Duplicates are found by their fingerprints (see add_fingerprints; the 
+    'fingerprint' column is kept), and only checked to really be equal to
+    the row they duplicate."""
     logger.info("Dropping any duplicate emails from dataframe (same subject "
         "and body)")
-    return email_df.drop_duplicates(['subject', 'body'])
+    email_df = add_fingerprints(email_df)
+    fingerprints = email_df['fingerprint']
+    duplicated = fingerprints.duplicated().to_numpy()
+    if not duplicated.any():
+        return email_df
+    # Check each duplicate against the first row with its fingerprint
+    positions = np.flatnonzero(duplicated)
+    first_positions = pd.Series(np.flatnonzero(~duplicated), 
+        index=fingerprints[~duplicated].to_numpy())
+    originals = first_positions[fingerprints.iloc[positions]].to_numpy()
+    same = np.ones(len(positions), dtype=bool)
+    for field in ('subject', 'body'):
+        same &= _same_text(email_df[field].iloc[positions], 
+            email_df[field].iloc[originals])
+    if not same.all():
+        # Hash collisions: compare the emails with those fingerprints in full
+        collided = fingerprints.isin(
+            fingerprints.iloc[positions[~same]]).to_numpy()
+        logger.warning(f"{collided.sum()} emails in dataframe have colliding "
+            "fingerprints. Comparing them in full.")
+        duplicated[collided] = email_df[collided].duplicated(
+            ['subject', 'body']).to_numpy()
+    return email_df[~duplicated]
+
+
+def drop_near_duplicates(email_df, threshold=NEAR_DUPLICATE_THRESHOLD,
+        num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE):
+    """Return a dataframe in which only the first email of each cluster of 
+    near-duplicate emails is kept: emails whose words (of the 'subject' and
+    'body' together) have an estimated Jaccard similarity of at least 
+    `threshold` (see near_duplicates.py for `num_perm` and `shingle_size`).
+    If `threshold` is None, the dataframe is returned as it is."""
+    if threshold is None:
+        return email_df
+    logger.info(f"Dropping any near-duplicate emails from dataframe "
+        f"(similarity at least {threshold})")
+    signatures = MinHasher(num_perm, shingle_size).signatures(
+        list(zip(email_df['subject'], email_df['body'])))
+    labels = near_duplicate_clusters(signatures, threshold)
+    stats = cluster_statistics(labels)
+    logger.info(f"Found {stats['n_clusters']} clusters of near-duplicate "
+        f"emails containing {stats['n_clustered']} emails (largest "
+        f"{stats['max_size']}, mean size {stats['mean_size']:.2f}); dropping "
+        f"{stats['n_dropped']} of {stats['n_texts']} emails")
+    logger.debug(f"Number of clusters of each size: {stats['size_counts']}")
+    keep = np.zeros(len(email_df), dtype=bool)
+    keep[np.unique(labels, return_index=True)[1]] = True
+    return email_df[keep]
 
 
 def drop_multipart_messages(email_df):
     """Return a dataframe in which any rows where 'body' contains
-    the strings 'multipart' or 'Multipart' have been dropped."""
+    the strings 'multipart' or 'Multipart' have been dropped. If the 
+    dataframe has a 'multipart' column (see normalize_fields), the rows it
+    flags are dropped instead, and the column is removed."""
     logger.info(f"Dropping any messages from email dataframe that contain the "
         "string '[M|m]ultipart' in their body.")
+    if 'multipart' in email_df.columns:
+        return email_df[~email_df['multipart']].drop(columns='multipart')
     return email_df[~email_df['body'].str.contains('multipart') 
         & ~email_df['body'].str.contains('Multipart')]
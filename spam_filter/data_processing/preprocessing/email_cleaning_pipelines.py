@@ -1,29 +1,42 @@
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer
 
-from .email_cleaning import normalize_spaces, \
-    all_whitespace_to_na, drop_na_both, drop_duplicates, \
-    drop_multipart_messages, drop_non_english
+from .email_cleaning import normalize_fields, drop_na_both, \
+    drop_duplicates, drop_near_duplicates, drop_multipart_messages, \
+    drop_non_english
 
 
 # normalizes a dataframe of email objects (with a 'subject' and 'body' field)
+# (normalize_fields does the work of normalize_spaces and 
+# all_whitespace_to_na in a single pass)
 email_cleaning = Pipeline([
-    ('space_normalizer', FunctionTransformer(normalize_spaces)),
-    ('empty_nullify', FunctionTransformer(all_whitespace_to_na)),
+    ('normalizer', FunctionTransformer(normalize_fields)),
 ])
 
 
 # normalizes and then prepares a dataframe of email objects from a corpus 
 # or multiple corpora 
-# For instance, duplicates will be dropped.
+# For instance, duplicates will be dropped, and then near-duplicates (only 
+# keeping the first of each cluster of emails at least 
+# NEAR_DUPLICATE_THRESHOLD similar), if NEAR_DUPLICATE_THRESHOLD isn't None
+# (it is None by default, so that this step does nothing). The threshold can
+# also be set with set_params, e.g.
+#     corpus_prep.set_params(
+#         near_duplicate_dropper__kw_args={'threshold': 0.9})
 # The last transformer is necessary because some email messages were not 
 # properly picked up as multipart by the email package, causing the body 
 # to contain non-text data encoded as text. The easiest solution is to drop 
-# the few emails that got by.
+# the few emails that got by. They are flagged while normalizing, so that 
+# the bodies are only scanned once.
+# The keyword arguments of drop_non_english (e.g. the language detector) can 
+# be changed with set_params, e.g.
+#     corpus_prep.set_params(non_english_dropper__kw_args={'detector': 'ngram'})
 corpus_prep = Pipeline([
-    ('email_cleaner', email_cleaning),
+    ('email_cleaner', FunctionTransformer(normalize_fields, 
+        kw_args={'flag_multipart': True})),
     ('non_english_dropper', FunctionTransformer(drop_non_english)),
     ('empty_dropper', FunctionTransformer(drop_na_both)),
     ('duplicate_dropper', FunctionTransformer(drop_duplicates)),
+    ('near_duplicate_dropper', FunctionTransformer(drop_near_duplicates)),
     ('multipart_dropper', FunctionTransformer(drop_multipart_messages))
 ])
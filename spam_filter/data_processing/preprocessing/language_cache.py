@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import re
+import sqlite3
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# Maximum number of hashes looked up in a single query (SQLite limits the
+# number of parameters in a statement)
+QUERY_BATCH_SIZE = 900
+
+
+def body_hash(body_text):
+    """Return the key (bytes) of the email body `body_text` in the language
+    cache. Bodies are hashed as they are passed to language detection, i.e.
+    after the space normalization of the email_cleaning pipeline."""
+    return hashlib.blake2b(body_text.encode('utf-8', 'surrogatepass'),
+        digest_size=16).digest()
+
+
+class LanguageCache:
+    """A disk-backed cache (an SQLite database at `path`) of the languages
+    detected in email bodies, keyed by the hash of each body, so that the
+    language of a body is only detected the first time it is seen. 
+    Languages detected in different ways (e.g. by different detectors) are
+    kept apart by giving each a different `name`. Use it as a context 
+    manager to close the database afterwards."""
+
+    def __init__(self, path, name='langdetect'):
+        self.path = path
+        # Languages detected by langdetect (on whole bodies) are stored in 
+        # the table "languages", others in a table named after them.
+        self.table = ('languages' if name == 'langdetect' 
+            else "languages_" + re.sub(r'\W', '_', name))
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(hash BLOB PRIMARY KEY, language TEXT) WITHOUT ROWID")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, hashes):
+        """Return a dict mapping each of `hashes` found in the cache to its
+        language (None if no language could be detected)."""
+        hashes = list(hashes)
+        found = {}
+        for i in range(0, len(hashes), QUERY_BATCH_SIZE):
+            batch = hashes[i:i + QUERY_BATCH_SIZE]
+            found.update(self.connection.execute(
+                f"SELECT hash, language FROM {self.table} WHERE hash IN "
+                f"({','.join('?' * len(batch))})", batch))
+        return found
+
+    def put_many(self, languages):
+        """Store the (hash, language) pairs in the dict `languages`."""
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?)",
+                languages.items())
+
+    def languages(self, bodies, detect_languages):
+        """Return a list of the languages of each body in the list
+        `bodies` (None for bodies that are not strings). The languages of
+        the (distinct) bodies not in the cache are detected by calling
+        `detect_languages` (a function taking a list of bodies and returning
+        a list of their languages) once, and then added to the cache."""
+        hashes = [body_hash(body_text) if isinstance(body_text, str) else None
+            for body_text in bodies]
+        cached = self.get_many({key for key in hashes if key is not None})
+        missing = {}
+        for key, body_text in zip(hashes, bodies):
+            if key is not None and key not in cached:
+                missing.setdefault(key, body_text)
+        logger.info(f"Detecting the languages of {len(missing)} distinct "
+            f"email bodies (of {len(bodies)}) not in the language cache "
+            f"{self.path}")
+        if missing:
+            detected = dict(zip(missing,
+                detect_languages(list(missing.values()))))
+            self.put_many(detected)
+            cached.update(detected)
+        return [cached.get(key) for key in hashes]
@@ -0,0 +1,172 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# Near-duplicate emails are found with MinHash and locality sensitive hashing
+# (LSH). Each email is turned into its set of shingles (runs of
+# SHINGLE_SIZE consecutive words), and the Jaccard similarity of two such
+# sets is estimated by the share of equal values in their MinHash
+# signatures (the minimum of each of NUM_PERM hash functions over the
+# shingles). Signatures are split into bands, and only emails with an equal
+# band (i.e. in the same bucket of the LSH index) are compared, so finding
+# them takes close to linear time instead of comparing every pair of emails.
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+# The hash functions are multiply-shift hashes of the 32 bit shingle hashes
+# x: the top 32 bits of (a * x + b) mod 2**64, for a random odd a and random b
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHIFT = np.uint64(32)
+# Number of texts whose shingles are hashed at once
+BATCH_SIZE = 10000
+
+
+def _words(text):
+    """Return the list of (lowercase) words of `text`, which can also be a
+    tuple of texts (e.g. the fields of an email) or not a string (no words)."""
+    if isinstance(text, str):
+        return text.lower().split()
+    if isinstance(text, tuple):
+        return [word for field in text for word in _words(field)]
+    return []
+
+
+def _shingle_hashes(texts, shingle_size):
+    """Return the 32 bit hashes of the shingles of each of `texts` (split into
+    words with _words; texts with fewer than `shingle_size` words have a 
+    single shingle of all their words) concatenated, and the number of
+    shingles of each text."""
+    words = [_words(text) for text in texts]
+    n_words = np.array([len(text_words) for text_words in words])
+    word_hashes = pd.util.hash_array(
+        np.array([word for text_words in words for word in text_words],
+            dtype=object))
+    n_shingles = np.where(n_words > 0,
+        np.maximum(n_words - shingle_size + 1, 1), 0)
+    # The position of the first word and the number of words of each shingle
+    text_starts = np.cumsum(n_words) - n_words
+    shingle_texts = np.repeat(np.arange(len(texts)), n_shingles)
+    shingle_starts = (text_starts[shingle_texts] + np.arange(n_shingles.sum())
+        - np.repeat(np.cumsum(n_shingles) - n_shingles, n_shingles))
+    shingle_lengths = np.minimum(n_words, shingle_size)[shingle_texts]
+    hashes = np.zeros(len(shingle_starts), dtype=np.uint64)
+    for i in range(shingle_size):
+        in_shingle = i < shingle_lengths
+        hashes[in_shingle] = (hashes[in_shingle] * np.uint64(1000003)
+            ^ word_hashes[shingle_starts[in_shingle] + i])
+    return (hashes ^ (hashes >> np.uint64(32))) & MAX_HASH, n_shingles
+
+
+class MinHasher:
+    """Computes the MinHash signatures of texts with `num_perm` hash
+    functions (drawn with the random `seed`) over their shingles of
+    `shingle_size` words."""
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) \
+            * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) \
+            * np.uint64(2)
+
+    def signatures(self, texts, batch_size=BATCH_SIZE):
+        """Return the MinHash signatures of `texts` (a list of strings, or of
+        tuples of strings whose words are all used) as an array of shape
+        (len(texts), num_perm) of uint32. Texts without any words have a
+        signature of all MAX_HASH."""
+        signatures = np.full((len(texts), self.num_perm), MAX_HASH,
+            dtype=np.uint32)
+        for i in range(0, len(texts), batch_size):
+            hashes, n_shingles = _shingle_hashes(texts[i:i + batch_size],
+                self.shingle_size)
+            if not len(hashes):
+                continue
+            has_shingles = np.flatnonzero(n_shingles > 0)
+            starts = (np.cumsum(n_shingles) - n_shingles)[has_shingles]
+            # One hash function at a time, reusing a single buffer
+            permuted = np.empty_like(hashes)
+            for j in range(self.num_perm):
+                np.multiply(hashes, self.a[j], out=permuted)
+                permuted += self.b[j]
+                permuted >>= SHIFT
+                signatures[i + has_shingles, j] = np.minimum.reduceat(
+                    permuted, starts)
+        return signatures
+
+
+def lsh_parameters(threshold, num_perm=NUM_PERM):
+    """Return the number of bands and rows per band (dividing signatures of
+    `num_perm` values) for which the mean probability of emails with a 
+    Jaccard similarity of at least `threshold` not sharing a band, plus the
+    mean probability of emails with a lower one sharing a band, is 
+    smallest. (Emails sharing a band are only candidates, whose signatures 
+    are then compared, so the second kind of error only costs time.)"""
+    if not 0 < threshold < 1:
+        raise ValueError(f"The similarity threshold must be between 0 and 1 "
+            f"(not {threshold})")
+    similarities = np.linspace(0, 1, 1001)
+    below = similarities < threshold
+    def error(bands, rows):
+        shared = 1 - (1 - similarities ** rows) ** bands
+        return (np.trapz(np.where(below, shared, 0), similarities) / threshold
+            + np.trapz(np.where(below, 0, 1 - shared), similarities) 
+            / (1 - threshold))
+    return min(((bands, num_perm // bands) for bands in range(1, num_perm + 1)
+                if num_perm % bands == 0), key=lambda params: error(*params))
+
+
+def near_duplicate_clusters(signatures, threshold):
+    """Return an array of the cluster label of each of the MinHash
+    `signatures`, clustering together texts whose estimated Jaccard
+    similarity is at least `threshold` (and, transitively, texts similar to
+    those). Each text is compared with the first text in each of its LSH
+    buckets. Texts without any words are each in their own cluster."""
+    n_texts, num_perm = signatures.shape
+    bands, rows = lsh_parameters(threshold, num_perm)
+    has_words = ~(signatures == MAX_HASH).all(axis=1)
+    texts = np.flatnonzero(has_words)
+    sources, targets = [], []
+    for band in range(bands):
+        band_values = np.ascontiguousarray(
+            signatures[texts, band * rows:(band + 1) * rows])
+        _, first, buckets = np.unique(
+            band_values.view(np.dtype((np.void, 4 * rows))).ravel(),
+            return_index=True, return_inverse=True)
+        firsts = texts[first[buckets]]
+        candidates = firsts != texts
+        sources.append(texts[candidates])
+        targets.append(firsts[candidates])
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    similar = ((signatures[sources] == signatures[targets]).mean(axis=1)
+        >= threshold)
+    graph = coo_matrix((np.ones(similar.sum()),
+        (sources[similar], targets[similar])), shape=(n_texts, n_texts))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def cluster_statistics(labels):
+    """Return a dict of statistics of the clusters with `labels` (as
+    returned by near_duplicate_clusters) with more than one member."""
+    sizes = np.bincount(labels)
+    sizes = sizes[sizes > 1]
+    return {
+        'n_texts': len(labels),
+        'n_clusters': len(sizes),
+        'n_clustered': int(sizes.sum()),
+        'n_dropped': int((sizes - 1).sum()),
+        'max_size': int(sizes.max(initial=0)),
+        'mean_size': float(sizes.mean()) if len(sizes) else 0.0,
+        'size_counts': dict(zip(*map(np.ndarray.tolist,
+            np.unique(sizes, return_counts=True)))),
+    }
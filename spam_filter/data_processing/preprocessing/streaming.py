@@ -0,0 +1,219 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .corpus_store import iter_corpus_store, STORE_DTYPES
+from .email_cleaning import add_fingerprints
+from .email_cleaning_pipelines import corpus_prep
+from .near_duplicates import MinHasher, near_duplicate_clusters, \
+    lsh_parameters, MAX_HASH, NUM_PERM, SHINGLE_SIZE
+from .test_set_creation import add_hash_buckets, split_train_test_by_bucket
+from ..settings import CORPORA_CSV_PATH, CORPUS_FILENAMES, TEST_RATIO, \
+    CORPUS_STORE_FORMAT, NEAR_DUPLICATE_THRESHOLD, CORPUS_PREP_CHUNKSIZE
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# In streaming mode, the corpora are read and run through corpus_prep in
+# chunks, and the cleaned training and test sets are appended to these files
+# one chunk at a time. The steps of corpus_prep that only look at one email
+# at a time are run on each chunk as they are; the deduplication steps are
+# replaced by the streaming versions below, which remember what they need
+# about the emails already kept (fingerprints and MinHash signatures, not
+# their text).
+STREAMED_FILENAMES = {'train': 'train.csv', 'test': 'test.csv'}
+# Key of the second hash of the fingerprints used by StreamingDeduplicator
+# (must be 16 characters)
+SECOND_HASH_KEY = 'spamfilterdedup2'
+# Multiplier used to hash the bands of MinHash signatures
+BAND_HASH_PRIME = np.uint64(1099511628211)
+
+
+class StreamingDeduplicator:
+    """Drops the emails (with the same 'subject' and 'body') duplicating an
+    earlier email in the same or an earlier chunk passed to transform,
+    keeping the first of each, like drop_duplicates. Only a 128 bit
+    fingerprint of each email kept is remembered, so no two different emails
+    are ever (realistically) mistaken for duplicates."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def transform(self, email_df):
+        email_df = add_fingerprints(email_df)
+        second = pd.util.hash_pandas_object(email_df[['subject', 'body']],
+            index=False, hash_key=SECOND_HASH_KEY).to_numpy()
+        keep = np.zeros(len(email_df), dtype=bool)
+        for i, (first, second) in enumerate(zip(
+                email_df['fingerprint'].tolist(), second.tolist())):
+            fingerprint = (first << 64) | second
+            if fingerprint not in self.seen:
+                self.seen.add(fingerprint)
+                keep[i] = True
+        return email_df[keep]
+
+
+def _band_hashes(signatures, bands, rows):
+    """Return an array of shape (bands, len(signatures)) of a 64 bit hash of
+    each band of each of the MinHash `signatures`."""
+    hashes = np.zeros((bands, len(signatures)), dtype=np.uint64)
+    for row in range(rows):
+        hashes *= BAND_HASH_PRIME
+        hashes ^= signatures[:, row::rows].T.astype(np.uint64)
+    return hashes
+
+
+class StreamingNearDuplicateDropper:
+    """Drops near-duplicate emails (see drop_near_duplicates) from the chunks
+    passed to transform. Within a chunk, only the first email of each
+    cluster of near-duplicates is kept, as by drop_near_duplicates; it is
+    then also dropped if it is a near-duplicate of an email kept from an
+    earlier chunk (of which only the signatures and an LSH index of their
+    bands are remembered). If `threshold` is None, nothing is dropped."""
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, num_perm=NUM_PERM,
+            shingle_size=SHINGLE_SIZE):
+        self.threshold = threshold
+        if threshold is None:
+            return
+        self.minhasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        # The hashes of each band of the signatures kept (sorted), and the
+        # (first) signature with each
+        self.band_hashes = [np.empty(0, dtype=np.uint64)] * self.bands
+        self.band_ids = [np.empty(0, dtype=np.int64)] * self.bands
+        self.n_dropped = 0
+
+    def _similar_to_kept(self, signatures):
+        """Return a boolean array of which of `signatures` are similar to a
+        signature kept from an earlier chunk."""
+        result = np.zeros(len(signatures), dtype=bool)
+        if not len(self.signatures):
+            return result
+        hashes = _band_hashes(signatures, self.bands, self.rows)
+        sources, targets = [], []
+        for band in range(self.bands):
+            positions = np.searchsorted(self.band_hashes[band], hashes[band])
+            positions[positions == len(self.band_hashes[band])] = 0
+            found = np.flatnonzero(
+                self.band_hashes[band][positions] == hashes[band])
+            sources.append(found)
+            targets.append(self.band_ids[band][positions[found]])
+        sources, targets = np.concatenate(sources), np.concatenate(targets)
+        similar = ((signatures[sources] == self.signatures[targets])
+            .mean(axis=1) >= self.threshold)
+        result[sources[similar]] = True
+        return result
+
+    def _add(self, signatures):
+        """Add `signatures` to the kept signatures and the LSH index."""
+        hashes = _band_hashes(signatures, self.bands, self.rows)
+        ids = np.arange(len(self.signatures),
+            len(self.signatures) + len(signatures))
+        self.signatures = np.concatenate([self.signatures, signatures])
+        for band in range(self.bands):
+            band_hashes = np.concatenate([self.band_hashes[band], hashes[band]])
+            band_ids = np.concatenate([self.band_ids[band], ids])
+            # Keep only the first signature with each hash
+            band_hashes, first = np.unique(band_hashes, return_index=True)
+            self.band_hashes[band] = band_hashes
+            self.band_ids[band] = band_ids[first]
+
+    def transform(self, email_df):
+        if self.threshold is None:
+            return email_df
+        signatures = self.minhasher.signatures(
+            list(zip(email_df['subject'], email_df['body'])))
+        labels = near_duplicate_clusters(signatures, self.threshold)
+        keep = np.zeros(len(email_df), dtype=bool)
+        keep[np.unique(labels, return_index=True)[1]] = True
+        has_words = ~(signatures == MAX_HASH).all(axis=1)
+        candidates = np.flatnonzero(keep & has_words)
+        similar = self._similar_to_kept(signatures[candidates])
+        keep[candidates[similar]] = False
+        self._add(signatures[candidates[~similar]])
+        self.n_dropped += len(email_df) - keep.sum()
+        logger.debug(f"Dropped {len(email_df) - keep.sum()} near-duplicate "
+            f"emails of {len(email_df)} ({self.n_dropped} so far)")
+        return email_df[keep]
+
+
+# The streaming versions of the steps of corpus_prep that need to see all
+# the emails. They are created with the step's keyword arguments.
+STREAMING_STEPS = {
+    'duplicate_dropper': StreamingDeduplicator,
+    'near_duplicate_dropper': StreamingNearDuplicateDropper,
+}
+
+
+def stream_train_test_csvs(output_path, path=CORPORA_CSV_PATH,
+        corpus_names=CORPUS_FILENAMES, test_ratio=TEST_RATIO,
+        chunksize=CORPUS_PREP_CHUNKSIZE, store_format=CORPUS_STORE_FORMAT):
+    """Run the email corpora in `path` (see load_corpora_csvs) through the
+    corpus_prep pipeline in chunks of `chunksize` emails, split them into a
+    training and a test set like load_train_test_csvs, and write these to
+    the csv files STREAMED_FILENAMES in the directory `output_path` (see
+    read_streamed_train_test) one chunk at a time, so that the memory used
+    doesn't grow with the size of the corpora (except for what the
+    deduplication steps remember about each email). Returns a dict of the
+    paths of the two files."""
+    logger.info(f"Running the corpora at {path} through the preprocessing "
+        f"pipeline in chunks of {chunksize} emails, and writing the training "
+        f"and test sets to {output_path}")
+    steps = [(name, STREAMING_STEPS[name](**(step.kw_args or {}))
+                if name in STREAMING_STEPS else step)
+             for name, step in corpus_prep.steps]
+    paths = {name: output_path / filename
+        for name, filename in STREAMED_FILENAMES.items()}
+    temp_paths = {name: file_path.with_name(file_path.name + '.tmp')
+        for name, file_path in paths.items()}
+    counts = {'read': 0, 'train': 0, 'test': 0}
+    header = True
+    for corpus_name, filename in corpus_names.items():
+        for chunk in iter_corpus_store(path / filename, chunksize,
+                store_format=store_format):
+            counts['read'] += len(chunk)
+            chunk.insert(0, 'corpus', corpus_name)
+            chunk['corpus'] = chunk['corpus'].astype('string')
+            chunk.set_index(['corpus', 'path'], inplace=True)
+            for _, step in steps:
+                if chunk.empty:
+                    break
+                chunk = step.transform(chunk)
+            if chunk.empty:
+                continue
+            sets = dict(zip(('train', 'test'), split_train_test_by_bucket(
+                add_hash_buckets(chunk, "path", string_id=True, 
+                    id_from_index=True), test_ratio)))
+            for name, email_set in sets.items():
+                email_set.to_csv(temp_paths[name], mode='wt' if header
+                    else 'at', header=header)
+                counts[name] += len(email_set)
+            header = False
+            logger.debug(f"{counts['read']} emails read, {counts['train']} "
+                f"training and {counts['test']} test emails written")
+    if header:
+        raise ValueError(f"No emails were left in the corpora at {path} "
+            "after preprocessing")
+    for name in paths:
+        os.replace(temp_paths[name], paths[name])
+    logger.info(f"Wrote {counts['train']} training and {counts['test']} test "
+        f"emails (of {counts['read']}) to {output_path}")
+    return paths
+
+
+def read_streamed_train_test(output_path, columns=None):
+    """Load the training and test sets written by stream_train_test_csvs to
+    `output_path`, indexed by (corpus, path). If `columns` is passed, only
+    those columns are loaded."""
+    dtypes = {'corpus': 'string', **STORE_DTYPES, 'fingerprint': 'uint64',
+        'bucket': 'uint32'}
+    usecols = None if columns is None else ['corpus', 'path', *columns]
+    return tuple(pd.read_csv(output_path / STREAMED_FILENAMES[name],
+            usecols=usecols, dtype=dtypes, index_col=['corpus', 'path'])
+        for name in ('train', 'test'))
@@ -18,7 +18,63 @@ def test_set_check(identifier, test_ratio, string_id=False):
     return crc32(bytesobject) < test_ratio * 2**32
 
 
-def split_train_test_by_id(data, test_ratio, id_column, string_id=False, 
+def hash_buckets(identifiers, string_id=False):
+    """Return an array (uint32) of the hash bucket of each of
+    `identifiers`: the CRC-32 of the identifier (encoded as in
+    test_set_check), so that an identifier is in the test set of
+    test_set_check exactly when its bucket is below test_ratio * 2**32."""
+    if string_id:
+        encoded = (identifier.encode('utf-8') for identifier in identifiers)
+    else:
+        encoded = (np.int64(identifier) for identifier in identifiers)
+    return np.fromiter((crc32(bytesobject) for bytesobject in encoded),
+        dtype=np.uint32, count=len(identifiers))
+
+
+def add_hash_buckets(data, id_column, string_id=False, id_from_index=False):
+    """Return the dataframe `data` with a 'bucket' column (uint32) of the
+    hash bucket (see hash_buckets) of the identifier `id_column` of each
+    row (a column, or a level of the index if `id_from_index`). Training
+    and test sets, and cross-validation folds, can then be made from this
+    column without hashing the identifiers again."""
+    if id_from_index:
+        identifiers = data.index.get_level_values(id_column)
+    else:
+        identifiers = data[id_column]
+    data = data.copy(deep=False)
+    data['bucket'] = hash_buckets(identifiers.tolist(), string_id)
+    return data
+
+
+def in_test_set(buckets, test_ratio):
+    """Return a boolean array of which of the hash `buckets` are in the test
+    set (as decided by test_set_check)."""
+    return np.asarray(buckets) < test_ratio * 2**32
+
+
+def cv_folds(buckets, n_folds, test_ratio):
+    """Return an array of the cross-validation fold (0 to n_folds - 1) of
+    each of the hash `buckets`, splitting the buckets of the training set
+    (those not in the test set for `test_ratio`) into `n_folds` ranges of
+    equal size. Buckets in the test set get -1. The result can be passed
+    to sklearn's PredefinedSplit to cross-validate on the training set."""
+    buckets = np.asarray(buckets, dtype=np.float64)
+    start = np.ceil(test_ratio * 2**32)
+    folds = np.floor((buckets - start) * n_folds / (2**32 - start))
+    folds[in_test_set(buckets, test_ratio)] = -1
+    return folds.astype(np.int64)
+
+
+def split_train_test_by_bucket(data, test_ratio):
+    """Split the dataframe `data` with a 'bucket' column (see
+    add_hash_buckets) into a training and a test set."""
+    logger.info(f"Splitting dataframe into a training and test set by "
+        f"hash bucket with test ratio {test_ratio}")
+    test = in_test_set(data['bucket'], test_ratio)
+    return data[~test], data[test]
+
+
+def split_train_test_by_id(data, test_ratio, id_column, string_id=False,
                            id_from_index=False):
     logger.info(f"Splitting dataframe into a training and test set by "
         f"'{id_column}' with test ratio {test_ratio}")
@@ -26,7 +82,6 @@ def split_train_test_by_id(data, test_ratio, id_column, string_id=False,
         id_series = data.index.to_frame()[id_column]
     else:
         id_series = data[id_column]
-    def test_set_checker(identifier):
-        return test_set_check(identifier, test_ratio, string_id)
-    in_test_set = id_series.apply(test_set_checker)
-    return data.loc[~in_test_set], data.loc[in_test_set]
+    test = in_test_set(hash_buckets(id_series.tolist(), string_id),
+        test_ratio)
+    return data.loc[~test], data.loc[test]
@@ -13,6 +13,75 @@ CORPUS_FILENAMES = {
     'trec07': 'trec07p.csv',
 }
 
+# Format of the corpus store loaded by the preprocessing pipeline: 'csv' 
+# (the files above), or one of the columnar formats 'parquet' or 'feather' 
+# (both require pyarrow) or 'npz' (NumPy only), which load much faster and
+# can load only some of the columns. Columnar files are written next to the 
+# csv files (with the format's extension) by `extract_from_corpus.py`.
+CORPUS_STORE_FORMAT = 'csv'
+
+# How the text of HTML emails is extracted: 'bs4' (with BeautifulSoup) or
+# 'stream' (in a single pass with html.parser, without building a tree). 
+# Both give the same text, but 'stream' is several times faster.
+HTML_TEXT_ENGINE = 'stream'
+
+# Number of worker processes used to detect the language of each email when
+# dropping non-English emails in the preprocessing pipeline (None for all 
+# CPUs, 1 to detect them in the main process).
+LANGUAGE_DETECTION_WORKERS = None
+
+# How the language of each email is detected when dropping non-English 
+# emails: 'langdetect', or 'ngram', a vectorized detector using the same 
+# language profiles which processes whole batches of emails at once and is 
+# several times faster (it agrees with langdetect on almost all emails; see
+# benchmarks/bench_language_detection.py). If LANGUAGE_DETECTION_MAX_CHARS
+# is not None, only that many characters at the start of each body are used.
+LANGUAGE_DETECTOR = 'langdetect'
+LANGUAGE_DETECTION_MAX_CHARS = None
+
+# Location of a cache (an SQLite database file) of the languages detected 
+# in email bodies, so that the language of each body is only detected once 
+# across runs, e.g. Path("language_cache.sqlite3"). None for no cache.
+LANGUAGE_CACHE_PATH = None
+
+# Location of a cache (a directory) of the preprocessed corpora, so that 
+# the preprocessing pipeline only runs again when the corpus files, its 
+# configuration, the code of the preprocessing package or the test ratio 
+# change, e.g. Path("corpus_cache"). None for no cache.
+CLEANED_CORPUS_CACHE_PATH = None
+
+# Number of emails read and preprocessed at a time when the corpora are
+# preprocessed in streaming mode (see preprocessing/streaming.py), which
+# bounds the memory used.
+CORPUS_PREP_CHUNKSIZE = 10000
+
+# Emails (subject and body together) whose sets of 5-word runs have a 
+# Jaccard similarity of at least NEAR_DUPLICATE_THRESHOLD (estimated with 
+# MinHash) are near-duplicates, of which only the first is kept by the 
+# preprocessing pipeline. None (the default) to only drop exact duplicates.
+# Setting it (e.g. to 0.9) changes the training and test sets, so only do
+# so before starting to train models (see TEST_RATIO).
+NEAR_DUPLICATE_THRESHOLD = None
+
+# The spacy pipeline run on the emails (loaded once per process, when first
+# needed)
+SPACY_MODEL = "en_core_web_sm"
+
+# DocCreator and LemmaCounter run the spacy pipeline in the calling process,
+# which has the lowest latency. If SPACY_PARALLEL_THRESHOLD is not None, 
+# batches of at least that many texts are sent to a persistent pool of 
+# SPACY_WORKERS worker processes instead (None for all CPUs), which is 
+# started when first needed and then reused. Only enable the pool after 
+# checking with benchmarks/bench_doc_creation.py that it is faster on your 
+# machine, and use the threshold from which it is.
+SPACY_WORKERS = None
+SPACY_PARALLEL_THRESHOLD = None
+
+# Number of worker processes used to create docbins (see create_docbins),
+# each of which loads the spacy pipeline once (None for all CPUs, 1 to
+# create them in the main process).
+DOCBIN_WORKERS = None
+
 # Locations to store docbins for test and training sets.
 DOCBIN_PATH = Path("")
 DOCBIN_FILENAMES = {
@@ -20,6 +89,16 @@ DOCBIN_FILENAMES = {
     'test': {'body': 'testbody', 'subject': 'testsubject'},
 }
 
+# Location (a directory) of the lemma feature store: the lemma counts of the
+# subject and body of each email in the docbins, as sparse matrices (see 
+# build_lemma_features.py), and the Lemmatizer options used for each field
+# (also used by the text model).
+LEMMA_FEATURE_PATH = Path("lemma_features")
+LEMMA_FEATURE_OPTIONS = {
+    'subject': {'del_stop': False, 'del_punct': False, 'del_num': True},
+    'body': {'del_stop': False, 'del_punct': False, 'del_num': False},
+}
+
 # Locations to store 'spam' Series as CSV (after running the corpora CSV data 
 # through the preprocessor, eliminating duplicates, etc.) Saving this means 
 # being able to load the classes without rerunning the preprocessing pipeline
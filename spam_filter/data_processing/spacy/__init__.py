@@ -1,2 +1,27 @@
-from .dochandling import DocCreator, DocBinError, create_docbins, load_docbins
-from .lemmatizer import Lemmatizer
+from .models import load_model, model_strings
+
+
+# The transformers and docbin functions are imported when first used, so
+# that spacy is only imported when needed.
+_LAZY_ATTRIBUTES = {
+    'DocCreator': '.dochandling',
+    'DocBinError': '.dochandling',
+    'create_docbins': '.dochandling',
+    'create_many_docbins': '.dochandling',
+    'load_docbins': '.dochandling',
+    'iter_docbins': '.dochandling',
+    'docbin_shard_paths': '.dochandling',
+    'DocBinView': '.dochandling',
+    'Lemmatizer': '.lemmatizer',
+    'LemmaCounter': '.lemma_counter',
+    'LemmaFeatureStore': '.feature_store',
+    'FeatureStoreError': '.feature_store',
+    'build_lemma_features': '.feature_store',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        from importlib import import_module
+        return getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
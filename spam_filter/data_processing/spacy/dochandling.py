@@ -1,12 +1,23 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, \
+    FIRST_COMPLETED
+from itertools import zip_longest
 from pathlib import Path
+import hashlib
+import json
 import logging
+import os
 
 import pandas as pd
 import numpy as np
+import srsly
 from sklearn.base import BaseEstimator, TransformerMixin
-import spacy
 from spacy.tokens import Doc, DocBin
 
+from .models import load_model
+from .parallel import pipe_texts, DISABLED_COMPONENTS
+from ..settings import SPACY_MODEL, DOCBIN_WORKERS, SPACY_WORKERS, \
+    SPACY_PARALLEL_THRESHOLD
+
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -17,13 +28,28 @@ class DocBinError(Exception):
 
 
 # Create a Doc attribute for storing the index of the email
-Doc.set_extension("identifier", default=None)
+if not Doc.has_extension("identifier"):
+    Doc.set_extension("identifier", default=None)
 
 
 class DocCreator(BaseEstimator, TransformerMixin):
+    """A transformer that runs the spacy pipeline on texts and returns the
+    Docs (in an array of the same shape). The texts are processed in this
+    process, or, for batches of at least `parallel_threshold` texts (if not
+    None), by a persistent pool of `workers` worker processes (see
+    pipe_texts)."""
+
+    def __init__(self, batch_size=250, workers=SPACY_WORKERS,
+            parallel_threshold=SPACY_PARALLEL_THRESHOLD):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
 
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
+    @property
+    def nlp(self):
+        # The spacy pipeline is shared (see models.py), and not pickled
+        # with the transformer
+        return load_model()
     
     def fit(self, X, y=None):
         # No fitting of the transformer is necessary
@@ -33,13 +59,191 @@ class DocCreator(BaseEstimator, TransformerMixin):
         if isinstance(X, pd.DataFrame) or isinstance(X, pd.Series):
             X = X.to_numpy()
         docs = np.empty(X.size, object)
-        docs[:] = list(self.nlp.pipe(X.flat, disable=["parser", "ner"],
-            n_process=-1, batch_size=250))
+        docs[:] = list(pipe_texts(list(X.flat), self.batch_size, 
+            self.workers, self.parallel_threshold))
         return np.array(docs, dtype=object).reshape(X.shape)
 
 
 
-def create_docbins(pd_series, path, batch_size=2000):
+def _input_hash(pd_series):
+    """Return a hash (a hex string) of the texts and index of `pd_series`."""
+    hashes = pd.util.hash_pandas_object(pd_series, index=True).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def _file_hash(path):
+    """Return the sha256 (a hex string) of the file at `path`."""
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def _manifest_path(path):
+    return path.with_name(path.name + '.manifest.json')
+
+
+def _write_manifest(path, manifest):
+    manifest_path = _manifest_path(path)
+    temp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with temp_path.open("wt", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def _load_worker_model():
+    """Load the spacy pipeline once in a worker process, before it creates
+    any shards."""
+    load_model()
+
+
+def _create_shard(texts, identifiers, shard_path):
+    """Run the spacy pipeline on the list `texts`, and save the Docs (with
+    the `identifiers` as their identifier attribute) in a DocBin at
+    `shard_path`. Each Doc is added to the DocBin (and thrown away) as soon
+    as it is created. Returns the sha256 of the file. This is a module level
+    function so that it can be sent to worker processes."""
+    nlp = load_model()
+    docbin = DocBin(store_user_data=True)
+    docs = nlp.pipe(texts, disable=list(DISABLED_COMPONENTS), batch_size=250)
+    for doc, identifier in zip(docs, identifiers):
+        doc._.identifier = identifier
+        docbin.add(doc)
+    temp_path = shard_path.with_name(shard_path.name + '.tmp')
+    docbin.to_disk(temp_path)
+    os.replace(temp_path, shard_path)
+    return _file_hash(shard_path)
+
+
+def _plan_shards(pd_series, path, batch_size, resume):
+    """Return the manifest of the docbin of `pd_series` at `path` (see
+    create_many_docbins), keeping only the shards already valid if
+    `resume`, and a list of (shard name, shard path, subseries) of the
+    shards still to create. Shard files that aren't part of the docbin
+    (e.g. left from an earlier run with a different batch size) are
+    removed."""
+    if pd_series.size <= batch_size:
+        shard_paths = {path.name: path.with_suffix('.spacy')}
+    else:
+        shard_paths = {str(i // batch_size): 
+            path.with_suffix('') / f"{i // batch_size}.spacy"
+            for i in range(0, pd_series.size, batch_size)}
+        path.with_suffix('').mkdir(exist_ok=True)
+    old_shards = {}
+    manifest_path = _manifest_path(path)
+    if resume and manifest_path.exists():
+        with manifest_path.open("rt", encoding="utf-8") as manifest_file:
+            old_manifest = json.load(manifest_file)
+        if (old_manifest['model'] == SPACY_MODEL
+                and old_manifest['batch_size'] == batch_size):
+            old_shards = old_manifest['shards']
+    existing = [path.with_suffix('.spacy')]
+    if path.with_suffix('').is_dir():
+        existing.extend(path.with_suffix('').glob('*.spacy'))
+    for shard_path in existing:
+        if shard_path.exists() and shard_path not in shard_paths.values():
+            logger.debug(f"Removing {shard_path}, which isn't a shard of "
+                f"the docbin")
+            shard_path.unlink()
+    shard_dir = path.with_suffix('')
+    if pd_series.size <= batch_size and shard_dir.is_dir() \
+            and not any(shard_dir.iterdir()):
+        # The docbin was in shards before: don't leave their directory, 
+        # which would hide the single file from docbin_shard_paths
+        shard_dir.rmdir()
+    manifest = {'model': SPACY_MODEL, 'batch_size': batch_size,
+        'n_docs': int(pd_series.size), 'shards': {}}
+    todo = []
+    for k, (name, shard_path) in enumerate(shard_paths.items()):
+        subseries = pd_series[k * batch_size: (k + 1) * batch_size]
+        entry = {'n_docs': int(subseries.size),
+            'input': _input_hash(subseries)}
+        old_entry = old_shards.get(name)
+        if (old_entry is not None and shard_path.exists()
+                and old_entry['input'] == entry['input']
+                and old_entry['sha256'] == _file_hash(shard_path)):
+            manifest['shards'][name] = old_entry
+        else:
+            todo.append((name, shard_path, subseries, entry))
+    return manifest, todo
+
+
+def create_many_docbins(series_paths, batch_size=2000, workers=DOCBIN_WORKERS,
+        resume=False):
+    """Create the docbin of each (pd_series, path) pair in `series_paths`
+    (see create_docbins), all at the same time. Each docbin is split into
+    shards of `batch_size` docs (a directory at `path` of files 0.spacy, 
+    1.spacy etc., or the single file `path`.spacy if there is only one).
+    The shards are created by a pool of `workers` worker processes (all
+    CPUs if None, or in this process if 1), each of which loads the spacy
+    pipeline once and writes the shards it creates to disk itself.
+
+    A manifest (`path`.manifest.json) records the shards of each docbin
+    completed so far, with a hash of their input texts and of the file. If
+    `resume`, the shards that are already complete and valid (for the same
+    texts, batch size and spacy pipeline) are not created again, so an
+    interrupted run can be continued."""
+    plans = []
+    for pd_series, path in series_paths:
+        path = Path(path)
+        if not path.parent.exists():
+            raise FileNotFoundError(f"{path.parent} does not exist")
+        mem_size = pd_series.memory_usage()
+        msg = (f"Running spacy pipeline on Series '{pd_series.name}' of "
+            f"length {len(pd_series)} (size in memory: "
+            f"{mem_size / 1_000_000.0:.3f} MB).")
+        if mem_size > 50 * 10**6: # Over 50 MB
+            msg += " This may take a while..."
+        logger.info(msg)
+        manifest, todo = _plan_shards(pd_series, path, batch_size, resume)
+        n_shards = len(manifest['shards']) + len(todo)
+        if manifest['shards']:
+            logger.info(f"Resuming docbin {path}: {len(manifest['shards'])} "
+                f"of {n_shards} shards already done")
+        _write_manifest(path, manifest)
+        plans.append((path, manifest, todo))
+    # Take the shards of the docbins in turn, so that they are all created
+    # at the same time
+    tasks = [task for tasks in zip_longest(*(
+            [(path, manifest, *shard) for shard in todo]
+            for path, manifest, todo in plans))
+        for task in tasks if task is not None]
+
+    def shard_done(task, file_hash):
+        path, manifest, name, shard_path, _, entry = task
+        manifest['shards'][name] = {**entry, 'sha256': file_hash}
+        _write_manifest(path, manifest)
+        logger.info(f"Saved {shard_path}")
+
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            _, _, _, shard_path, subseries, _ = task
+            shard_done(task, _create_shard(subseries.tolist(),
+                list(subseries.index), shard_path))
+        return
+    logger.info(f"Creating {len(tasks)} docbin shards with {workers} worker "
+        "processes")
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_load_worker_model) as executor:
+        # At most 2 * workers shards are in flight at a time, so that the
+        # texts of all the shards aren't sent to the workers at once
+        pending = {}
+        for task in tasks:
+            _, _, _, shard_path, subseries, _ = task
+            pending[executor.submit(_create_shard, subseries.tolist(),
+                list(subseries.index), shard_path)] = task
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard_done(pending.pop(future), future.result())
+        for future in as_completed(pending):
+            shard_done(pending[future], future.result())
+
+
+def create_docbins(pd_series, path, batch_size=2000, workers=DOCBIN_WORKERS,
+        resume=False):
     """Saves .spacy DocBin file(s) to `path`, where the DocBin
     consists of Doc objects created from the entries of a string
     pandas Series `pd_series`. 
@@ -47,83 +251,61 @@ def create_docbins(pd_series, path, batch_size=2000):
     If the series is larger than the batch size, a directory will be 
     created at the `path` and spacy files saved within. If the 
     docs will fit in one file, the '.spacy' extension will be added 
-    appropriately."""
-    path = Path(path)
-    if not path.parent.exists():
-        raise FileNotFoundError(f"{path.parent} does not exist")
-    mem_size = pd_series.memory_usage()
-    msg = (f"Running spacy pipeline on Series '{pd_series.name}' of length "
-        f"{len(pd_series)} (size in memory: {mem_size / 1_000_000.0:.3f} MB).")
-    if mem_size > 50 * 10**6: # Over 50 MB
-        msg += " This may take a while..."
-    logger.info(msg)
-    # If fewer than batch_size docs are in the Series, save to a single file.
-    if pd_series.size <= batch_size:
-        parent = path.parent
-    else:
-        parent = path.with_suffix('')
-        parent.mkdir(exist_ok=True)
-    for i in range(0, pd_series.size, batch_size):
-        batch_num = (i+1)//batch_size
-        logger.info(f"Running batch {batch_num}: docs {i+1} through "
-            f"{min([i + batch_size, pd_series.size])}")
-        dc = DocCreator()
-        subseries = pd_series[i: i + batch_size]
-        docs = dc.transform(subseries)
-        for idx, doc in zip(subseries.index, docs):
-            doc._.identifier = idx
-        docbin = DocBin(store_user_data=True, docs=docs)
-        if pd_series.size <= batch_size:
-            docbin_path = parent / path.stem.with_suffix('.spacy')
-        else:
-            docbin_path = parent / f"{batch_num}.spacy"
-        logger.info(f"Saving to {docbin_path}")
-        docbin.to_disk(docbin_path)
+    appropriately. See create_many_docbins for `workers` and `resume`."""
+    create_many_docbins([(pd_series, path)], batch_size, workers, resume)
 
 
-def load_docbins(path, index_names=None, index_dtypes=None):
-    """Load (a collection of) .spacy DocBin files into a pandas
-    Series. To retrieve the index stored in the docbin (which would 
-    have been set when they were created), specify a tuple of 
-    index names and another tuple of index data types. Otherwise,
-    the Series is indexed by integers."""
-    if (index_names is not None and index_dtypes is not None 
-            and len(index_names) != len(index_dtypes)):
-        raise DocBinError("The number of provided index names "
-            f"({len(index_names)}) and index dtypes ({len(index_dtypes)}) "
-            "do not match.")
+def _shard_order(shard_path):
+    """Sort key of the shard files of a docbin: numerically by name (0, 1,
+    2, ..., 10, ...), then any other names alphabetically."""
+    if shard_path.stem.isdigit():
+        return (0, int(shard_path.stem), '')
+    return (1, 0, shard_path.stem)
+
+
+def docbin_shard_paths(path):
+    """Return a list of the .spacy files of the docbin at `path` (see
+    create_docbins), in a stable order: the shards of a directory in
+    numeric order (the order their docs were in), or the single file
+    `path`.spacy (if the directory has no shards)."""
     path = Path(path)
     if path.exists() and path.is_dir():
-        multi=True
-    elif path.with_suffix('.spacy').exists():
-        multi=False
-    else:
-        raise DocBinError(f"{path} does not exist")
-    nlp = spacy.load("en_core_web_sm")
-    if multi:
-        logger.info(f"Loading docbins at {path}")
-        docs = []
-        for child in path.iterdir():
-            if child.suffix == '.spacy':
-                docbin = DocBin().from_disk(child)
-                docs.extend(docbin.get_docs(nlp.vocab))
+        shard_paths = sorted(path.glob('*.spacy'), key=_shard_order)
+        if shard_paths:
+            return shard_paths
+    if path.with_suffix('.spacy').exists():
+        return [path.with_suffix('.spacy')]
+    raise DocBinError(f"{path} does not exist")
+
+
+def _as_identifier(identifier):
+    # A MultiIndex identifier may come back from the docbin as a list
+    return tuple(identifier) if isinstance(identifier, list) else identifier
+
+
+def iter_docbins(path):
+    """Generate the docs of the docbin at `path` shard by shard (see
+    docbin_shard_paths), as a list of (identifier, Doc) pairs for each
+    shard, so that only one shard is in memory at a time."""
+    vocab = load_model().vocab
+    for shard_path in docbin_shard_paths(path):
+        logger.debug(f"Loading docbin shard {shard_path}")
+        docbin = DocBin().from_disk(shard_path)
+        yield [(_as_identifier(doc._.identifier), doc) 
+            for doc in docbin.get_docs(vocab)]
+
+
+def _docbin_index(identifiers, index_names, index_dtypes):
+    """Return an index of `identifiers` with the names and dtypes passed
+    to load_docbins."""
+    logger.debug(f"Creating index for docs using names {index_names}")
+    if len(index_names) == 1:
+        name = index_names[0]
     else:
-        path = path.with_suffix('.spacy')
-        logger.info(f"Loading docbin at {path}")
-        docbin = DocBin().from_disk(path)
-        docs = list(docbin.get_docs(nlp.vocab))
-    # Create index, if specified, using each doc's 'identifier' attribute.
-    if index_names is not None:
-        logger.debug(f"Creating index for docs using names {index_names}")
-        if len(index_names) == 1:
-            name = index_names[0]
-        else:
-            name = tuple(index_names)
-        index = pd.Index(
-            [doc._.identifier for doc in docs], 
-            name=name
-        )
-        # Change index dtypes as specified
+        name = tuple(index_names)
+    index = pd.Index(identifiers, name=name)
+    # Change index dtypes as specified
+    if index_dtypes is not None:
         logger.debug(f"Overriding index dtype(s) to {index_dtypes}")
         if isinstance(index, pd.MultiIndex):
             index = index.set_levels(
@@ -132,6 +314,105 @@ def load_docbins(path, index_names=None, index_dtypes=None):
             )
         else: # Just a single index
             index = index.astype(index_dtypes[0])
+    return index
+
+
+def _check_index_params(index_names, index_dtypes):
+    if (index_names is not None and index_dtypes is not None 
+            and len(index_names) != len(index_dtypes)):
+        raise DocBinError("The number of provided index names "
+            f"({len(index_names)}) and index dtypes ({len(index_dtypes)}) "
+            "do not match.")
+
+
+def load_docbins(path, index_names=None, index_dtypes=None):
+    """Load (a collection of) .spacy DocBin files into a pandas
+    Series. To retrieve the index stored in the docbin (which would 
+    have been set when they were created), specify a tuple of 
+    index names and another tuple of index data types. Otherwise,
+    the Series is indexed by integers. The docs are in the order of
+    docbin_shard_paths. (See DocBinView to go through the docs without
+    loading them all.)"""
+    _check_index_params(index_names, index_dtypes)
+    logger.info(f"Loading docbin(s) at {path}")
+    identifiers, docs = [], []
+    for batch in iter_docbins(path):
+        for identifier, doc in batch:
+            identifiers.append(identifier)
+            docs.append(doc)
+    # Create index, if specified, using each doc's 'identifier' attribute.
+    if index_names is not None:
+        index = _docbin_index(identifiers, index_names, index_dtypes)
         return pd.Series(docs, index=index)
     else:
         return pd.Series(docs)
+
+
+# The key of the identifier attribute in the user data of a Doc
+IDENTIFIER_KEY = ('._.', 'identifier', None, None)
+
+
+class DocBinView:
+    """A lazy, read-only Series-like view of the docs of the docbin at
+    `path` (see load_docbins for `index_names` and `index_dtypes`).
+    Nothing is loaded when it is created. Iterating over it loads one shard
+    at a time, so a transformer (e.g. LemmaCounter) can go through the
+    whole docbin without holding all of its Docs in memory. The index is
+    read from the docbin (without creating the Docs) when first needed."""
+
+    def __init__(self, path, index_names=None, index_dtypes=None):
+        _check_index_params(index_names, index_dtypes)
+        self.path = Path(path)
+        self.index_names = index_names
+        self.index_dtypes = index_dtypes
+        self.shard_paths = docbin_shard_paths(path)
+        self._index = None
+
+    def _identifiers(self):
+        for shard_path in self.shard_paths:
+            docbin = DocBin(store_user_data=True).from_disk(shard_path)
+            for user_data in docbin.user_data:
+                yield _as_identifier(None if user_data is None else 
+                    srsly.msgpack_loads(user_data, use_list=False)
+                        .get(IDENTIFIER_KEY))
+
+    @property
+    def index(self):
+        """The index of the docs (a RangeIndex if no index names were
+        passed), in the order they are iterated over."""
+        if self._index is None:
+            identifiers = list(self._identifiers())
+            if self.index_names is None:
+                self._index = pd.RangeIndex(len(identifiers))
+            else:
+                self._index = _docbin_index(identifiers, self.index_names,
+                    self.index_dtypes)
+        return self._index
+
+    @property
+    def size(self):
+        return len(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def iter_batches(self):
+        """Generate a list of the (identifier, Doc) pairs of each shard."""
+        return iter_docbins(self.path)
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            for _, doc in batch:
+                yield doc
+
+    def items(self):
+        """Generate (index label, Doc) pairs, like Series.items."""
+        return zip(self.index, self)
+
+    def to_series(self):
+        """Load all the docs into a Series (as load_docbins)."""
+        return pd.Series(list(self), index=self.index, dtype=object)
+
+    def __repr__(self):
+        return (f"{type(self).__name__}({str(self.path)!r}, "
+            f"{len(self.shard_paths)} shards)")
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .dochandling import DocBinError
+from .lemma_counter import LemmaCounter
+from ..preprocessing.corpus_store import _write_npz, _read_npz
+from ..preprocessing.data_loading import load_train_test_classes, \
+    load_train_test_docs
+from ..settings import LEMMA_FEATURE_PATH, LEMMA_FEATURE_OPTIONS, \
+    DOCBIN_PATH, DOCBIN_FILENAMES, SPAM_CLASS_PATH, SPAM_CLASS_FILENAMES, \
+    SPACY_MODEL
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# Increase this when the layout of the store changes
+FEATURE_STORE_VERSION = 2
+SPLITS = ('train', 'test')
+FIELDS = ('subject', 'body')
+# The arrays of a CSR matrix, each stored in its own .npy file
+CSR_ARRAYS = ('data', 'indices', 'indptr')
+INDEX_NAMES = ['corpus', 'path']
+
+
+class FeatureStoreError(Exception):
+    pass
+
+
+class LemmaFeatureStore:
+    """A store (a directory at `path`) of the lemma counts of the subject
+    and body of the emails of the training and test sets: for each field,
+    its vocabulary (the lemmas of the training set, in sorted order), and
+    for each split and field a CSR matrix of counts whose rows are in the
+    order of the split's index (that of its class file), and for each split
+    the matrices of all the fields side by side (the features the text
+    model is trained on). Each array of the matrices is a .npy file, so
+    that they can be memory-mapped: loading is almost instant, and
+    processes using the same matrices (e.g. the jobs of a hyperparameter
+    search) share their pages instead of copying them. A manifest (written
+    last) records the shapes, the columns of each field in the features and
+    the Lemmatizer options of each field."""
+
+    def __init__(self, path=LEMMA_FEATURE_PATH):
+        self.path = Path(path)
+        self._manifest = None
+
+    def _array_path(self, split, field, name):
+        return self.path / f"{split}_{field}_{name}.npy"
+
+    def _vocabulary_path(self, field):
+        return self.path / f"{field}_vocabulary.json"
+
+    def _index_path(self, split):
+        return self.path / f"{split}_index.npz"
+
+    def _manifest_path(self):
+        return self.path / "manifest.json"
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            manifest_path = self._manifest_path()
+            if not manifest_path.exists():
+                raise FeatureStoreError(f"There is no lemma feature store "
+                    f"at {self.path}. (Have you run build_lemma_features.py "
+                    "yet?)")
+            with manifest_path.open("rt", encoding="utf-8") as manifest_file:
+                self._manifest = json.load(manifest_file)
+            if self._manifest['version'] != FEATURE_STORE_VERSION:
+                raise FeatureStoreError(f"The lemma feature store at "
+                    f"{self.path} is from another version. Build it again.")
+        return self._manifest
+
+    def save(self, vocabularies, matrices, indexes, options):
+        """Store the dict of the vocabulary (list of lemmas) of each field,
+        the dict of the CSR matrix of each (split, field) (for each split,
+        the matrices of the fields are also stored side by side, in the
+        order of FIELDS), the dict of the index of each split and the dict
+        of the Lemmatizer options of each field."""
+        logger.info(f"Saving the lemma feature store to {self.path}")
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest_path = self._manifest_path()
+        if manifest_path.exists():
+            manifest_path.unlink()
+        self._manifest = None
+        def replace(path, write):
+            temp_path = path.with_name(path.name + '.tmp')
+            with temp_path.open("wb") as file:
+                write(file)
+            os.replace(temp_path, path)
+        shapes = {}
+        features = {split: sp.hstack([matrices[split, field]
+                for field in FIELDS], format='csr')
+            for split in dict.fromkeys(split for split, _ in matrices)}
+        matrices = {**matrices,
+            **{(split, 'features'): matrix
+                for split, matrix in features.items()}}
+        for (split, field), matrix in matrices.items():
+            matrix = matrix.tocsr()
+            matrix.sort_indices()
+            for name in CSR_ARRAYS:
+                replace(self._array_path(split, field, name),
+                    lambda file: np.save(file, getattr(matrix, name)))
+            shapes[f"{split}_{field}"] = list(matrix.shape)
+        columns, start = {}, 0
+        for field in FIELDS:
+            end = start + len(vocabularies[field])
+            columns[field] = [start, end]
+            start = end
+        for field, vocabulary in vocabularies.items():
+            replace(self._vocabulary_path(field),
+                lambda file: file.write(json.dumps(vocabulary).encode('utf-8')))
+        for split, index in indexes.items():
+            replace(self._index_path(split),
+                lambda file: _write_npz(index.to_frame(index=False), file))
+        manifest = {'version': FEATURE_STORE_VERSION, 'model': SPACY_MODEL,
+            'options': options, 'shapes': shapes, 'columns': columns}
+        replace(manifest_path,
+            lambda file: file.write(json.dumps(manifest).encode('utf-8')))
+
+    def vocabulary(self, field):
+        """Return the list of the lemmas (the columns) of `field`."""
+        with self._vocabulary_path(field).open("rt", encoding="utf-8") as file:
+            return json.load(file)
+
+    def options(self, field):
+        """Return the Lemmatizer options the counts of `field` were made
+        with."""
+        return self.manifest['options'][field]
+
+    def index(self, split):
+        """Return the (corpus, path) index of the rows of `split`."""
+        df = _read_npz(self._index_path(split))
+        for column in INDEX_NAMES:
+            df[column] = df[column].astype('string')
+        return pd.MultiIndex.from_frame(df)
+
+    def matrix(self, split, field, mmap=True):
+        """Return the CSR matrix of lemma counts of `field` in `split`. If
+        `mmap`, its arrays are read-only memory maps of the files."""
+        shape = tuple(self.manifest['shapes'][f"{split}_{field}"])
+        arrays = [np.load(self._array_path(split, field, name),
+                mmap_mode='r' if mmap else None)
+            for name in CSR_ARRAYS]
+        return sp.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+    def features(self, split, mmap=True):
+        """Return the CSR matrix of the lemma counts of all the fields in
+        `split` side by side (with the columns of each field in turn, see
+        columns). If `mmap`, its arrays are read-only memory maps of the
+        files, like those of matrix."""
+        return self.matrix(split, 'features', mmap)
+
+    def columns(self, field):
+        """Return the slice of the columns of `field` in the features."""
+        return slice(*self.manifest['columns'][field])
+
+    def check_index(self, split, classes):
+        """Raise a FeatureStoreError if the rows of `split` aren't those of
+        the Series `classes` (in the same order)."""
+        if not self.index(split).equals(classes.index):
+            raise FeatureStoreError(f"The {split} rows of the lemma feature "
+                f"store at {self.path} don't match the classes. Build it "
+                "again.")
+
+
+def build_lemma_features(path=LEMMA_FEATURE_PATH, docbin_path=DOCBIN_PATH,
+        docbin_names=DOCBIN_FILENAMES, class_path=SPAM_CLASS_PATH,
+        class_filenames=SPAM_CLASS_FILENAMES, options=LEMMA_FEATURE_OPTIONS):
+    """Count the lemmas of the subject and body of the emails in the
+    docbins with LemmaCounter (with the options of each field in
+    `options`), fitting the vocabulary on the training set, and save the
+    counts in a LemmaFeatureStore at `path`, with the rows in the order of
+    the class files. The docbins are read one shard at a time."""
+    train_classes, test_classes = load_train_test_classes(class_path,
+        class_filenames)
+    classes = {'train': train_classes, 'test': test_classes}
+    docs = dict(zip(SPLITS, load_train_test_docs(train_classes, test_classes,
+        docbin_path, docbin_names, lazy=True)))
+    # The row of the docs of each split (in docbin order) for each class
+    positions = {}
+    for split in SPLITS:
+        positions[split] = docs[split]['body_doc'].index.get_indexer(
+            classes[split].index)
+        if (positions[split] < 0).any():
+            raise DocBinError(f"The {split} docbins have no docs for some "
+                "of the classes.")
+    vocabularies, matrices = {}, {}
+    for field in FIELDS:
+        counter = LemmaCounter(**options[field])
+        for split in SPLITS:
+            logger.info(f"Counting the lemmas of the {field} of the "
+                f"{split} emails")
+            view = docs[split][f"{field}_doc"]
+            if split == 'train':
+                counts = counter.fit_transform(view)
+            else:
+                counts = counter.transform(view)
+            matrices[split, field] = counts[positions[split]]
+        vocabularies[field] = counter.feature_names_
+    LemmaFeatureStore(path).save(vocabularies, matrices,
+        {split: classes[split].index for split in SPLITS}, options)
+    return LemmaFeatureStore(path)
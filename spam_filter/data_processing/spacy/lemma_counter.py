@@ -0,0 +1,196 @@
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from spacy.attrs import LEMMA, IS_STOP, IS_PUNCT, LIKE_NUM, LIKE_EMAIL, \
+    LIKE_URL
+from spacy.strings import hash_string
+from spacy.tokens import Doc
+
+from .dochandling import DocBinView
+from .lemmatizer import Lemmatizer
+from .models import load_model
+from .parallel import pipe_texts
+from ..settings import SPACY_WORKERS, SPACY_PARALLEL_THRESHOLD
+
+
+# The attributes of the tokens of a Doc pulled (with Doc.to_array) to count
+# its lemmas, and the column of each
+TOKEN_ATTRS = [LEMMA, IS_STOP, IS_PUNCT, LIKE_NUM, LIKE_EMAIL, LIKE_URL]
+LEMMA_COLUMN, IS_STOP_COLUMN, IS_PUNCT_COLUMN, LIKE_NUM_COLUMN, \
+    LIKE_EMAIL_COLUMN, LIKE_URL_COLUMN = range(len(TOKEN_ATTRS))
+
+
+class LemmaCounter(Lemmatizer):
+    """A transformer that does the work of DocCreator, Lemmatizer and
+    DictVectorizer at once: it takes texts (or spacy Doc objects, or a
+    DocBinView) as input and returns a sparse matrix of the counts of the
+    lemmas of each (the same matrix as Lemmatizer followed by
+    DictVectorizer). Texts are streamed through the spacy pipeline in
+    batches of `batch_size` (in this process, or in a pool of `workers`
+    worker processes for batches of at least `parallel_threshold` texts if
+    it isn't None; see pipe_texts), and each Doc is thrown away as soon as
+    its lemmas are counted, so the Docs are never all kept in memory. The
+    lemmas counted are the same as Lemmatizer's (see
+    Lemmatizer.exclude_token).
+
+    Like DictVectorizer, the columns are the lemmas seen when fitting, in
+    sorted order (`feature_names_`, and `vocabulary_` maps each to its
+    column), and other lemmas are ignored by transform. If a `vocabulary`
+    (a list of lemmas) is passed, its lemmas are the columns instead, and
+    fitting doesn't look at the data (e.g. to use the vocabulary of a
+    lemma feature store)."""
+
+    def __init__(self, del_stop=False, del_punct=True, del_num=False,
+            batch_size=250, workers=SPACY_WORKERS,
+            parallel_threshold=SPACY_PARALLEL_THRESHOLD, vocabulary=None):
+        super().__init__(del_stop, del_punct, del_num)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.vocabulary = vocabulary
+
+    @property
+    def nlp(self):
+        # The spacy pipeline is shared (see models.py), and not pickled
+        # with the transformer
+        return load_model()
+
+    def _docs(self, X):
+        """Return an iterator of the Docs of the texts (or Docs) in X. A
+        DocBinView is iterated over one shard at a time. Like DocCreator,
+        raise a ValueError if X has missing values (or anything else that
+        isn't a text), rather than counting the lemmas of e.g. "nan"."""
+        if isinstance(X, DocBinView):
+            return iter(X)
+        if isinstance(X, pd.DataFrame) or isinstance(X, pd.Series):
+            X = X.to_numpy()
+        X = np.asarray(X, dtype=object)
+        if X.size and isinstance(X.flat[0], Doc):
+            return X.flat
+        texts = list(X.flat)
+        for text in texts:
+            if not isinstance(text, str):
+                raise ValueError(f"Expected a text, but got {text!r} (fill "
+                    f"in missing values before counting lemmas)")
+        return pipe_texts(texts, self.batch_size, self.workers,
+            self.parallel_threshold)
+
+    def _keep_tokens(self, tokens):
+        """Return a boolean mask of the rows of `tokens` (an array of the
+        TOKEN_ATTRS of tokens) that aren't excluded by their flags (as in
+        Lemmatizer.exclude_token, except for the check that the lemma is
+        known, which is done for each distinct lemma)."""
+        keep = (tokens[:, LIKE_EMAIL_COLUMN] == 0) \
+            & (tokens[:, LIKE_URL_COLUMN] == 0)
+        if self.del_stop:
+            keep &= tokens[:, IS_STOP_COLUMN] == 0
+        if self.del_punct:
+            keep &= tokens[:, IS_PUNCT_COLUMN] == 0
+        if self.del_num:
+            keep &= tokens[:, LIKE_NUM_COLUMN] == 0
+        return keep
+
+    def _count_batch(self, docs, columns, fitting, lemma_columns):
+        """Return the CSR matrix of lemma counts of the list `docs` (see
+        _count). `lemma_columns` caches the column of each lemma hash seen
+        so far (-1 for lemmas not counted)."""
+        arrays = [doc.to_array(TOKEN_ATTRS) for doc in docs]
+        tokens = np.concatenate(arrays) if arrays else \
+            np.empty((0, len(TOKEN_ATTRS)), dtype=np.uint64)
+        rows = np.repeat(np.arange(len(docs)), [len(a) for a in arrays])
+        keep = self._keep_tokens(tokens)
+        lemmas, rows = tokens[keep, LEMMA_COLUMN], rows[keep]
+        distinct, inverse = np.unique(lemmas, return_inverse=True)
+        strings = self.strings
+        distinct_columns = np.empty(len(distinct), dtype=np.int64)
+        for i, lemma_hash in enumerate(distinct.tolist()):
+            column = lemma_columns.get(lemma_hash)
+            if column is None:
+                if lemma_hash not in strings:
+                    column = -1
+                elif lemma_hash in columns:
+                    column = columns[lemma_hash]
+                elif fitting:
+                    column = columns[lemma_hash] = len(columns)
+                else:
+                    column = -1
+                lemma_columns[lemma_hash] = column
+            distinct_columns[i] = column
+        token_columns = distinct_columns[inverse]
+        counted = token_columns >= 0
+        n_columns = max(len(columns), 1)
+        # Count each (row, column) pair: the pairs come out sorted by row,
+        # then column, as the CSR matrix needs them
+        pairs, counts = np.unique(rows[counted] * n_columns
+            + token_columns[counted], return_counts=True)
+        indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // n_columns, minlength=len(docs)),
+            out=indptr[1:])
+        return sp.csr_matrix((counts.astype(np.float64),
+                (pairs % n_columns).astype(np.intc), indptr),
+            shape=(len(docs), len(columns)))
+
+    def _count(self, X, columns, fitting):
+        """Return the matrix of lemma counts of X, in the columns `columns`
+        (a dict of lemma hash to column), adding new lemmas to `columns`
+        if `fitting`. The docs are counted in batches of `batch_size`: the
+        attributes of all their tokens are pulled into one array, the
+        tokens excluded by their flags are masked out, and the (doc, lemma)
+        pairs left are counted with NumPy, so that only each distinct lemma
+        of a batch is looked at in Python."""
+        lemma_columns = {}
+        batches = []
+        docs = iter(self._docs(X))
+        while True:
+            batch = list(islice(docs, self.batch_size))
+            if not batch:
+                break
+            batches.append(self._count_batch(batch, columns, fitting,
+                lemma_columns))
+        if not batches:
+            return sp.csr_matrix((0, len(columns)))
+        # The batches counted while fitting have fewer columns than the last
+        for i, counts in enumerate(batches):
+            batches[i] = sp.csr_matrix((counts.data, counts.indices,
+                counts.indptr), shape=(counts.shape[0], len(columns)))
+        return sp.vstack(batches, format='csr')
+
+    def _set_feature_names(self, feature_names):
+        self.feature_names_ = list(feature_names)
+        self.vocabulary_ = {lemma: column
+            for column, lemma in enumerate(self.feature_names_)}
+        # The column of each lemma hash, for transform
+        self.lemma_columns_ = {hash_string(lemma): column
+            for lemma, column in self.vocabulary_.items()}
+
+    def fit(self, X, y=None):
+        if self.vocabulary is not None:
+            self._set_feature_names(self.vocabulary)
+            return self
+        self.fit_transform(X)
+        return self
+
+    def fit_transform(self, X, y=None):
+        if self.vocabulary is not None:
+            return self.fit(X).transform(X)
+        columns = {}
+        counts = self._count(X, columns, fitting=True)
+        # Sort the columns by lemma, as DictVectorizer does
+        strings = self.strings
+        lemmas = {lemma_hash: strings[lemma_hash] for lemma_hash in columns}
+        self._set_feature_names(sorted(lemmas.values()))
+        order = np.empty(len(columns), dtype=np.intc)
+        for lemma_hash, column in columns.items():
+            order[column] = self.vocabulary_[lemmas[lemma_hash]]
+        counts = sp.csr_matrix((counts.data, order[counts.indices],
+            counts.indptr), shape=counts.shape)
+        counts.sort_indices()
+        return counts
+
+    def transform(self, X, y=None):
+        return self._count(X, self.lemma_columns_, fitting=False)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_, dtype=object)
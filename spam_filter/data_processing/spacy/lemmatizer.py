@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
-import spacy 
 from spacy.attrs import LEMMA
 
+from .models import model_strings
+
 
 class Lemmatizer(BaseEstimator, TransformerMixin):
     """A transformer that takes spacy Doc objects as input and 
@@ -11,9 +12,11 @@ class Lemmatizer(BaseEstimator, TransformerMixin):
     the default spacy vocab stringstore (for "en_core_web_sm") 
     are returned in the counts."""
 
-    # Store the model as a class attribute in order to check the 
-    # stringstore for known lemmas.
-    nlp = spacy.load("en_core_web_sm")
+    @property
+    def strings(self):
+        # The stringstore of the model as it was loaded, to check for known
+        # lemmas (see models.py)
+        return model_strings()
 
     def __init__(self, del_stop=False, del_punct=True, del_num=False):
         self.del_stop = del_stop
@@ -28,7 +31,7 @@ class Lemmatizer(BaseEstimator, TransformerMixin):
         if isinstance(X, pd.DataFrame) or isinstance(X, pd.Series):
             X = X.to_numpy()
         lemma_counts = [{
-            self.nlp.vocab.strings[lemma_hash]: count 
+            self.strings[lemma_hash]: count 
                 for lemma_hash, count in 
                     doc.count_by(LEMMA, exclude=self.exclude_token).items()
             } for doc in X.flat
@@ -37,7 +40,7 @@ class Lemmatizer(BaseEstimator, TransformerMixin):
 
     def exclude_token(self, token):
         conditions = [
-            token.lemma not in self.nlp.vocab.strings,
+            token.lemma not in self.strings,
             token.like_email,
             token.like_url,
         ]
@@ -0,0 +1,46 @@
+import logging
+import threading
+
+from ..settings import SPACY_MODEL
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# The spacy pipelines loaded in this process, shared by DocCreator,
+# Lemmatizer and load_docbins, and a snapshot of the StringStore of each as
+# it was when loaded. (Processing text adds strings to the vocab of a
+# pipeline, so the snapshot is what tells the strings known to the model
+# apart.) spacy itself is only imported when the first pipeline is loaded.
+_models = {}
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def _load(name):
+    """Load the spacy pipeline `name` (if it isn't loaded yet)."""
+    with _lock:
+        if name not in _models:
+            import spacy
+            from spacy.strings import StringStore
+            logger.info(f"Loading spacy pipeline {name}")
+            nlp = spacy.load(name)
+            _snapshots[name] = StringStore(list(nlp.vocab.strings))
+            _models[name] = nlp
+
+
+def load_model(name=SPACY_MODEL):
+    """Return the spacy pipeline `name`, which is loaded the first time it
+    is needed and then shared within the process."""
+    if name not in _models:
+        _load(name)
+    return _models[name]
+
+
+def model_strings(name=SPACY_MODEL):
+    """Return a StringStore of the strings of the spacy pipeline `name` as
+    it was loaded (see load_model), before any text was processed."""
+    if name not in _snapshots:
+        _load(name)
+    return _snapshots[name]
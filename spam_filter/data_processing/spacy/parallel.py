@@ -0,0 +1,112 @@
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from spacy.tokens import DocBin
+
+from .models import load_model
+from ..settings import SPACY_MODEL, SPACY_WORKERS, SPACY_PARALLEL_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+# The components of the spacy pipeline that aren't needed for the emails
+DISABLED_COMPONENTS = ("parser", "ner")
+
+# The pool of worker processes running the spacy pipeline on large batches
+# of texts. It is started the first time it is needed and then reused by
+# every call (so the workers only load the pipeline once), until the process
+# exits or shutdown_pool is called.
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def _load_worker_model(name):
+    """Load the spacy pipeline `name` in a worker process when it starts."""
+    load_model(name)
+
+
+def _pipe_chunk(texts, name, batch_size, disable):
+    """Run the spacy pipeline `name` on the list `texts` (in a worker
+    process), and return the Docs as the bytes of a DocBin, which are much
+    smaller and faster to send back than pickled Docs."""
+    nlp = load_model(name)
+    docbin = DocBin(store_user_data=True)
+    for doc in nlp.pipe(texts, disable=disable, batch_size=batch_size):
+        docbin.add(doc)
+    return docbin.to_bytes()
+
+
+def get_pool(workers, name=SPACY_MODEL):
+    """Return the persistent pool of `workers` worker processes running the
+    spacy pipeline `name`, starting it if it isn't running (or was started
+    with other arguments)."""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is None or _pool_key != (workers, name):
+            if _pool is not None:
+                _pool.shutdown()
+            logger.info(f"Starting a pool of {workers} worker processes "
+                f"running the spacy pipeline {name}")
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                initializer=_load_worker_model, initargs=(name,))
+            _pool_key = (workers, name)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the worker processes of the persistent pool (if any)."""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_key = None, None
+
+atexit.register(shutdown_pool)
+
+
+def use_pool(n_texts, workers=SPACY_WORKERS,
+        parallel_threshold=SPACY_PARALLEL_THRESHOLD):
+    """Return whether pipe_texts runs the spacy pipeline on `n_texts` texts
+    in the worker pool (and with how many workers), or in this process.
+    The pool is never used if `parallel_threshold` is None."""
+    workers = workers or os.cpu_count()
+    parallel = parallel_threshold is not None and workers > 1 \
+        and n_texts >= parallel_threshold
+    return parallel, workers
+
+
+def pipe_texts(texts, batch_size=250, workers=SPACY_WORKERS,
+        parallel_threshold=SPACY_PARALLEL_THRESHOLD, name=SPACY_MODEL,
+        disable=DISABLED_COMPONENTS):
+    """Generate the Docs of the spacy pipeline `name` for the list `texts`,
+    in order. The texts are processed in this process, which has the lowest
+    latency, unless `parallel_threshold` is not None and there are at least
+    that many: they are then sent in chunks of `batch_size` to the
+    persistent pool of `workers` worker processes (all CPUs if None; 1 to
+    never use it), which each load the pipeline only once."""
+    nlp = load_model(name)
+    parallel, workers = use_pool(len(texts), workers, parallel_threshold)
+    if not parallel:
+        yield from nlp.pipe(texts, disable=list(disable),
+            batch_size=batch_size)
+        return
+    chunks = [texts[i:i + batch_size]
+        for i in range(0, len(texts), batch_size)]
+    try:
+        results = get_pool(workers, name).map(_pipe_chunk, chunks,
+            repeat(name), repeat(batch_size), repeat(list(disable)))
+        for data in results:
+            yield from DocBin().from_bytes(data).get_docs(nlp.vocab)
+    except BrokenProcessPool:
+        # A worker died (the pool can't be used again): start a new pool
+        # next time
+        shutdown_pool()
+        raise
@@ -2,16 +2,24 @@
 
 import logging
 import argparse
+import tarfile
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 
 from data_processing.corpus import (EnronCorpusExtractor, LingCorpusExtractor, 
-    TrecCorpusExtractor)
-from data_processing import CORPORA_CSV_PATH, CORPUS_FILENAMES
+    TrecCorpusExtractor, MboxCorpusExtractor, MaildirCorpusExtractor)
+from data_processing.preprocessing import write_corpus_store
+from data_processing import CORPORA_CSV_PATH, CORPUS_FILENAMES, \
+    CORPUS_STORE_FORMAT
 
 
 EXTRACTORS = {'enron': EnronCorpusExtractor, 'ling': LingCorpusExtractor,
     'trec': TrecCorpusExtractor}
+# Extractors for our own mail. These are only used with `type`, and are 
+# labelled using a labels file or the names of their folders.
+MAILBOX_EXTRACTORS = {'mbox': MboxCorpusExtractor, 
+    'maildir': MaildirCorpusExtractor}
 
 
 class ArgumentError(Exception):
@@ -33,18 +41,38 @@ def existing_directory(string):
     return path
 
 
+def existing_path(string):
+    """A helper function for the arguments parser.
+    Checks if the string specifies an existing file or directory from 
+    the current path."""
+    path = Path(string)
+    if not path.exists():
+        raise FileNotFoundError(string)
+    return path
+
+
+def positive_int(string):
+    """A helper function for the arguments parser.
+    Checks if the string specifies a positive integer."""
+    value = int(string)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{string} is not a positive integer")
+    return value
+
+
 def get_arguments():
     """A function for collecting command-line arguments."""
     parser = argparse.ArgumentParser()
     mode = parser.add_mutually_exclusive_group(required=True)
     mode.add_argument('-t', '--type',
-                        choices=['enron', 'ling', 'trec'],
+                        choices=[*EXTRACTORS, *MAILBOX_EXTRACTORS],
                         help="the type of corpus to extract")
     mode.add_argument('--all', action='store_true', 
                         help=("extract from all corpora subdirectories in the "
                             "passed data_root_path"))
-    parser.add_argument('data_root_path', type=existing_directory,
-                        help="the root directory of the corpus (or corpora)")
+    parser.add_argument('data_root_path', type=existing_path,
+                        help=("the root directory of the corpus (or corpora), "
+                            "or in archive mode, the corpus tarball"))
     parser.add_argument('-d', '--output_dir', type=existing_directory, 
                         default=CORPORA_CSV_PATH,
                         help="the directory to output csv file")
@@ -53,6 +81,38 @@ def get_arguments():
                             "`type` is not `all`)"))
     parser.add_argument('-F', '--force', action='store_true',
                         help="force output file(s) to be overwritten")
+    parser.add_argument('-a', '--archive', action='store_true',
+                        help=("read the emails straight from the corpus "
+                            "tarball(s) without unpacking them. With `--all`, "
+                            "data_root_path should contain the tarballs (and "
+                            "a directory of the Enron tarballs)"))
+    parser.add_argument('-L', '--labels', type=existing_path,
+                        help=("a csv file of labels for the messages or "
+                            "folders of an mbox or maildir `type` corpus "
+                            "(by default, messages in folders named e.g. "
+                            "'Spam' or 'Junk' are spam)"))
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help=("only extract new or changed emails (according "
+                            "to the manifest of a previous extraction) and "
+                            "merge them into the existing output file(s)"))
+    parser.add_argument('-s', '--store_format', 
+                        choices=['csv', 'parquet', 'feather', 'npz'],
+                        default=CORPUS_STORE_FORMAT,
+                        help=("also convert the output csv file(s) to this "
+                            "corpus store format (default set in "
+                            "settings.py)"))
+    parser.add_argument('-w', '--workers', type=positive_int, default=1,
+                        help=("number of worker processes used to extract "
+                            "the emails of each corpus"))
+    parser.add_argument('-T', '--timing', nargs='?', const=20, 
+                        type=positive_int, metavar='N',
+                        help=("time each stage of extracting each email, "
+                            "and write a JSON report with the stage timings "
+                            "and the N (default 20) slowest emails next to "
+                            "each output csv file"))
+    parser.add_argument('-j', '--jobs', type=positive_int, default=1,
+                        help=("number of corpora to extract at the same time "
+                            "(only in `all` mode)"))
     verbosegroup = parser.add_mutually_exclusive_group()
     verbosegroup.add_argument('-v', '--verbose', action='store_true',
                               help=("verbose mode - show extra log info "
@@ -72,6 +132,12 @@ def parse_arguments(args):
     corpus extractor has been instatiated with a root_path based 
     on the arguments provided."""
     extractor_path_list = []
+    if args.jobs > 1 and not args.all:
+        raise ArgumentError("Extracting several corpora at the same time "
+            "(option '--jobs') is only possible in 'all' mode.")
+    if args.labels and args.type not in MAILBOX_EXTRACTORS:
+        raise ArgumentError("A labels file (option '--labels') can only be "
+            "used with an mbox or maildir corpus.")
     if args.all:
         if args.filename:
             raise ArgumentError("In 'all' mode, the "
@@ -80,11 +146,14 @@ def parse_arguments(args):
         # by comparing the start of the directory name with 'enron', 'ling', 
         # and 'trec'. If so, initiate the appropriate extractor, and add it 
         # to extractor_path_list along with an appropriate output_path.
+        if not args.data_root_path.is_dir():
+            raise NotADirectoryError(args.data_root_path)
         for child in args.data_root_path.iterdir():
-            if child.is_dir():
+            if child.is_dir() or (args.archive and tarfile.is_tarfile(child)):
                 for corpus_type, extractor_class in EXTRACTORS.items():
                     if child.name.startswith(corpus_type):
-                        extractor = extractor_class(child) 
+                        extractor = extractor_class(child, 
+                            archive=args.archive)
                         break
                 else:
                     continue
@@ -93,9 +162,18 @@ def parse_arguments(args):
                     if child.name.startswith(name))
                 output_path = args.output_dir / corpus_filename
                 extractor_path_list.append((extractor, output_path))
+    elif args.type in MAILBOX_EXTRACTORS:
+        extractor_class = MAILBOX_EXTRACTORS[args.type]
+        extractor = extractor_class(args.data_root_path, archive=args.archive,
+            labels_path=args.labels)
+        filename = args.filename or f"{args.data_root_path.stem}.csv"
+        output_path = args.output_dir / filename
+        extractor_path_list.append((extractor, output_path))
     else:
+        if not (args.archive or args.data_root_path.is_dir()):
+            raise NotADirectoryError(args.data_root_path)
         extractor_class = EXTRACTORS[args.type]
-        extractor = extractor_class(args.data_root_path)
+        extractor = extractor_class(args.data_root_path, archive=args.archive)
         corpus_filename = next(filename 
             for name, filename in CORPUS_FILENAMES.items() 
             if args.data_root_path.name.startswith(name))
@@ -103,7 +181,8 @@ def parse_arguments(args):
         output_path = args.output_dir / filename
         extractor_path_list.append((extractor, output_path))
     # Only overwrite an existing file if the force filename flag (-F) is used.
-    if not args.force:
+    # In incremental mode, existing files are merged into instead.
+    if not (args.force or args.incremental):
         for _, output_path in extractor_path_list:
             if output_path.exists():
                 raise FileExistsError(f"{output_path} already exists. Use "
@@ -131,11 +210,33 @@ def parse_arguments(args):
     return extractor_path_list
 
 
+def extract(extractor, output_path, args):
+    """Extract the corpus of `extractor` into the csv file `output_path`,
+    and convert it to the corpus store format set in `args`."""
+    timing_report = (output_path.with_name(f"{output_path.stem}.timing.json")
+        if args.timing else None)
+    extractor.create_csv(output_path, workers=args.workers, 
+        incremental=args.incremental, timing_report=timing_report, 
+        slowest=args.timing or 20)
+    write_corpus_store(output_path, args.store_format)
+
+
 def main():
     args = get_arguments()
     extractor_path_list = parse_arguments(args)
-    for extractor, output_path in extractor_path_list:
-        extractor.create_csv(output_path)
+    if args.jobs > 1:
+        # Each corpus is extracted in its own process (which may in turn 
+        # use its own pool of `args.workers` worker processes).
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [
+                executor.submit(extract, extractor, output_path, args)
+                for extractor, output_path in extractor_path_list
+            ]
+            for future in futures:
+                future.result()
+    else:
+        for extractor, output_path in extractor_path_list:
+            extract(extractor, output_path, args)
 
 
 if __name__ == "__main__":
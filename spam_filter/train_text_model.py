@@ -1,43 +1,43 @@
 import joblib
+import numpy as np
 from sklearn.metrics import fbeta_score, classification_report
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import Binarizer, Normalizer
-from sklearn.feature_extraction import DictVectorizer
 from sklearn.feature_extraction.text import TfidfTransformer
 from sklearn.linear_model import SGDClassifier
 
 
-from data_processing.preprocessing import load_train_test_classes, \
-    load_train_test_docs
-from data_processing import Lemmatizer, DocCreator
+from data_processing.preprocessing import load_train_test_classes
+from data_processing.spacy import LemmaFeatureStore, LemmaCounter
 
 
 # Load the data
 print("Loading classes (labels)...")
 train_classes, test_classes = load_train_test_classes()
-print("Loading docbins...")
-train_set, test_set = load_train_test_docs(train_classes, test_classes)
+print("Loading lemma features...")
+store = LemmaFeatureStore()
+store.check_index('train', train_classes)
+store.check_index('test', test_classes)
+# The subject lemma counts, then the body lemma counts (memory-mapped, so
+# they aren't copied into memory, or into each process using them)
+train_set, test_set = store.features('train'), store.features('test')
 y_train = train_classes.to_numpy(dtype='int')
 y_test = test_classes.to_numpy(dtype='int')
 
 
 body_bow_pipeline = Pipeline([
-    ('lemmas', Lemmatizer(del_stop=False, del_punct=False, del_num=False)),
-    ('dict', DictVectorizer()),
     ('tfidf', TfidfTransformer(norm='l2', use_idf=True, sublinear_tf=True)),
 ])
 subject_bow_pipeline = Pipeline([
-    ('lemmas', Lemmatizer(del_stop=False, del_punct=False, del_num=True)),
-    ('dict', DictVectorizer()),
     ('bin', Binarizer()),
     ('norm', Normalizer()),
 ])
 
 fit_clf = Pipeline([
     ('feature_eng', ColumnTransformer([
-            ('subject_bow', subject_bow_pipeline, 0),
-            ('body_bow', body_bow_pipeline, 1),
+            ('subject_bow', subject_bow_pipeline, store.columns('subject')),
+            ('body_bow', body_bow_pipeline, store.columns('body')),
         ])),
     ('sgd', SGDClassifier(loss='modified_huber', 
         class_weight={0: .85, 1: .15}, alpha=2e-5,
@@ -55,8 +55,17 @@ print(classification_report(y_test, y_test_predict,
 
 print(f"F_half score: {fbeta_score(y_test, y_test_predict, beta=.5)}")
 
+# The saved model counts the lemmas of the subject and body text itself, 
+# with the vocabularies of the feature store (so fitting the lemma counters
+# doesn't need any data)
+lemma_counts = ColumnTransformer([
+        (field, LemmaCounter(**store.options(field), 
+            vocabulary=store.vocabulary(field)), column)
+        for column, field in enumerate(('subject', 'body'))
+    ], sparse_threshold=1.0)
+lemma_counts.fit(np.array([['', '']], dtype=object))
 clf = Pipeline([
-    ('create_docs', DocCreator()),
+    ('lemmas', lemma_counts),
     ('fit_clf', fit_clf),
 ])
 model_filename = 'text_model.joblib'
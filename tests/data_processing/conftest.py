@@ -0,0 +1,33 @@
+import pytest
+import spacy
+from spacy.language import Language
+from spacy.strings import StringStore
+
+from spam_filter.data_processing.settings import SPACY_MODEL
+from spam_filter.data_processing.spacy import models
+
+
+# The lemmas known to the lemma_model pipeline
+KNOWN_LEMMAS = ['buy', 'cheap', 'watches', 'now', '!', ',', '50', '%', 'off',
+    'hello', 'bob', 'the', 'meeting', 'is', 'at', '10', 'tomorrow', '.',
+    'see', 'you', 'there', 'click', 'or', 'write', 'to', 'and', 'same',
+    'again', 'words', 'email', 'number', 'subject', 'body']
+
+
+@Language.component("lowercase_lemmas")
+def lowercase_lemmas(doc):
+    for token in doc:
+        token.lemma_ = token.lower_
+    return doc
+
+
+@pytest.fixture
+def lemma_model(monkeypatch):
+    """Use a blank pipeline with lowercased words as lemmas, and a vocab of
+    KNOWN_LEMMAS, as the spacy pipeline."""
+    nlp = spacy.blank('en')
+    nlp.add_pipe("lowercase_lemmas")
+    monkeypatch.setattr(models, '_models', {SPACY_MODEL: nlp})
+    monkeypatch.setattr(models, '_snapshots', 
+        {SPACY_MODEL: StringStore(KNOWN_LEMMAS)})
+    return nlp
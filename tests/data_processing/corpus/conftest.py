@@ -0,0 +1,47 @@
+from email.message import EmailMessage
+
+import pytest
+
+
+def make_email_bytes(subject, body, charset='utf-8', html=False):
+    """Return the bytes of an email with `subject` and a single text part
+    `body` (text/html if `html`)."""
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = 'sender@example.com'
+    msg.set_content(body, subtype='html' if html else 'plain',
+        charset=charset)
+    return msg.as_bytes()
+
+
+def write_trec_email(root_path, name, spam, data):
+    """Write the email `data` (bytes) to data/`name` of the TREC-style
+    corpus at `root_path`, and add it to the index."""
+    (root_path / "data" / name).write_bytes(data)
+    with (root_path / "full" / "index").open("at") as index_file:
+        index_file.write(f"{'spam' if spam else 'ham'} ../data/{name}\n")
+
+
+@pytest.fixture
+def trec_corpus(tmp_path):
+    """Write a small corpus with the directory structure of the TREC corpora
+    to tmp_path / 'trec', and return its path. It has plain text and HTML
+    emails, an email with a rejected charset and an email listed in the
+    index that doesn't exist."""
+    root_path = tmp_path / "trec"
+    (root_path / "data").mkdir(parents=True)
+    (root_path / "full").mkdir()
+    (root_path / "full" / "index").touch()
+    for i in range(12):
+        if i % 4 == 3:
+            data = make_email_bytes(f"Offer {i}",
+                f"<p>Buy <b>now</b>, {i}% off</p>", html=True)
+        else:
+            data = make_email_bytes(f"Subject {i}",
+                f"Hello,\nthis is email {i}.\n\n\"Quoted\", and \\ too\n")
+        write_trec_email(root_path, f"inmail.{i}", i % 2, data)
+    write_trec_email(root_path, "inmail.12", 1,
+        make_email_bytes("Привет", "Привет, мир", charset='koi8-r'))
+    with (root_path / "full" / "index").open("at") as index_file:
+        index_file.write("ham ../data/inmail.missing\n")
+    return root_path
@@ -0,0 +1,125 @@
+import os
+import tarfile
+
+import pandas as pd
+import pytest
+
+from spam_filter.data_processing.corpus.trec import TrecCorpusExtractor
+from spam_filter.data_processing.corpus.manifest import get_manifest_path, \
+    read_manifest
+
+from .conftest import make_email_bytes, write_trec_email
+
+
+def test_incremental_create_csv(trec_corpus, tmp_path):
+    output_path = tmp_path / "incremental.csv"
+    TrecCorpusExtractor(trec_corpus).create_csv(output_path)
+    manifest = read_manifest(get_manifest_path(output_path))
+    assert manifest["data/inmail.0"].status == "extracted"
+    assert manifest["data/inmail.12"].status == "encoding"
+    assert "data/inmail.missing" not in manifest
+    # Change an email, touch another without changing it, and add new ones
+    # (one of them before the others in the index)
+    (trec_corpus / "data" / "inmail.2").write_bytes(
+        make_email_bytes("Changed", "A changed email"))
+    os.utime(trec_corpus / "data" / "inmail.5", ns=(0, 10**18))
+    write_trec_email(trec_corpus, "inmail.13", 0,
+        make_email_bytes("New", "A new email"))
+    index_path = trec_corpus / "full" / "index"
+    index_path.write_text("spam ../data/inmail.first\n"
+        + index_path.read_text())
+    (trec_corpus / "data" / "inmail.first").write_bytes(
+        make_email_bytes("First", "The first email"))
+    TrecCorpusExtractor(trec_corpus).create_csv(output_path,
+        incremental=True)
+    full_path = tmp_path / "full.csv"
+    TrecCorpusExtractor(trec_corpus).create_csv(full_path)
+    assert output_path.read_bytes() == full_path.read_bytes()
+    assert get_manifest_path(output_path).read_bytes() == \
+        get_manifest_path(full_path).read_bytes()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.parametrize('index_first', [True, False])
+def test_create_csv_from_archive(trec_corpus, tmp_path, monkeypatch, 
+        index_first):
+    archive_path = tmp_path / "trec.tgz"
+    index_path = trec_corpus / "full" / "index"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        if index_first:
+            archive.add(index_path, "trec/full/index")
+        # In the order of the index, so that the rows are in the same order
+        for line in index_path.read_text().splitlines():
+            path = trec_corpus / line.split()[1].removeprefix("../")
+            if path.exists():
+                archive.add(path, f"trec/{path.relative_to(trec_corpus)}")
+        if not index_first:
+            archive.add(index_path, "trec/full/index")
+    expected_path = tmp_path / "expected.csv"
+    TrecCorpusExtractor(trec_corpus).create_csv(expected_path)
+    # The archive is only read once (as a stream)
+    opened = []
+    tarfile_open = tarfile.open
+    def open_tarball(*args, **kwargs):
+        if kwargs.get('mode') == "r|*":
+            opened.append(args)
+        return tarfile_open(*args, **kwargs)
+    monkeypatch.setattr(tarfile, 'open', open_tarball)
+    output_path = tmp_path / "archive.csv"
+    TrecCorpusExtractor(archive_path, archive=True).create_csv(output_path)
+    assert len(opened) == 1
+    assert output_path.read_bytes() == expected_path.read_bytes()
+    TrecCorpusExtractor(archive_path, archive=True).create_csv(output_path,
+        incremental=True)
+    assert output_path.read_bytes() == expected_path.read_bytes()
+
+
+def test_create_csv_workers(trec_corpus, tmp_path):
+    paths = {}
+    for workers in (1, 2):
+        paths[workers] = tmp_path / f"workers{workers}.csv"
+        TrecCorpusExtractor(trec_corpus).create_csv(paths[workers], 
+            workers=workers, chunksize=3)
+    assert paths[1].read_bytes() == paths[2].read_bytes()
+    assert get_manifest_path(paths[1]).read_bytes() == \
+        get_manifest_path(paths[2]).read_bytes()
+    df = pd.read_csv(paths[2], dtype="string", escapechar="\\")
+    # The email with a rejected charset and the missing email have no row
+    assert df['path'].tolist() == [f"data/inmail.{i}" for i in range(12)]
+    assert df['subject'][3] == "Offer 3"
+    assert df['body'][0] == 'Hello,\nthis is email 0.\n\n"Quoted", and \\ too\n'
+
+
+def test_create_csv_streams_rows(trec_corpus, tmp_path):
+    output_path = tmp_path / "streamed.csv"
+    # The number of rows extracted, and of rows in the file on disk, each
+    # time a row is about to be extracted
+    progress = []
+    class Extractor(TrecCorpusExtractor):
+        def extracted_rows(self, *args, **kwargs):
+            n_extracted = 0
+            for status, row, entry in super().extracted_rows(*args, **kwargs):
+                progress.append((n_extracted, 
+                    output_path.read_text().count('\n"data/')))
+                n_extracted += status == "extracted"
+                yield status, row, entry
+    Extractor(trec_corpus).create_csv(output_path, flush_every=2)
+    # The rows are written (and flushed every 2 rows) as they are extracted
+    assert all(on_disk >= n_extracted - n_extracted % 2 
+        for n_extracted, on_disk in progress)
+    assert progress[-1][1] >= 10
+
+
+def test_extraction_results_bounded(trec_corpus):
+    extractor = TrecCorpusExtractor(trec_corpus)
+    consumed = []
+    def items():
+        for item in extractor.email_items():
+            consumed.append(item)
+            yield item
+    results = extractor.extraction_results(items(), workers=2, chunksize=1)
+    assert next(results)[0] == "data/inmail.0"
+    # Only 2 * workers chunks are in flight at a time
+    assert len(consumed) == 4
+    assert [result[0] for result in results] == \
+        [f"data/inmail.{i}" for i in range(1, 13)] + ["data/inmail.missing"]
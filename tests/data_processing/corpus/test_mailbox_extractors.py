@@ -0,0 +1,74 @@
+import email
+import mailbox
+from email.policy import default
+
+import pandas as pd
+
+from spam_filter.data_processing.corpus import MboxCorpusExtractor, \
+    MaildirCorpusExtractor
+from spam_filter.data_processing.emailextract import extract_email_data
+
+from .conftest import make_email_bytes
+
+
+def message_bytes(folder, i):
+    if i % 3 == 2:
+        return make_email_bytes(f"{folder} offer {i}",
+            f"<p>Buy <b>now</b></p>\nFrom here, {i}% off", html=True)
+    return make_email_bytes(f"{folder} {i}",
+        f"Hello,\nthis is message {i} in {folder}.\n\nFrom me\n")
+
+
+def expected_row(relpath, spam, data):
+    """Return the row of the email `data` (bytes) as extracted with
+    extract_email_data."""
+    subject, body = extract_email_data(
+        email.message_from_bytes(data, policy=default))
+    return (relpath, spam, subject, body)
+
+
+def read_rows(output_path):
+    df = pd.read_csv(output_path, dtype={'path': str, 'spam': int,
+        'subject': str, 'body': str}, escapechar="\\")
+    return list(df.itertuples(index=False, name=None))
+
+
+def test_mbox_extractor(tmp_path):
+    root_path = tmp_path / "mail"
+    (root_path / "Archive").mkdir(parents=True)
+    (root_path / "notes.txt").write_text("Not an mbox file")
+    expected = []
+    # Labelled by folder name, and by the labels file for Archive/2022
+    for folder, spam in (("Archive/2022", 1), ("Inbox", 0),
+            ("Junk.mbox", 1)):
+        mbox = mailbox.mbox(root_path / folder)
+        for i in range(4):
+            mbox.add(message_bytes(folder, i))
+        mbox.flush()
+        for i, key in enumerate(mbox.keys()):
+            expected.append(expected_row(f"{folder}#{i}", spam,
+                mbox.get_bytes(key)))
+        mbox.close()
+    labels_path = tmp_path / "labels.csv"
+    labels_path.write_text("spam,path\nspam,Archive/2022\n")
+    output_path = tmp_path / "mbox.csv"
+    MboxCorpusExtractor(root_path, labels_path=labels_path).create_csv(
+        output_path, workers=2, chunksize=5)
+    assert read_rows(output_path) == expected
+
+
+def test_maildir_extractor(tmp_path):
+    root_path = tmp_path / "Maildir"
+    inbox = mailbox.Maildir(root_path, create=True)
+    folders = {"": (inbox, 0), ".Junk": (inbox.add_folder("Junk"), 1)}
+    expected = []
+    for name, (folder, spam) in folders.items():
+        for i in range(4):
+            folder.add(message_bytes(name or "INBOX", i))
+        for path in sorted((root_path / name / "new").iterdir()):
+            expected.append(expected_row(
+                path.relative_to(root_path).as_posix(), spam,
+                path.read_bytes()))
+    output_path = tmp_path / "maildir.csv"
+    MaildirCorpusExtractor(root_path).create_csv(output_path)
+    assert read_rows(output_path) == expected
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from spam_filter.data_processing.corpus.trec import TrecCorpusExtractor
+from spam_filter.data_processing.corpus.timing import ExtractionTimer, \
+    TIMED_STAGES, HISTOGRAM_EDGES
+
+
+def test_extraction_timer():
+    timer = ExtractionTimer(slowest=2)
+    for i, seconds in enumerate([0.0005, 0.5, 0.00002, 20.0]):
+        timer.add({'path': str(i), 'size': 10, 'status': 'extracted',
+            'content_types': ['text/plain'], 'read': seconds,
+            'parse': seconds})
+    timer.add({'path': 'missing', 'size': None, 'status': 'missing',
+        'content_types': []})
+    report = timer.report(corpus="test")
+    assert report['corpus'] == "test"
+    assert report['n_emails'] == 5
+    assert report['statuses'] == {'extracted': 4, 'missing': 1}
+    read = report['stages']['read']
+    assert read['total_s'] == pytest.approx(20.50052)
+    assert read['max_ms'] == 20000.0
+    # One email in each of the bins of 10 µs to 31.6 µs, 316 µs to 1 ms,
+    # 316 ms to 1 s, and over 10 s
+    assert read['histogram']['counts'] == [0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 1,
+        0, 0, 1]
+    assert len(read['histogram']['upper_edges_s']) == \
+        len(HISTOGRAM_EDGES) + 1
+    assert sum(report['stages']['html']['histogram']['counts']) == 0
+    assert [record['path'] for record in report['slowest']] == ['3', '1']
+    assert report['slowest'][0]['total'] == pytest.approx(40.0)
+
+
+def test_create_csv_timing_report(trec_corpus, tmp_path):
+    report_path = tmp_path / "timing.json"
+    TrecCorpusExtractor(trec_corpus).create_csv(tmp_path / "timed.csv",
+        workers=2, chunksize=4, timing_report=report_path, slowest=3)
+    with report_path.open() as report_file:
+        report = json.load(report_file)
+    assert report['corpus'] == str(trec_corpus)
+    assert report['workers'] == 2
+    assert report['n_emails'] == 14
+    assert report['statuses'] == {'extracted': 12, 'encoding': 1,
+        'missing': 1}
+    assert set(report['stages']) == set(TIMED_STAGES)
+    counts = {stage: sum(stats['histogram']['counts'])
+        for stage, stats in report['stages'].items()}
+    # Every email that could be read was read, parsed and checked, but the
+    # one with a rejected charset wasn't decoded
+    assert counts['read'] == counts['parse'] == counts['check'] == 13
+    assert counts['decode'] == counts['html'] == 12
+    slowest = report['slowest']
+    assert len(slowest) == 3
+    assert [record['total'] for record in slowest] == \
+        sorted((record['total'] for record in slowest), reverse=True)
+    assert all(record['content_types'] for record in slowest)
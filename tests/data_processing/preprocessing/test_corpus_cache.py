@@ -0,0 +1,115 @@
+import shutil
+import sys
+
+import pytest
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from spam_filter.data_processing.preprocessing.data_loading import \
+    load_train_test_csvs, cleaned_corpora_csvs
+from spam_filter.data_processing.preprocessing.email_cleaning import \
+    normalize_fields, drop_duplicates, drop_non_english
+from spam_filter.data_processing.preprocessing import corpus_cache
+
+
+data_loading = sys.modules[load_train_test_csvs.__module__]
+
+
+@pytest.fixture
+def corpora(tmp_path, monkeypatch):
+    """Write two small corpus csv files to tmp_path, and use a quick 
+    preprocessing pipeline."""
+    for name in ('a', 'b'):
+        pd.DataFrame({
+            'path': [f'{name}/{i}' for i in range(20)],
+            'spam': [i % 2 for i in range(20)],
+            'subject': [f'Subject  {i % 7}' for i in range(20)],
+            'body': [f'Body\n{i % 5}' for i in range(20)],
+        }).to_csv(tmp_path / f'{name}.csv', index=False)
+    monkeypatch.setattr(data_loading, 'corpus_prep', Pipeline([
+        ('email_cleaner', FunctionTransformer(normalize_fields)),
+        ('duplicate_dropper', FunctionTransformer(drop_duplicates)),
+    ]))
+    return tmp_path, {'a': 'a.csv', 'b': 'b.csv'}
+
+
+def fail_to_load(*args, **kwargs):
+    raise AssertionError("the corpora were loaded")
+
+
+def test_load_train_test_csvs_cache(corpora, monkeypatch):
+    path, corpus_names = corpora
+    cache_path = path / 'cache'
+    uncached = load_train_test_csvs(path, corpus_names)
+    cached = load_train_test_csvs(path, corpus_names, cache_path=cache_path)
+    with monkeypatch.context() as patch:
+        patch.setattr(data_loading, 'load_corpora_csvs', fail_to_load)
+        reloaded = load_train_test_csvs(path, corpus_names, 
+            cache_path=cache_path)
+    for expected, *results in zip(uncached, cached, reloaded):
+        for result in results:
+            assert result.equals(expected)
+            assert result.index.equals(expected.index)
+            assert (result.dtypes == expected.dtypes).all()
+    # A different test ratio is a different entry
+    with pytest.raises(AssertionError, match="were loaded"):
+        with monkeypatch.context() as patch:
+            patch.setattr(data_loading, 'load_corpora_csvs', fail_to_load)
+            load_train_test_csvs(path, corpus_names, test_ratio=0.5, 
+                cache_path=cache_path)
+
+
+def test_cleaned_corpora_csvs_cache_rebuilds(corpora, monkeypatch):
+    path, corpus_names = corpora
+    cache_path = path / 'cache'
+    cleaned_corpora_csvs(path, corpus_names, cache_path=cache_path)
+    # Changing a corpus file invalidates the cache
+    pd.DataFrame({'path': ['a/0'], 'spam': [1], 'subject': ['new'], 
+        'body': ['email']}).to_csv(path / 'a.csv', index=False)
+    cleaned = cleaned_corpora_csvs(path, corpus_names, cache_path=cache_path)
+    assert cleaned.equals(cleaned_corpora_csvs(path, corpus_names, 
+        cache_path=None))
+    assert len(list(cache_path.glob('cleaned_*.json'))) == 1
+    # So does changing the pipeline
+    data_loading.corpus_prep.set_params(
+        email_cleaner__kw_args={'flag_multipart': True})
+    with pytest.raises(AssertionError, match="were loaded"):
+        with monkeypatch.context() as patch:
+            patch.setattr(data_loading, 'load_corpora_csvs', fail_to_load)
+            cleaned_corpora_csvs(path, corpus_names, cache_path=cache_path)
+
+
+def test_cache_key_depends_on_helpers(corpora, monkeypatch):
+    path, corpus_names = corpora
+    # A copy of the preprocessing package, whose helpers can be changed
+    package_path = path / 'preprocessing'
+    shutil.copytree(corpus_cache.PREPROCESSING_PATH, package_path,
+        ignore=shutil.ignore_patterns('__pycache__'))
+    monkeypatch.setattr(corpus_cache, 'PREPROCESSING_PATH', package_path)
+    def key():
+        return corpus_cache.cache_key(path, corpus_names, 'csv', 
+            data_loading.corpus_prep)
+    original = key()
+    assert key() == original
+    # Changing a module that no step's function is defined in (but that the
+    # steps use) changes the key
+    with (package_path / 'near_duplicates.py').open('a') as source_file:
+        source_file.write('\n# changed\n')
+    assert key() != original
+
+
+def test_cache_key_ignores_execution_params(corpora):
+    path, corpus_names = corpora
+    def key(**kw_args):
+        return corpus_cache.cache_key(path, corpus_names, 'csv',
+            Pipeline([('language_filter', FunctionTransformer(
+                drop_non_english, kw_args=kw_args))]))
+    original = key()
+    # How many processes detect the languages, and where their cache is,
+    # don't change the result
+    assert key(workers=4) == original
+    assert key(workers=1, cache_path=path / 'languages') == original
+    assert key(detector='langdetect', workers=4) == key(
+        detector='langdetect')
+    assert key(max_chars=10) != original
@@ -0,0 +1,60 @@
+from importlib.util import find_spec
+
+import pandas as pd
+import pytest
+
+from spam_filter.data_processing.preprocessing.corpus_store import \
+    STORE_COLUMNS, STORE_DTYPES, CorpusStoreError, store_path, \
+    write_corpus_store, read_corpus_store, iter_corpus_store
+
+
+needs_pyarrow = pytest.mark.skipif(find_spec("pyarrow") is None,
+    reason="pyarrow is not installed")
+FORMATS = ['csv', 'npz', pytest.param('parquet', marks=needs_pyarrow),
+    pytest.param('feather', marks=needs_pyarrow)]
+
+
+@pytest.fixture
+def corpus_csv(tmp_path):
+    """Write a small corpus csv file (as created by extract_from_corpus.py)
+    with missing values and non-ASCII text, and return its path."""
+    csv_path = tmp_path / "corpus.csv"
+    pd.DataFrame({
+        'path': [f"data/{i}" for i in range(7)],
+        'spam': [i % 2 for i in range(7)],
+        'subject': ["Hello", None, "Ünïcödé ✓", "", "Re: Re:", "x", "Ω"],
+        'body': ["Line one\nline two", "Body, with \"quotes\"", None,
+            "日本語のメール", "", "€100 off!", "end"],
+    }).to_csv(csv_path, index=False)
+    return csv_path
+
+
+@pytest.mark.parametrize('store_format', FORMATS)
+def test_corpus_store_round_trip(corpus_csv, store_format):
+    expected = pd.read_csv(corpus_csv, dtype=STORE_DTYPES)
+    path = write_corpus_store(corpus_csv, store_format)
+    assert path == store_path(corpus_csv, store_format)
+    assert path.exists()
+    df = read_corpus_store(corpus_csv, store_format=store_format)
+    assert list(df.columns) == list(STORE_COLUMNS)
+    assert df.index.equals(expected.index)
+    assert (df.dtypes == expected.dtypes).all()
+    assert df.equals(expected)
+    # Only some of the columns, in the order of STORE_COLUMNS
+    columns = read_corpus_store(corpus_csv, columns=['body', 'spam'],
+        store_format=store_format)
+    assert columns.equals(expected[['spam', 'body']])
+    chunks = list(iter_corpus_store(corpus_csv, 3, columns=['path', 'body'],
+        store_format=store_format))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert pd.concat(chunks).equals(expected[['path', 'body']])
+
+
+def test_corpus_store_errors(corpus_csv):
+    with pytest.raises(CorpusStoreError, match="Unknown"):
+        store_path(corpus_csv, 'xlsx')
+    with pytest.raises(FileNotFoundError):
+        read_corpus_store(corpus_csv, store_format='npz')
+    if find_spec("pyarrow") is None:
+        with pytest.raises(CorpusStoreError, match="pyarrow"):
+            write_corpus_store(corpus_csv, 'parquet')
@@ -1,9 +1,15 @@
+import sys
+
 import pytest
+import numpy as np
 import pandas as pd
 
 from spam_filter.data_processing.preprocessing.email_cleaning import \
     normalize_spaces, all_whitespace_to_na, drop_na_both, drop_duplicates, \
-    drop_multipart_messages, drop_non_english
+    drop_multipart_messages, drop_non_english, normalize_fields, \
+    drop_near_duplicates
+from spam_filter.data_processing.preprocessing.ngram_detector import \
+    get_ngram_detector
 
 
 def test_drop_non_english():
@@ -19,6 +25,63 @@ def test_drop_non_english():
     }))
 
 
+def test_drop_non_english_ngram():
+    lang_df = pd.DataFrame({
+        'subject': ['foo']*7,
+        'body': ['Hello World!', 'ওহে বিশ্ব!', 'Hallo Welt!', 'Hola món!', 
+            '¡Hola Mundo!', ' ', None]
+    })
+    dropped = drop_non_english(lang_df, detector='ngram')
+    assert dropped.equals(drop_non_english(lang_df, detector='langdetect'))
+
+
+def test_ngram_detector_nul_characters():
+    detector = get_ngram_detector()
+    texts = ['Hello World, how are you?', 'Hallo Welt, wie geht es dir?',
+        'Bonjour le monde, comment allez-vous ?']
+    with_nul = ['\0Hello\0World, how are\0\0you?\0', texts[1], 
+        'Bonjour le\0monde, comment allez-vous ?']
+    # A NUL character doesn't start a new text: it is a space, as for 
+    # langdetect
+    counts = detector.ngram_counts(with_nul)
+    assert counts.shape[0] == 3
+    assert (counts != detector.ngram_counts(
+        [text.replace('\0', ' ') for text in with_nul])).nnz == 0
+    assert detector.detect(with_nul) == detector.detect(texts) == \
+        ['en', 'de', 'fr']
+    assert detector.ngram_counts([]).shape == (0, len(detector.codes))
+
+def test_drop_non_english_parallel():
+    lang_df = pd.DataFrame({
+        'subject': ['foo']*40,
+        'body': ['Hello World!', 'Hallo Welt!', 'Goodbye, cruel world', 
+            '¡Hola Mundo!', None, ' ', 'Buy cheap watches now', 
+            'Ce message est en français']*5
+    })
+    serial = drop_non_english(lang_df, workers=1)
+    parallel = drop_non_english(lang_df, workers=2, chunksize=3)
+    assert parallel.equals(serial)
+
+
+def test_drop_non_english_cache(tmp_path, monkeypatch):
+    lang_df = pd.DataFrame({
+        'subject': ['foo']*6,
+        'body': ['Hello World!', 'Hallo Welt!', 'Hello World!', None, ' ', 
+            'Buy cheap watches now']
+    })
+    cache_path = tmp_path / 'languages.sqlite3'
+    uncached = drop_non_english(lang_df, workers=1)
+    assert drop_non_english(lang_df, workers=1, 
+        cache_path=cache_path).equals(uncached)
+    # Every body is now in the cache, so no languages are detected again
+    def detect(*args):
+        raise AssertionError("a language was detected")
+    monkeypatch.setattr(sys.modules[drop_non_english.__module__], 'detect', 
+        detect)
+    assert drop_non_english(lang_df, workers=1, 
+        cache_path=cache_path).equals(uncached)
+
+
 def test_normalize_spaces():
     var = ["foo bar", "foo  bar", "foo\tbar", "foo\nbar", 
         "foo\r\nbar", "foo\r\n\t bar"]
@@ -48,6 +111,15 @@ def test_all_whitespace_to_na(whitespaces):
     }))
 
 
+@pytest.mark.parametrize('dtype', [object, 'string'])
+def test_normalize_fields(whitespaces, dtype):
+    whitespaces = whitespaces.astype(dtype)
+    normalized = normalize_fields(whitespaces)
+    assert normalized.equals(all_whitespace_to_na(normalize_spaces(
+        whitespaces)))
+    assert (normalized.dtypes == whitespaces.dtypes).all()
+
+
 def test_drop_na_both(whitespaces):
     whitespace_drop_na_both = drop_na_both(whitespaces)
     assert whitespace_drop_na_both.equals(pd.DataFrame({
@@ -64,7 +136,7 @@ def test_drop_duplicates():
         "body": ["foo",] * 2 + ["bar",] * 2 + ["baz",] * 2 
     })
     dropped_dups = drop_duplicates(dups)
-    assert dropped_dups.equals(pd.DataFrame(
+    assert dropped_dups.drop(columns='fingerprint').equals(pd.DataFrame(
         {
             "subject": ["foo", "foo", "bar", "baz"],
             "body": ["foo", "bar", "bar", "baz"]
@@ -73,6 +145,33 @@ def test_drop_duplicates():
     ))
 
 
+def test_drop_duplicates_collisions():
+    dups = pd.DataFrame({
+        "subject": ["foo", "foo", None, "bar", None],
+        "body": ["foo", "bar", "bar", "bar", "bar"],
+        # Every email has the same fingerprint
+        "fingerprint": np.zeros(5, dtype=np.uint64)
+    })
+    dropped_dups = drop_duplicates(dups)
+    assert dropped_dups.equals(dups.iloc[[0, 1, 2, 3]])
+
+
+def test_drop_near_duplicates():
+    text = ("Dear customer, we are pleased to offer you our finest watches "
+        "at a fraction of the price you would pay in any shop in town")
+    near_dups = pd.DataFrame({
+        "subject": ["Cheap watches", "Cheap watches", "cheap  WATCHES", 
+            "Meeting", None],
+        "body": [text, text + " today", text.upper(), 
+            "Can we move the meeting to Friday afternoon?", text + " now"]
+    })
+    dropped = drop_near_duplicates(near_dups, threshold=0.8)
+    assert dropped.equals(near_dups.iloc[[0, 3]])
+    assert drop_near_duplicates(near_dups, threshold=None).equals(near_dups)
+    # Off by default
+    assert drop_near_duplicates(near_dups).equals(near_dups)
+
+
 def test_drop_multipart_messages():
     msgs = pd.DataFrame({
         "subject": ["foo"]*3,
@@ -82,3 +181,15 @@ def test_drop_multipart_messages():
     assert dropped_multi.equals(pd.DataFrame(
         {"subject": ["foo"], "body": ["bar"]}
     ))
+
+
+def test_drop_multipart_messages_flagged():
+    msgs = pd.DataFrame({
+        "subject": ["foo"]*4,
+        "body": ["bar", "bar\n multipart", "bar Multipart", " "]
+    })
+    dropped_multi = drop_multipart_messages(normalize_fields(msgs, 
+        flag_multipart=True))
+    assert dropped_multi.equals(pd.DataFrame(
+        {"subject": ["foo"], "body": ["bar"]}
+    ))
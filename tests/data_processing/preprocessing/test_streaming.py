@@ -0,0 +1,49 @@
+import sys
+
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from spam_filter.data_processing.preprocessing.data_loading import \
+    load_train_test_csvs
+from spam_filter.data_processing.preprocessing.streaming import \
+    stream_train_test_csvs, read_streamed_train_test
+from spam_filter.data_processing.preprocessing.email_cleaning import \
+    normalize_fields, drop_na_both, drop_duplicates, drop_near_duplicates, \
+    drop_multipart_messages
+
+
+TEXT = ("Dear customer, we are pleased to offer you our finest watches at a "
+    "fraction of the price you would pay in any shop in town. ")
+
+
+def test_stream_train_test_csvs(tmp_path, monkeypatch):
+    for name in ('a', 'b'):
+        pd.DataFrame({
+            'path': [f'{name}/{i}' for i in range(30)],
+            'spam': [i % 2 for i in range(30)],
+            'subject': [f'Subject  {i % 7}' if i % 11 else ' ' 
+                for i in range(30)],
+            'body': [TEXT + f'Offer\n{i % 3}' if i % 4 == 0
+                else f'Body {i % 9} multipart' if i % 13 == 0 
+                else f'Body {i % 9}' for i in range(30)],
+        }).to_csv(tmp_path / f'{name}.csv', index=False)
+    corpus_names = {'a': 'a.csv', 'b': 'b.csv'}
+    pipeline = Pipeline([
+        ('email_cleaner', FunctionTransformer(normalize_fields, 
+            kw_args={'flag_multipart': True})),
+        ('empty_dropper', FunctionTransformer(drop_na_both)),
+        ('duplicate_dropper', FunctionTransformer(drop_duplicates)),
+        ('near_duplicate_dropper', FunctionTransformer(drop_near_duplicates,
+            kw_args={'threshold': 0.8})),
+        ('multipart_dropper', FunctionTransformer(drop_multipart_messages)),
+    ])
+    for module in (load_train_test_csvs, stream_train_test_csvs):
+        monkeypatch.setattr(sys.modules[module.__module__], 'corpus_prep', 
+            pipeline)
+    expected = load_train_test_csvs(tmp_path, corpus_names, cache_path=None)
+    stream_train_test_csvs(tmp_path, tmp_path, corpus_names, chunksize=7)
+    for streamed, email_set in zip(read_streamed_train_test(tmp_path), 
+                                   expected):
+        assert streamed.equals(email_set)
+        assert (streamed.dtypes == email_set.dtypes).all()
@@ -0,0 +1,52 @@
+from zlib import crc32
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# (test_set_check isn't imported by name, so pytest doesn't collect it)
+from spam_filter.data_processing.preprocessing import test_set_creation
+from spam_filter.data_processing.preprocessing.test_set_creation import \
+    hash_buckets, add_hash_buckets, split_train_test_by_bucket, \
+    split_train_test_by_id, cv_folds
+
+
+PATHS = ['trec06p/data/000/001', 'enron1/ham/0001.1999-12-10.farmer.ham.txt',
+    '', 'bare/1', 'dossier/Éléments/ünïcode', '文件/1'] \
+    + [f'corpus/{i:05d}' for i in range(500)]
+
+
+def test_hash_buckets():
+    assert hash_buckets(PATHS, string_id=True).tolist() == \
+        [crc32(path.encode('utf-8')) for path in PATHS]
+    numbers = [0, 1, -1, 2**40, 123456789]
+    assert hash_buckets(numbers).tolist() == \
+        [crc32(np.int64(number)) for number in numbers]
+
+
+@pytest.mark.parametrize('test_ratio', [0.2, 0.5])
+def test_split_matches_test_set_check(test_ratio):
+    data = pd.DataFrame({'path': PATHS, 'spam': True})
+    expected_test = [test_set_creation.test_set_check(path, test_ratio, True)
+        for path in PATHS]
+    train, test = split_train_test_by_bucket(
+        add_hash_buckets(data, 'path', string_id=True), test_ratio)
+    assert test['path'].tolist() == data['path'][expected_test].tolist()
+    assert train['path'].tolist() == \
+        data['path'][~np.array(expected_test)].tolist()
+    by_id = split_train_test_by_id(data, test_ratio, 'path', string_id=True)
+    assert by_id[1].equals(data[expected_test])
+
+
+def test_cv_folds():
+    buckets = hash_buckets(PATHS, string_id=True)
+    folds = cv_folds(buckets, 5, 0.2)
+    in_test = np.array([test_set_creation.test_set_check(path, 0.2, True)
+        for path in PATHS])
+    assert (folds[in_test] == -1).all()
+    assert set(folds[~in_test]) == {0, 1, 2, 3, 4}
+    # Folds are contiguous ranges of buckets, so they are disjoint and don't
+    # depend on the other identifiers
+    order = np.argsort(buckets[~in_test])
+    assert (np.diff(folds[~in_test][order]) >= 0).all()
+    assert (cv_folds(buckets[:50], 5, 0.2) == folds[:50]).all()
@@ -0,0 +1,116 @@
+import json
+
+import pandas as pd
+import pytest
+import spacy
+
+from spam_filter.data_processing.settings import SPACY_MODEL
+from spam_filter.data_processing.spacy import models
+from spam_filter.data_processing.spacy import dochandling
+from spam_filter.data_processing.spacy.dochandling import \
+    create_many_docbins, load_docbins, iter_docbins, docbin_shard_paths, \
+    DocBinView, DocBinError
+
+
+@pytest.fixture
+def model(monkeypatch):
+    nlp = spacy.blank('en')
+    monkeypatch.setattr(models, '_models', {SPACY_MODEL: nlp})
+    return nlp
+
+
+def make_series(n, name):
+    index = pd.MultiIndex.from_tuples(
+        [('corpus', f"{name}/{i}") for i in range(n)], names=['corpus', 'path'])
+    return pd.Series([f"Email {name} number {i}." for i in range(n)],
+        index=index, name=name)
+
+
+def load(path):
+    docs = load_docbins(path, ('corpus', 'path'), ('string', 'string'))
+    return docs.map(lambda doc: doc.text).sort_index()
+
+
+def test_create_many_docbins(model, tmp_path, monkeypatch):
+    body, subject = make_series(23, 'body'), make_series(4, 'subject')
+    jobs = [(body, tmp_path / 'body'), (subject, tmp_path / 'subject')]
+    create_many_docbins(jobs, batch_size=5, workers=1)
+    assert sorted(p.name for p in (tmp_path / 'body').iterdir()) == \
+        [f"{i}.spacy" for i in range(5)]
+    assert (tmp_path / 'subject.spacy').exists()
+    for series, path in jobs:
+        pd.testing.assert_series_equal(load(path), series.sort_index(),
+            check_names=False, check_index_type=False)
+    manifest = json.loads((tmp_path / 'body.manifest.json').read_text())
+    assert sorted(manifest['shards']) == ['0', '1', '2', '3', '4']
+    # Resuming only recreates the invalid shards
+    created = []
+    create_shard = dochandling._create_shard
+    def counting_create_shard(texts, identifiers, shard_path):
+        created.append(shard_path.name)
+        return create_shard(texts, identifiers, shard_path)
+    monkeypatch.setattr(dochandling, '_create_shard', counting_create_shard)
+    with (tmp_path / 'body' / '2.spacy').open('ab') as shard_file:
+        shard_file.write(b'corrupted')
+    body.iloc[21] = "A changed email."
+    create_many_docbins(jobs, batch_size=5, workers=1, resume=True)
+    assert sorted(created) == ['2.spacy', '4.spacy']
+    pd.testing.assert_series_equal(load(tmp_path / 'body'), body.sort_index(),
+        check_names=False, check_index_type=False)
+    # Shards of a different batch size are all recreated, and the old ones
+    # removed
+    created.clear()
+    create_many_docbins(jobs, batch_size=10, workers=1, resume=True)
+    assert len(created) == 3 + 1
+    assert sorted(p.name for p in (tmp_path / 'body').iterdir()) == \
+        ['0.spacy', '1.spacy', '2.spacy']
+    pd.testing.assert_series_equal(load(tmp_path / 'body'), body.sort_index(),
+        check_names=False, check_index_type=False)
+
+
+def test_rebuild_docbin_into_one_file(model, tmp_path):
+    body = make_series(12, 'body')
+    path = tmp_path / 'body'
+    create_many_docbins([(body, path)], batch_size=5, workers=1)
+    assert len(docbin_shard_paths(path)) == 3
+    # From shards to a single file: the shard directory is removed
+    create_many_docbins([(body, path)], batch_size=50, workers=1)
+    assert not path.exists()
+    assert docbin_shard_paths(path) == [tmp_path / 'body.spacy']
+    pd.testing.assert_series_equal(load(path), body.sort_index(),
+        check_names=False, check_index_type=False)
+    assert len(DocBinView(path, ('corpus', 'path'), ('string', 'string'))) \
+        == 12
+    # An empty directory doesn't hide the single file
+    path.mkdir()
+    assert docbin_shard_paths(path) == [tmp_path / 'body.spacy']
+    path.rmdir()
+    # And back to shards
+    create_many_docbins([(body, path)], batch_size=5, workers=1)
+    assert not (tmp_path / 'body.spacy').exists()
+    pd.testing.assert_series_equal(load(path), body.sort_index(),
+        check_names=False, check_index_type=False)
+
+def test_iter_docbins(model, tmp_path):
+    body = make_series(23, 'body')
+    create_many_docbins([(body, tmp_path / 'body')], batch_size=2, workers=1)
+    # Shards 0 to 11, in numeric (not alphabetical) order
+    assert [p.stem for p in docbin_shard_paths(tmp_path / 'body')] == \
+        [str(i) for i in range(12)]
+    batches = list(iter_docbins(tmp_path / 'body'))
+    assert [len(batch) for batch in batches] == [2] * 11 + [1]
+    pairs = [(identifier, doc.text) for batch in batches 
+        for identifier, doc in batch]
+    assert pairs == list(body.items())
+    view = DocBinView(tmp_path / 'body', ('corpus', 'path'), 
+        ('string', 'string'))
+    docs = load_docbins(tmp_path / 'body', ('corpus', 'path'), 
+        ('string', 'string'))
+    assert len(view) == len(body)
+    assert view.index.equals(docs.index)
+    assert [doc.text for doc in view] == body.tolist()
+    assert view.to_series().map(lambda doc: doc.text).equals(
+        docs.map(lambda doc: doc.text))
+    assert DocBinView(tmp_path / 'body').index.equals(pd.RangeIndex(23))
+    with pytest.raises(DocBinError):
+        DocBinView(tmp_path / 'missing')
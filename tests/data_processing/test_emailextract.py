@@ -0,0 +1,39 @@
+import email
+from email.message import EmailMessage
+from email.policy import default
+
+import pytest
+
+from spam_filter.data_processing import emailextract
+from spam_filter.data_processing.emailextract import extract_email_data, \
+    EmailEncodingError
+
+
+def make_email(*parts):
+    """Return a multipart email with the subject 'foo' and a text part
+    for each (subtype, charset, text) tuple in `parts`."""
+    msg = EmailMessage()
+    msg['Subject'] = 'foo'
+    msg.set_content("preamble")
+    msg.make_mixed()
+    for subtype, charset, text in parts:
+        part = EmailMessage()
+        part.set_content(text, subtype=subtype, charset=charset)
+        msg.attach(part)
+    return email.message_from_bytes(msg.as_bytes(), policy=default)
+
+
+def test_extract_email_data_joins_parts():
+    msg = make_email(('plain', 'utf-8', 'Hello\n'),
+        ('html', 'us-ascii', '<p>World</p>'), ('plain', 'utf-8', '!\n'))
+    assert extract_email_data(msg) == ('foo', 'preamble\nHello\nWorld\n!\n')
+
+
+def test_extract_email_data_rejects_before_decoding(monkeypatch):
+    def decode_email_text(*args, **kwargs):
+        raise AssertionError("a part was decoded")
+    monkeypatch.setattr(emailextract, 'decode_email_text', decode_email_text)
+    msg = make_email(('html', 'utf-8', '<p>Hello</p>'),
+        ('plain', 'koi8-r', 'Привет'))
+    with pytest.raises(EmailEncodingError, match="Unacceptable charset"):
+        extract_email_data(msg)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spam_filter.data_processing.preprocessing.data_loading import \
+    load_train_test_classes
+from spam_filter.data_processing.spacy.dochandling import create_many_docbins
+from spam_filter.data_processing.spacy.lemma_counter import LemmaCounter
+from spam_filter.data_processing.spacy.feature_store import \
+    LemmaFeatureStore, FeatureStoreError, build_lemma_features
+
+
+WORDS = ['buy', 'cheap', 'watches', 'now', '!', '50', 'hello', 'bob',
+    'meeting', 'tomorrow', 'unknown', 'words', 'again', '.']
+OPTIONS = {
+    'subject': {'del_stop': False, 'del_punct': False, 'del_num': True},
+    'body': {'del_stop': False, 'del_punct': True, 'del_num': False},
+}
+
+
+def make_emails(n, split, rng):
+    index = pd.MultiIndex.from_tuples(
+        [('corpus', f"{split}/{i}") for i in range(n)],
+        names=['corpus', 'path'])
+    def text():
+        return ' '.join(rng.choice(WORDS, rng.integers(0, 8)))
+    return pd.DataFrame({'spam': rng.random(n) < 0.5,
+        'subject': [text() for _ in range(n)],
+        'body': [text() for _ in range(n)]}, index=index)
+
+
+def test_lemma_feature_store(lemma_model, tmp_path):
+    rng = np.random.default_rng(0)
+    emails = {'train': make_emails(17, 'train', rng),
+        'test': make_emails(6, 'test', rng)}
+    docbin_names = {split: {field: f"{split}{field}"
+        for field in ('subject', 'body')} for split in emails}
+    class_filenames = {split: f"{split}_classes.csv" for split in emails}
+    create_many_docbins([(emails[split][field],
+            tmp_path / docbin_names[split][field])
+        for split in emails for field in ('subject', 'body')],
+        batch_size=5, workers=1)
+    # The class files are in another order than the docbins
+    for split, df in emails.items():
+        df['spam'].sample(frac=1, random_state=0).to_csv(
+            tmp_path / class_filenames[split])
+    build_lemma_features(tmp_path / 'features', tmp_path, docbin_names, 
+        tmp_path, class_filenames, OPTIONS)
+    store = LemmaFeatureStore(tmp_path / 'features')
+    classes = dict(zip(('train', 'test'), 
+        load_train_test_classes(tmp_path, class_filenames)))
+    for field in ('subject', 'body'):
+        counter = LemmaCounter(workers=1, **OPTIONS[field])
+        counter.fit(emails['train'][field])
+        assert store.vocabulary(field) == counter.feature_names_
+        assert store.options(field) == OPTIONS[field]
+        for split in emails:
+            store.check_index(split, classes[split])
+            expected = counter.transform(
+                emails[split][field].reindex(classes[split].index))
+            matrix = store.matrix(split, field)
+            # A read-only view of the memory-mapped file
+            assert not matrix.data.flags.owndata
+            assert not matrix.data.flags.writeable
+            assert matrix.shape == expected.shape
+            assert (matrix != expected).nnz == 0
+    features = store.features('train')
+    assert features.shape == (17, sum(len(store.vocabulary(field))
+        for field in ('subject', 'body')))
+    # Stored side by side, so it is memory-mapped rather than copied
+    assert not features.data.flags.owndata
+    assert not features.indices.flags.owndata
+    for field in ('subject', 'body'):
+        assert (features[:, store.columns(field)]
+            != store.matrix('train', field)).nnz == 0
+    with pytest.raises(FeatureStoreError):
+        store.check_index('train', classes['train'].sort_index())
+    with pytest.raises(FeatureStoreError):
+        LemmaFeatureStore(tmp_path / 'missing').matrix('train', 'body')
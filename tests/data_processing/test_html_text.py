@@ -0,0 +1,43 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from spam_filter.data_processing.html_text import html_to_text
+
+
+SPAM_HTML = """<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0 Transitional//EN">
+<html><head>
+<meta http-equiv="Content-Type" content="text/html; charset=windows-1252">
+<title>Special Offer!!!</title>
+<style type="text/css">td { font-family: Arial; }</style>
+<script language="JavaScript">document.write("<b>hidden</b>");</script>
+</head>
+<body bgcolor=#FFFFFF>
+<!-- tracking: 8f3a9c -->
+<table width="600"><tr><td>
+<p align=center><font size=4><b>CL&#73;CK HERE</b> to claim your
+FR&Eacute;E prize &amp; save 90&#37;&nbsp;today!</font></p>
+<br><img src="http://example.com/x.gif" width=1 height=1><br/>
+<a href="http://example.com/remove">unsubscribe</A>&copy 2005 &bogus;
+</td></tr></table>
+<p>Price: &#128;99 &#x201C;only&#x201D; &#150; <i>limited time</i>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize('content', [
+    SPAM_HTML,
+    "Plain text with no tags at all",
+    "<p>Hello</p>   \n\t  <p>World</p> <p>!</p>",
+    "<pre>  keep\n   these   spaces  </pre>  \n  <textarea>\n\n</textarea>",
+    "<template><p>never shown</p></template><ruby>漢<rp>(</rp><rt>kan</rt>"
+        "<rp>)</rp></ruby>",
+    "<div><![CDATA[ raw <b>data</b> ]]><?php echo 1 ?></div>",
+    "<b>unclosed <i>tags <p>everywhere</b> and </stray> end tags</p>",
+    "<br>before</br>after<br/>  <br>\n</br>\n<hr/>",
+    "&#0; &#xD800; &#x110000; &#129; &#159; &amp &lt;3 &notit; &#",
+    "<p>truncated <a href=",
+    "",
+])
+def test_html_to_text_matches_bs4(content):
+    expected = BeautifulSoup(content, features="html.parser").get_text()
+    assert html_to_text(content) == expected
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction import DictVectorizer
+
+from spam_filter.data_processing.spacy.dochandling import DocCreator
+from spam_filter.data_processing.spacy.lemmatizer import Lemmatizer
+from spam_filter.data_processing.spacy.lemma_counter import LemmaCounter
+
+
+TEXTS = np.array([
+    "Buy cheap watches now!!! Cheap watches, 50% off",
+    "Hello Bob, the meeting is at 10 tomorrow. See you there.",
+    "Click http://example.com or write to sales@example.com",
+    "",
+    "Unknown zzyzx words and the same words again, words",
+], dtype=object)
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'del_stop': True, 'del_punct': False, 'del_num': True},
+    {'del_stop': True, 'del_punct': True, 'del_num': True, 'batch_size': 2},
+])
+def test_lemma_counter(lemma_model, options):
+    options = options.copy()
+    batch_size = options.pop('batch_size', 250)
+    lemmatizer = Lemmatizer(**options)
+    vectorizer = DictVectorizer()
+    docs = DocCreator().transform(TEXTS)
+    expected = vectorizer.fit_transform(lemmatizer.transform(docs))
+    counter = LemmaCounter(workers=1, batch_size=batch_size, **options)
+    for X in (TEXTS, docs):
+        counts = counter.fit_transform(X)
+        assert counter.feature_names_ == vectorizer.feature_names_
+        assert counter.vocabulary_ == vectorizer.vocabulary_
+        assert counts.shape == expected.shape
+        assert (counts != expected).nnz == 0
+        assert counts.has_sorted_indices
+        assert (counter.fit(X).transform(X) != expected).nnz == 0
+    new_texts = np.array(["cheap cheap again", "meeting unknown"], dtype=object)
+    expected = vectorizer.transform(
+        lemmatizer.transform(DocCreator().transform(new_texts)))
+    assert (counter.transform(new_texts) != expected).nnz == 0
+    # With a fixed vocabulary, fitting doesn't look at the data
+    fixed = LemmaCounter(workers=1, vocabulary=vectorizer.feature_names_,
+        **options).fit([])
+    assert (fixed.transform(new_texts) != expected).nnz == 0
+
+
+@pytest.mark.parametrize('missing', [None, np.nan, pd.NA])
+def test_lemma_counter_missing_values(lemma_model, missing):
+    texts = pd.Series(["Buy cheap watches", missing], dtype=object)
+    counter = LemmaCounter(workers=1)
+    # Like DocCreator, rather than counting "None", "nan" or "<NA>"
+    with pytest.raises(ValueError):
+        DocCreator().transform(texts)
+    with pytest.raises(ValueError, match="missing values"):
+        counter.fit_transform(texts)
+    counter.fit(texts.fillna(""))
+    with pytest.raises(ValueError, match="missing values"):
+        counter.transform(texts)
+    counts = counter.transform(texts.fillna(""))
+    assert counts.shape == (2, len(counter.feature_names_))
+    assert counts[1].nnz == 0
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import spacy
+
+from spam_filter.data_processing.spacy import models
+
+
+def test_import_is_lazy():
+    code = ("import sys; import spam_filter.data_processing; "
+        "print(' '.join(name for name in ('spacy', 'bs4', 'sklearn') "
+        "if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+        capture_output=True, text=True)
+    assert result.stdout.split() == []
+
+
+def test_load_model(monkeypatch):
+    loaded = []
+    def load(name):
+        loaded.append(name)
+        return spacy.blank('en')
+    monkeypatch.setattr(spacy, 'load', load)
+    monkeypatch.setattr(models, '_models', {})
+    monkeypatch.setattr(models, '_snapshots', {})
+    nlp = models.load_model('test_model')
+    assert models.load_model('test_model') is nlp
+    strings = models.model_strings('test_model')
+    n_strings = len(strings)
+    nlp("A completely new string: qwertyuiopasdf")
+    assert 'qwertyuiopasdf' in nlp.vocab.strings
+    assert 'qwertyuiopasdf' not in strings
+    assert len(models.model_strings('test_model')) == n_strings
+    assert loaded == ['test_model']
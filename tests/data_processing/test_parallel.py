@@ -0,0 +1,40 @@
+import numpy as np
+
+from spam_filter.data_processing.spacy import parallel
+from spam_filter.data_processing.spacy.dochandling import DocCreator
+
+
+TEXTS = [f"Email number {i}, with some words. Buy now!" for i in range(23)]
+
+
+def test_use_pool():
+    assert parallel.use_pool(10, workers=4, parallel_threshold=100) == \
+        (False, 4)
+    assert parallel.use_pool(100, workers=4, parallel_threshold=100) == \
+        (True, 4)
+    assert parallel.use_pool(100, workers=1, parallel_threshold=100) == \
+        (False, 1)
+    assert parallel.use_pool(100, workers=4, parallel_threshold=None) == \
+        (False, 4)
+
+
+def test_pipe_texts(lemma_model):
+    in_process = list(parallel.pipe_texts(TEXTS, batch_size=5, workers=2,
+        parallel_threshold=len(TEXTS) + 1))
+    try:
+        pooled = list(parallel.pipe_texts(TEXTS, batch_size=5, workers=2,
+            parallel_threshold=len(TEXTS)))
+        pool = parallel.get_pool(2)
+        # The pool is reused
+        list(parallel.pipe_texts(TEXTS, batch_size=5, workers=2,
+            parallel_threshold=1))
+        assert parallel.get_pool(2) is pool
+        docs = DocCreator(batch_size=5, workers=2, parallel_threshold=1
+            ).transform(np.array(TEXTS, dtype=object).reshape(-1, 1))
+    finally:
+        parallel.shutdown_pool()
+    assert docs.shape == (len(TEXTS), 1)
+    for doc_lists in (pooled, list(docs.flat)):
+        assert [doc.text for doc in doc_lists] == TEXTS
+        assert [[token.lemma_ for token in doc] for doc in doc_lists] == \
+            [[token.lemma_ for token in doc] for doc in in_process]